@@ -0,0 +1,618 @@
+"""Hardware-free benchmarks for the RE:Flex host, run against loopback pads.
+
+Usage (from the src directory):
+    python benchmark.py            run every benchmark
+    python benchmark.py loopback   run the named benchmarks only
+"""
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from frame_cache import FrameCache
+from key_output import KeyEmitter
+from led_data_generator import LEDDataGenerator
+from led_data_handler import LEDDataHandler
+from packet_codec import PacketCodec
+from packet_recorder import PacketRecorder, PacketRecording
+from pad_model import PadModel
+from sensor_filter import FilterSettings, SensorFilter
+from sensor_history import SensorHistory
+from session_exporter import SessionExporter
+from usb_controller import USBDeviceList
+from usb_loopback import LoopbackFinder, LoopbackPad, PressureScript
+from write_scheduler import WriteScheduler
+
+# Keys are sent inline from the sensor loop, see KeyEmitter.
+KEY_EMIT_LIMIT_MS = 0.25
+
+
+def connect_loopback_pads(pads: list[LoopbackPad], engine: str) -> ...:
+    """Route USB through loopback pads and connect them all.
+
+    The primary model and key emitter are shared by every Sequences of the
+    process, so their state and histograms are reset for each run.
+    """
+    USBDeviceList.set_finder(LoopbackFinder(pads))
+    from data_sequences import Sequences
+    sequences = Sequences()
+    sequences.pad_model.set_default()
+    sequences.pad_model.reset_latency()
+    sequences.pad_model.key_output.reset_stats()
+    sequences.pad_controller.engine = engine
+    sequences.pad_controller.enumerate_pads()
+    for pad in pads:
+        sequences.pad_controller.connect_pad(pad.serial)
+    return sequences
+
+
+def bench_loopback(
+    duration: float = 5.0, engine: str = "process"
+) -> dict[str, float]:
+    """Run the data process loop against one loopback pad."""
+    pad = LoopbackPad("LOOPBACK0", script=PressureScript.idle())
+    sequences = connect_loopback_pads([pad], engine)
+    instance = sequences.pad_controller.pad
+    sensors = instance._sensors
+    loops = 0
+    received = []
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < duration:
+        sequences.handle_pad_data()
+        loops += 1
+        if loops % 1000 == 0:
+            received.extend(pad.received())
+    samples, overruns = sensors.samples, sensors.overruns
+    write_stats = instance.write_stats
+    sequences.pad_controller.disconnect_pad()
+    USBDeviceList.set_finder()
+    received.extend(pad.received())
+    magic = (LoopbackPad.ENTER_CONFIG, LoopbackPad.EXIT_CONFIG)
+    config = [p for p in received if p.data in magic]
+    return {
+        "loops_per_s": loops / elapsed,
+        "sensor_packets_per_s": samples / elapsed,
+        "sensor_overruns": float(overruns),
+        "packets_written_per_s": len(received) / elapsed,
+        "config_packets": float(len(config)),
+        "left_in_config_mode": float(pad.config_mode),
+        "led_sent_per_s": write_stats["sent"] / elapsed,
+        "control_sent": write_stats["control_sent"],
+        "led_coalesced": write_stats["coalesced"],
+        "write_idle_fraction": write_stats["idle_s"] / elapsed,
+    }
+
+
+def bench_loopback_async(duration: float = 5.0) -> dict[str, float]:
+    """As bench_loopback, with both endpoints served by one process."""
+    return bench_loopback(duration, engine="async")
+
+
+def bench_config(
+    cycles: int = 20, engine: str = "process", drop_replies: int = 0
+) -> dict[str, float]:
+    """Round trip of enter config, push, read and exit config sequences."""
+    pad = LoopbackPad(
+        "LOOPBACK0", script=PressureScript.idle(), record=False,
+        drop_replies=drop_replies
+    )
+    sequences = connect_loopback_pads([pad], engine)
+    controller = sequences.pad_controller
+    instance = controller.pad
+    for cycle in range(cycles + 1):
+        if cycle:
+            controller.push_profile()
+        deadline = time.perf_counter() + 5.0
+        while instance.config_stats["sequences"] <= cycle:
+            sequences.handle_pad_data()
+            if time.perf_counter() > deadline:
+                raise TimeoutError("Config sequence never completed.")
+    stats = instance.config_stats
+    controller.disconnect_pad()
+    USBDeviceList.set_finder()
+    return {
+        "sequences": stats["sequences"],
+        "failures": stats["failures"],
+        "retries": stats["retries"],
+        "timeouts": stats["timeouts"],
+        "mean_round_trip_ms": stats["mean_ms"],
+        "max_round_trip_ms": stats["max_ms"],
+        "left_in_config_mode": float(pad.config_mode),
+    }
+
+
+def bench_config_lossy(cycles: int = 5) -> dict[str, float]:
+    """As bench_config, with the first three read requests lost."""
+    return bench_config(cycles, drop_replies=3)
+
+
+def bench_timing(
+    duration: float = 3.0, engine: str = "process", presses: bool = False
+) -> dict[str, float]:
+    """USB interval, duration, consumption and key press latencies."""
+    script = PressureScript.stepping() if presses else PressureScript.idle()
+    # Time the host side only, the OS keyboard is not part of the loop.
+    KeyEmitter.shared(KeyEmitter.NULL)
+    pad = LoopbackPad("LOOPBACK0", script=script, record=False)
+    sequences = connect_loopback_pads([pad], engine)
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        sequences.handle_pad_data()
+    stats = sequences.pad_controller.pad.timing_stats
+    sequences.pad_controller.disconnect_pad()
+    USBDeviceList.set_finder()
+    keys = stats.pop("key_output")
+    stats.pop("led_output")
+    if presses:
+        emit_ms = stats["key_emit_latency"]["p99_ms"]
+        assert keys["emitted"] and emit_ms < KEY_EMIT_LIMIT_MS, emit_ms
+    return {
+        **{
+            f"{name}_{key}": summary[key]
+            for name, summary in stats.items()
+            for key in ("p50_ms", "p99_ms", "max_ms")
+        },
+        "keys_emitted": keys["emitted"],
+        "keys_coalesced": keys["coalesced"],
+    }
+
+
+def _per_led_frame(
+    generator: LEDDataGenerator, model: PadModel, values: list[float]
+) -> None:
+    """The per-LED LEDDataGenerator loop draw_frame replaced."""
+    for value, (panel_coord, panel) in zip(
+        values, model.get_model_data().panels.items()
+    ):
+        active_leds = LEDDataGenerator.PANEL_BASES[panel_coord]
+        for led_coord, led in panel.leds.items():
+            if led_coord in active_leds:
+                led.colour = generator.get_led_colour(
+                    panel_coord, led_coord, value
+                )
+
+
+def _check_hsv(samples: int = 10000, seed: int = 0) -> int:
+    """Compare hsv_to_rgb_array to hsv_to_rgb on random colours."""
+    rng = random.Random(seed)
+    hsv = np.array([
+        [rng.randrange(256), rng.choice((0, rng.randrange(256))),
+         rng.randrange(256)]
+        for _ in range(samples)
+    ])
+    rgb = LEDDataGenerator.hsv_to_rgb_array(hsv[:, 0], hsv[:, 1], hsv[:, 2])
+    for colour, (h, s, v) in zip(rgb.tolist(), hsv.tolist()):
+        expected = list(LEDDataGenerator.hsv_to_rgb(h, s, v))
+        assert colour == expected, ((h, s, v), colour, expected)
+    return samples
+
+
+def bench_generator(periods: int = 6) -> dict[str, float]:
+    """LED frame generation time: per-LED loop, arrays and cached arrays.
+
+    Every case draws the same steps, holding a brightness per panel for a
+    whole hue period at a time, and every frame must match. Random
+    colours are checked against hsv_to_rgb first.
+    """
+    hsv_checked = _check_hsv()
+    period = LEDDataGenerator.HUE_PERIOD
+    frames = periods * period
+    levels = np.array([
+        [LEDDataGenerator.BASE_MAX] * 4,
+        [0.0, 0.1, 0.2, LEDDataGenerator.BASE_MAX],
+    ])
+    values = np.repeat(levels[np.arange(periods) % len(levels)], period, 0)
+    generators = {
+        "per_led": LEDDataGenerator(PadModel(), FrameCache(0)),
+        "array": LEDDataGenerator(PadModel(), FrameCache(0)),
+        "cached": LEDDataGenerator(PadModel()),
+    }
+    drawn = {}
+    results = {}
+    for name, generator in generators.items():
+        model = generator._model
+        frame = model.get_led_frame()
+        drawn[name] = np.empty((frames, *frame.shape), np.uint8)
+        start = time.perf_counter()
+        for step, panel_values in enumerate(values.tolist()):
+            generator._t = step % period
+            if name == "per_led":
+                _per_led_frame(generator, model, panel_values)
+            else:
+                generator.draw_frame(frame, panel_values)
+            drawn[name][step] = frame
+        elapsed = time.perf_counter() - start
+        results[f"{name}_frame_ms"] = elapsed / frames * 1e3
+    assert (drawn["per_led"] == drawn["array"]).all()
+    assert (drawn["per_led"] == drawn["cached"]).all()
+    generator = generators["cached"]
+    start = time.perf_counter()
+    for step in range(frames):
+        generator._t = step % period
+        generator.draw_frame(frame, levels[0])
+    results["steady_frame_ms"] = (time.perf_counter() - start) / frames * 1e3
+    cache = generator.cache.stats
+    results["cache_hit_rate"] = cache["hit_rate"]
+    results["cache_kib"] = cache["bytes"] / 1024
+    results["speedup"] = (
+        results["per_led_frame_ms"] / results["array_frame_ms"]
+    )
+    results["hsv_checked"] = hsv_checked
+    return results
+
+
+def bench_led_output(duration: float = 2.0) -> dict[str, float]:
+    """LED bandwidth saved and panel update rates, animated and static.
+
+    The static case stops the generator and leaves one panel lit.
+    """
+    KeyEmitter.shared(KeyEmitter.NULL)
+    results = {}
+    for case in ("animated", "static"):
+        pad = LoopbackPad(
+            "LOOPBACK0", script=PressureScript.stepping(), record=False
+        )
+        sequences = connect_loopback_pads([pad], "process")
+        instance = sequences.pad_controller.pad
+        if case == "static":
+            instance._lights.generator = None
+            frame = instance.model.get_led_frame()
+            frame[:] = 0
+            frame[0] = 255
+        start = time.perf_counter()
+        while (elapsed := time.perf_counter() - start) < duration:
+            sequences.handle_pad_data()
+        stats = instance.led_stats
+        stats["led_sent_per_s"] = instance.write_stats["sent"] / elapsed
+        sequences.pad_controller.disconnect_pad()
+        USBDeviceList.set_finder()
+        results.update({f"{case}_{k}": v for k, v in stats.items()})
+    return results
+
+
+def bench_multipad(
+    duration: float = 3.0, engine: str = "process",
+    counts: tuple[int, ...] = (1, 2, 4, 8)
+) -> dict[str, float]:
+    """Per-pad sensor rate and read-to-consumption latency vs pad count."""
+    results = {}
+    for count in counts:
+        pads = [
+            LoopbackPad(f"LOOPBACK{i}", script=PressureScript.idle(),
+                        record=False)
+            for i in range(count)
+        ]
+        sequences = connect_loopback_pads(pads, engine)
+        instances = list(sequences.pad_controller.pads.values())
+        start = time.perf_counter()
+        while (elapsed := time.perf_counter() - start) < duration:
+            sequences.handle_pad_data()
+        samples = [pad._sensors.samples for pad in instances]
+        latency = [pad._sensors.mean_latency for pad in instances]
+        sequences.pad_controller.disconnect_pad()
+        USBDeviceList.set_finder()
+        results[f"pads_{count}_samples_per_pad_s"] = (
+            sum(samples) / count / elapsed
+        )
+        results[f"pads_{count}_mean_latency_ms"] = sum(latency) / count * 1e3
+        results[f"pads_{count}_max_latency_ms"] = max(latency) * 1e3
+    return results
+
+
+def _per_byte_encode_profile(profile_data: dict) -> bytearray:
+    """The byte-by-byte profile push encoder PacketCodec replaced."""
+    packet = bytearray(64)
+    packet[0] = 0xF0
+    pos = 1
+    for panel in PadModel.PANELS.coords:
+        sensor_data = profile_data.get(panel, ({}, ' '))[0]
+        for sensor in PadModel.SENSORS.coords:
+            threshold, hysteresis = sensor_data.get(sensor, (30, 5))
+            packet[pos] = threshold & 0xFF
+            packet[pos + 1] = hysteresis & 0xFF
+            pos += 2
+    for panel in PadModel.PANELS.coords:
+        key = profile_data.get(panel, ({}, ' '))[1]
+        packet[pos] = ord(key[0]) if key else 0
+        pos += 1
+    return packet
+
+
+def _per_byte_decode_profile(data: bytes) -> dict:
+    """The byte-by-byte profile reply decoder PacketCodec replaced.
+
+    Kept for timing only: it read each key straight after its panel's
+    sensors instead of from bytes 33-36.
+    """
+    profile = {}
+    pos = 1
+    for panel in PadModel.PANELS.coords:
+        sensor_data = {}
+        for sensor in PadModel.SENSORS.coords:
+            sensor_data[sensor] = (data[pos], data[pos + 1])
+            pos += 2
+        profile[panel] = (sensor_data, chr(data[pos]))
+        pos += 1
+    return profile
+
+
+def _per_byte_decode_sensor(data: bytes) -> dict:
+    """The byte-by-byte sensor decoder, over all 16 readings."""
+    pad_data = {}
+    for index in range(16):
+        panel_coord = PadModel.PANELS.coords[index // 4]
+        sensor_coord = PadModel.SENSORS.coords[index % 4]
+        value = data[index * 2] + (data[index * 2 + 1] << 8)
+        pad_data[(panel_coord, sensor_coord)] = value
+    return pad_data
+
+
+def _random_profile(rng: random.Random) -> dict:
+    return {
+        panel: (
+            {
+                sensor: (rng.randrange(256), rng.randrange(256))
+                for sensor in PadModel.SENSORS.coords
+            },
+            chr(rng.randrange(1, 128))
+        )
+        for panel in PadModel.PANELS.coords
+    }
+
+
+def bench_codec(count: int = 5000) -> dict[str, float]:
+    """Packets per second of PacketCodec against the per-byte code."""
+    rng = random.Random(1)
+    profiles = [_random_profile(rng) for _ in range(count)]
+    replies = [PacketCodec.encode_profile(p) for p in profiles]
+    values = np.random.default_rng(1).integers(0, 4096, (count, 16))
+    sensors = PacketCodec.encode_sensors(values)
+    sensor_bytes = [packet.tobytes() for packet in sensors]
+    cases = {
+        "profile_encode_per_byte": lambda: [
+            _per_byte_encode_profile(p) for p in profiles
+        ],
+        "profile_encode": lambda: [
+            PacketCodec.encode_profile(p) for p in profiles
+        ],
+        "profile_encode_batch": lambda: PacketCodec.encode_profiles(profiles),
+        "profile_decode_per_byte": lambda: [
+            _per_byte_decode_profile(p) for p in replies
+        ],
+        "profile_decode": lambda: [
+            PacketCodec.decode_profile(p) for p in replies
+        ],
+        "sensor_decode_per_byte": lambda: [
+            _per_byte_decode_sensor(p) for p in sensor_bytes
+        ],
+        "sensor_decode": lambda: [
+            PacketCodec.decode_sensor(p) for p in sensor_bytes
+        ],
+        "sensor_decode_batch": lambda: PacketCodec.decode_sensors(sensors),
+    }
+    results = {}
+    for name, case in cases.items():
+        start = time.perf_counter()
+        case()
+        results[f"{name}_per_s"] = count / (time.perf_counter() - start)
+    return results
+
+
+def _per_byte_led_data(
+    led_data: dict, panel: int, segment: int
+) -> bytes:
+    """The get_data_byte LED encoder LEDDataHandler.INDEX replaced."""
+    data = bytearray(LEDDataHandler.NUM_LEDS * 3)
+    for byte_index in range(len(data)):
+        panel_coord = PadModel.PANELS.coords[panel]
+        if (panel_data := led_data.get(panel_coord, None)) is None:
+            continue
+        led_coord = LEDDataHandler.POSITIONS[segment][byte_index // 3]
+        led = panel_data[led_coord]
+        if byte_index % 3 == 0:
+            col = led.green
+        elif byte_index % 3 == 1:
+            col = led.red
+        else:
+            col = led.blue
+        data[byte_index] = LEDDataHandler.GAMMA[col]
+    return bytes(data)
+
+
+def bench_led(count: int = 20000) -> dict[str, float]:
+    """LED packets encoded per second against the per-byte code."""
+    model = PadModel()
+    handler = LEDDataHandler(WriteScheduler(64, 960.0), model)
+    frame = model.get_led_frame()
+    frame[:] = np.random.default_rng(3).integers(0, 256, frame.shape)
+    led_data = model.get_led_data()
+    segments = [
+        (panel, segment)
+        for panel in range(LEDDataHandler.NUM_PANELS)
+        for segment in range(LEDDataHandler.NUM_SEGMENTS)
+    ]
+    bank = np.zeros((len(segments), 64), np.uint8)
+    handler.encode_frame(bank, 5)
+    for packet, (panel, segment) in zip(bank, segments):
+        assert PacketCodec.split_led_header(packet[0]) == (panel, segment, 5)
+        expected = _per_byte_led_data(led_data, panel, segment)
+        assert packet[1:].tobytes() == expected
+    start = time.perf_counter()
+    for index in range(count):
+        _per_byte_led_data(led_data, *segments[index % len(segments)])
+    per_byte = count / (time.perf_counter() - start)
+    frames = count // len(segments)
+    start = time.perf_counter()
+    for frame in range(frames):
+        handler.encode_frame(bank, frame % LEDDataHandler.NUM_FRAMES)
+    banked = frames * len(segments) / (time.perf_counter() - start)
+    return {
+        "per_byte_packets_per_s": per_byte,
+        "bank_packets_per_s": banked,
+        "speedup": banked / per_byte,
+    }
+
+
+def bench_model(count: int = 20000) -> dict[str, float]:
+    """PadModel sensor updates per second, without key edges."""
+    model = PadModel()
+    values = np.random.default_rng(2).integers(0, 20, (count, 4, 4))
+    model.set_baseline(np.zeros((4, 4), np.uint16))
+    start = time.perf_counter()
+    for sample in values:
+        model.set_sensor_data(sample)
+    elapsed = time.perf_counter() - start
+    return {"sensor_updates_per_s": count / elapsed}
+
+
+def bench_history(count: int = 20000) -> dict[str, float]:
+    """SensorHistory appends per second and window query times."""
+    history = SensorHistory()
+    frames = np.random.default_rng(3).integers(0, 4096, (count, 1, 4, 4))
+    stamps = np.arange(count, dtype=np.float64)[:, np.newaxis] / 1000
+    start = time.perf_counter()
+    for stamp, frame in zip(stamps, frames):
+        history.extend(stamp, frame)
+    results = {"appends_per_s": count / (time.perf_counter() - start)}
+    queries = {
+        "panel_2s_window": lambda: history.window(2.0, panel=(0, 1)),
+        "max_2s": lambda: history.maximum(2.0),
+        "p99_2s": lambda: history.percentile(99, 2.0),
+        "segments_10s": lambda: history.segments(),
+    }
+    for name, query in queries.items():
+        start = time.perf_counter()
+        for _ in range(100):
+            query()
+        results[f"{name}_us"] = (time.perf_counter() - start) / 100 * 1e6
+    return results
+
+
+def bench_filter(count: int = 20000) -> dict[str, float]:
+    """Filtered samples per second and group delay of each stage."""
+    samples = np.random.default_rng(4).integers(0, 4096, (count, 1, 4, 4))
+    stages = {
+        "spike": FilterSettings(spike_limit=200),
+        "median5": FilterSettings(median_size=5),
+        "lowpass": FilterSettings(lowpass_hz=100),
+        "all": FilterSettings(
+            spike_limit=200, median_size=5, lowpass_hz=100
+        ),
+    }
+    results = {}
+    for name, settings in stages.items():
+        sensor_filter = SensorFilter(settings)
+        start = time.perf_counter()
+        for sample in samples:
+            sensor_filter.apply(sample)
+        elapsed = time.perf_counter() - start
+        results[f"{name}_samples_per_s"] = count / elapsed
+        results[f"{name}_delay_ms"] = sensor_filter.group_delay * 1e3
+    return results
+
+
+def bench_replay(
+    duration: float = 2.0, capacity: int = 256
+) -> dict[str, float]:
+    """Record a stepping loopback pad, then replay it as fast as possible.
+
+    The recording starts with room for capacity packets, so the file is
+    grown several times while it is mapped.
+    """
+    KeyEmitter.shared(KeyEmitter.NULL)
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory) / "session.rec"
+        pad = LoopbackPad(
+            "LOOPBACK0", script=PressureScript.stepping(), record=False
+        )
+        sequences = connect_loopback_pads([pad], "process")
+        controller = sequences.pad_controller
+        controller.pad.start_recording(path, capacity)
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            sequences.handle_pad_data()
+        recorded = controller.pad.stop_recording()
+        controller.disconnect_pad()
+        USBDeviceList.set_finder()
+        recording = PacketRecording(path)
+        assert len(recording) == recorded > capacity
+        sensor_packets = len(recording.direction(PacketRecorder.IN)[0])
+        del recording
+        controller.connect_replay(path, realtime=False)
+        replay = controller.pad
+        start = time.perf_counter()
+        while not replay._endpoints[0].finished:
+            sequences.handle_pad_data()
+        elapsed = time.perf_counter() - start
+        samples = replay._sensors.samples
+        controller.disconnect_pad()
+    return {
+        "recorded_packets_per_s": recorded / duration,
+        "replayed_packets": float(samples),
+        "recorded_sensor_packets": float(sensor_packets),
+        "replay_packets_per_s": samples / elapsed,
+        "replay_speedup": duration / elapsed,
+    }
+
+
+def bench_export(duration: float = 3.0) -> dict[str, float]:
+    """Loop rate with a session export running, and rows written."""
+    KeyEmitter.shared(KeyEmitter.NULL)
+    with tempfile.TemporaryDirectory() as directory:
+        pad = LoopbackPad(
+            "LOOPBACK0", script=PressureScript.stepping(), record=False
+        )
+        sequences = connect_loopback_pads([pad], "process")
+        controller = sequences.pad_controller
+        controller.pad.start_export(directory)
+        loops = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            sequences.handle_pad_data()
+            loops += 1
+        dropped = controller.pad.stop_export()
+        controller.disconnect_pad()
+        USBDeviceList.set_finder()
+        results = {"loops_per_s": loops / duration}
+        for table in ("sensors", "states", "leds"):
+            chunks = SessionExporter.load(directory, table, "stamp")
+            results[f"{table}_rows"] = float(sum(map(len, chunks)))
+            results[f"{table}_dropped"] = float(dropped[table])
+        del chunks
+    return results
+
+
+BENCHMARKS = {
+    "loopback": bench_loopback,
+    "loopback_async": bench_loopback_async,
+    "config": bench_config,
+    "config_lossy": bench_config_lossy,
+    "multipad": bench_multipad,
+    "timing": bench_timing,
+    "timing_async": lambda: bench_timing(engine="async"),
+    "timing_presses": lambda: bench_timing(presses=True),
+    "codec": bench_codec,
+    "led": bench_led,
+    "led_output": bench_led_output,
+    "generator": bench_generator,
+    "model": bench_model,
+    "history": bench_history,
+    "filter": bench_filter,
+    "replay": bench_replay,
+    "export": bench_export,
+}
+
+
+def main(names: list[str]) -> None:
+    for name in names or BENCHMARKS:
+        results = BENCHMARKS[name]()
+        print(f"{name}:")
+        for key, value in results.items():
+            print(f"  {key:<32}{value:12.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,4 +1,5 @@
 import PySide6.QtCore as QtCore
+import PySide6.QtGui as QtGui
 import PySide6.QtWidgets as QtWidgets
 
 
@@ -10,6 +11,8 @@ class ConnectionWidget(QtWidgets.QWidget):
     DISCONNECT_PAD_ICON = QtWidgets.QStyle.StandardPixmap.SP_MediaStop
 
     LABEL_STR = "Pad:"
+    DUMP_STATS_KEY = "F12"
+    STEP_STATS_KEY = "F11"
 
     DROP_H_POLICY = QtWidgets.QSizePolicy.Policy.Expanding
     DROP_V_POLICY = QtWidgets.QSizePolicy.Policy.Preferred
@@ -19,6 +22,8 @@ class ConnectionWidget(QtWidgets.QWidget):
 
     REFRESH_CLICKED = QtCore.Signal()
     CONNECT_CLICKED = QtCore.Signal()
+    DUMP_STATS_PRESSED = QtCore.Signal()
+    STEP_STATS_PRESSED = QtCore.Signal()
 
     def __init__(self):
         super(ConnectionWidget, self).__init__()
@@ -43,6 +48,22 @@ class ConnectionWidget(QtWidgets.QWidget):
         self._refresh.clicked.connect(self.REFRESH_CLICKED.emit)
         self._connect.clicked.connect(self.CONNECT_CLICKED.emit)
 
+        self._dump_stats = QtGui.QShortcut(
+            QtGui.QKeySequence(self.DUMP_STATS_KEY), self
+        )
+        self._dump_stats.setContext(
+            QtCore.Qt.ShortcutContext.ApplicationShortcut
+        )
+        self._dump_stats.activated.connect(self.DUMP_STATS_PRESSED.emit)
+
+        self._step_stats = QtGui.QShortcut(
+            QtGui.QKeySequence(self.STEP_STATS_KEY), self
+        )
+        self._step_stats.setContext(
+            QtCore.Qt.ShortcutContext.ApplicationShortcut
+        )
+        self._step_stats.activated.connect(self.STEP_STATS_PRESSED.emit)
+
     def _set_toolbutton_icon(
         self, button: QtWidgets.QToolButton,
         icon: QtWidgets.QStyle.StandardPixmap
@@ -77,5 +98,12 @@ class ConnectionWidget(QtWidgets.QWidget):
     def set_refresh_button_state(self, active: bool) -> None:
         self._refresh.setEnabled(active)
 
+    def set_step_stats(self, text: str) -> None:
+        self._dropdown.setToolTip(text)
+        QtWidgets.QToolTip.showText(
+            self._dropdown.mapToGlobal(QtCore.QPoint(0, 0)), text,
+            self._dropdown
+        )
+
     def get_pad_serial(self,) -> str:
         return self._dropdown.currentText()
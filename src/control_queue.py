@@ -0,0 +1,172 @@
+import collections
+import dataclasses
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from write_scheduler import WriteScheduler
+
+
+@dataclasses.dataclass
+class ControlCommand:
+    packet: bytes
+    reply: int | None = None
+    timeout: float = 0.25
+    retries: int = 0
+    on_send: Callable[[], None] | None = None
+    future: Future = dataclasses.field(default_factory=Future)
+    attempts: int = 0
+    stale: int = 0
+    ticket: int = 0
+    sent: float = 0.0
+    deadline: float = 0.0
+
+
+class ControlQueue:
+    """Ordered control packets for one pad, each with a completion future.
+
+    Commands are handed to the write scheduler in submission order. A
+    command expecting a reply holds back the rest of the queue until a
+    packet with its reply header arrives, and is resent on timeout or a
+    failed write up to its retry count. Any other command completes once
+    the scheduler has written it, or fails with OSError if the write
+    failed. Futures are resolved, and their callbacks run, from
+    service() and handle_reply() in the data process.
+
+    Replies carry no sequence number, so one that arrived before the
+    awaited attempt was queued is dropped as stale. While attempts of an
+    earlier command may still be answered, because it was resent or timed
+    out with fewer stale replies than attempts, so is every reply until
+    the last of those attempts has had its timeout.
+    """
+
+    TIMEOUT = 0.25
+    RETRIES = 2
+
+    def __init__(self, scheduler: WriteScheduler):
+        self._scheduler = scheduler
+        self._pending: collections.deque[ControlCommand] = collections.deque()
+        self._written: collections.deque[ControlCommand] = collections.deque()
+        self._awaiting: ControlCommand | None = None
+        self._tickets = scheduler.control_sent
+        self._quiet_until = 0.0
+        self._retries = 0
+        self._timeouts = 0
+        self._failures = 0
+        self._stale = 0
+
+    def submit(
+        self, packet: ..., reply: int | None = None,
+        timeout: float = TIMEOUT, retries: int = RETRIES,
+        on_send: Callable[[], None] | None = None
+    ) -> Future:
+        """Queue a packet, on_send runs when it is handed to the scheduler."""
+        command = ControlCommand(
+            bytes(packet), reply, timeout, retries, on_send
+        )
+        self._pending.append(command)
+        return command.future
+
+    def service(self) -> None:
+        now = time.perf_counter()
+        finished = []
+        sent = self._scheduler.control_sent
+        failed = set()
+        if self._written or self._awaiting:
+            failed.update(self._scheduler.failed_controls())
+        while self._written and self._written[0].ticket <= sent:
+            command = self._written.popleft()
+            error = self._failed() if command.ticket in failed else None
+            finished.append((command, error))
+        while self._written and now >= self._written[0].deadline:
+            finished.append((self._written.popleft(), self._timeout()))
+        command = self._awaiting
+        if command is not None and command.ticket in failed:
+            # This attempt never reached the pad, so brings no reply.
+            command.stale += 1
+            command.deadline = now
+            error = self._failed()
+        else:
+            error = None
+        if command is not None and now >= command.deadline:
+            if command.attempts <= command.retries:
+                self._retries += 1
+                self._send(command, now)
+            else:
+                self._awaiting = None
+                if command.stale < command.attempts:
+                    self._quiet_until = now + command.timeout
+                finished.append((command, error or self._timeout()))
+        while self._pending and self._awaiting is None:
+            command = self._pending.popleft()
+            self._send(command, now)
+            if command.reply is None:
+                self._written.append(command)
+            else:
+                self._awaiting = command
+        for command, error in finished:
+            if error is None:
+                command.future.set_result(None)
+            else:
+                command.future.set_exception(error)
+
+    def _send(self, command: ControlCommand, now: float) -> None:
+        command.attempts += 1
+        self._tickets += 1
+        command.ticket = self._tickets
+        command.sent = now
+        command.deadline = now + command.timeout
+        if command.on_send is not None and command.attempts == 1:
+            command.on_send()
+        self._scheduler.queue_control(command.packet)
+
+    def _failed(self) -> OSError:
+        self._failures += 1
+        return OSError("Control packet could not be written.")
+
+    def _timeout(self) -> TimeoutError:
+        self._timeouts += 1
+        return TimeoutError("Control packet was not acknowledged.")
+
+    def handle_reply(self, data: bytes, stamp: float | None = None) -> bool:
+        """Complete the command awaiting this reply, False if none is.
+
+        stamp is the perf_counter() time the reply arrived over USB.
+        """
+        command = self._awaiting
+        if command is None or not data or data[0] != command.reply:
+            return False
+        if stamp is None:
+            stamp = time.perf_counter()
+        if stamp < command.sent or stamp < self._quiet_until:
+            command.stale += 1
+            self._stale += 1
+            return False
+        self._awaiting = None
+        if command.stale < command.attempts - 1:
+            self._quiet_until = command.deadline
+        command.future.set_result(data)
+        return True
+
+    def cancel(self) -> None:
+        commands = list(self._written) + list(self._pending)
+        if self._awaiting is not None:
+            commands.insert(0, self._awaiting)
+        self._pending.clear()
+        self._written.clear()
+        self._awaiting = None
+        for command in commands:
+            command.future.cancel()
+
+    @property
+    def idle(self) -> bool:
+        return not (self._pending or self._written or self._awaiting)
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "retries": float(self._retries),
+            "timeouts": float(self._timeouts),
+            "write_failures": float(self._failures),
+            "stale_replies": float(self._stale),
+        }
@@ -2,7 +2,7 @@
 from event_info import DataProcessMessage, WidgetMessage
 from pad_model import PadModel
 from profile_controller import ProfileController
-from reflex_controller import ReflexController
+from reflex_controller import ReflexController, ReflexPadInstance
 
 
 class Sequences:
@@ -22,6 +22,7 @@ class Sequences:
         WidgetMessage.INIT: [
             pad_controller.get_all_pads,
             profile_controller.initialise_profile,
+            pad_controller.share_baseline_settings,
             pad_model.get_model_data
         ],
         WidgetMessage.KEYS: [
@@ -32,7 +33,8 @@ class Sequences:
             profile_controller.create_new_profile
         ],
         WidgetMessage.QUIT: [
-            pad_controller.disconnect_pad
+            pad_controller.disconnect_pad,
+            pad_controller.close_key_output
         ],
         WidgetMessage.REFRESH: [
             pad_controller.enumerate_pads,
@@ -45,7 +47,8 @@ class Sequences:
             profile_controller.save_user_profile
         ],
         WidgetMessage.SELECT: [
-            profile_controller.load_user_profile
+            profile_controller.load_user_profile,
+            lambda name: pad_controller.share_baseline_settings()
         ],
         WidgetMessage.REMOVE: [
             profile_controller.remove_user_profile
@@ -59,6 +62,12 @@ class Sequences:
         WidgetMessage.PUSH_PROFILE: [
             pad_controller.push_profile
         ],
+        WidgetMessage.DUMP_STATS: [
+            pad_controller.dump_timing
+        ],
+        WidgetMessage.STEP_STATS: [
+            pad_controller.step_stats
+        ],
         "DP_profile_read_reply": [lambda data: pad_controller.process_read_profile_reply(data)],
     }
 
@@ -85,15 +94,22 @@ class Sequences:
             DataProcessMessage.PROFILE_SAVED,
         pad_controller.push_profile: 
             DataProcessMessage.PROFILE_PUSHED,
+        pad_controller.step_stats:
+            DataProcessMessage.STEP_STATS,
     }
 
     def handle_pad_data(self) -> bool:
-        if not (pad := self.pad_controller.pad):
+        if not (pads := self.pad_controller.service_order()):
             return False
-        pad.handle_sensor_data()
+        for pad in pads:
+            self.handle_single_pad(pad)
+        return True
+
+    def handle_single_pad(self, pad: ReflexPadInstance) -> None:
+        new_data = pad.handle_sensor_data()
+        pad.handle_control_data()
         if pad._sensors.refreshed:
-            self.pad_model.set_baseline(pad.pad_data)
-        else:
-            self.pad_model.set_sensor_data(pad.pad_data)
+            pad.model.set_baseline(pad.pad_data)
+        elif new_data:
+            pad.update_model()
         pad.handle_light_data()
-        return True
@@ -16,6 +16,8 @@ class WidgetMessage:
     VIEW_UPDATED = "GUI_view_updated"
     KEYS = "GUI_keys"
     PUSH_PROFILE = "GUI_push_profile"
+    DUMP_STATS = "GUI_dump_stats"
+    STEP_STATS = "GUI_step_stats"
 
 class DataProcessMessage:
     """Message string to pass over queue from Data process event to Widget."""
@@ -30,3 +32,4 @@ class DataProcessMessage:
     PROFILE_REMOVED = "DP_profile_removed"
     SENSOR_UPDATED = "DP_sensor_updated"
     PROFILE_PUSHED = "DP_profile_pushed"
+    STEP_STATS = "DP_step_stats"
@@ -0,0 +1,70 @@
+import collections
+
+import numpy as np
+
+
+class FrameCache:
+    """Least recently used cache of rendered LED frames.
+
+    Keys start with the name of the effect that drew the frame, followed
+    by whatever else the frame depends on, so an effect whose parameters
+    change can drop its frames with invalidate(). Memory is bounded by
+    the bytes of the cached arrays; a cache of zero bytes stores nothing.
+    """
+
+    MAX_BYTES = 4 << 20
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._frames: collections.OrderedDict[tuple, np.ndarray] = (
+            collections.OrderedDict()
+        )
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: tuple) -> np.ndarray | None:
+        if (frame := self._frames.get(key)) is None:
+            self._misses += 1
+            return None
+        self._frames.move_to_end(key)
+        self._hits += 1
+        return frame
+
+    def put(self, key: tuple, frame: np.ndarray) -> None:
+        if frame.nbytes > self._max_bytes:
+            return
+        if (old := self._frames.pop(key, None)) is not None:
+            self._bytes -= old.nbytes
+        frame = frame.copy()
+        frame.flags.writeable = False
+        self._frames[key] = frame
+        self._bytes += frame.nbytes
+        while self._bytes > self._max_bytes:
+            _, evicted = self._frames.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._evictions += 1
+
+    def invalidate(self, effect: str | None = None) -> None:
+        """Drop every frame of one effect, or of all effects."""
+        keys = [
+            key for key in self._frames if effect is None or key[0] == effect
+        ]
+        for key in keys:
+            self._bytes -= self._frames.pop(key).nbytes
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def stats(self) -> dict[str, float]:
+        lookups = self._hits + self._misses
+        return {
+            "frames": float(len(self._frames)),
+            "bytes": float(self._bytes),
+            "hits": float(self._hits),
+            "misses": float(self._misses),
+            "evictions": float(self._evictions),
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+        }
@@ -99,3 +99,18 @@ class GUIHandlers:
              QtWidgets.QMessageBox.critical(
                  None, "Profile Push", "Failed to push profile to RE:Flex Device."
              )
+
+    def step_stats_received(
+        self, stats: dict[str, list[dict[str, float]]]
+    ) -> None:
+        lines = []
+        for serial, panels in stats.items():
+            lines.append(f"{serial}:")
+            for index, panel in enumerate(panels):
+                values = ", ".join(
+                    f"{key} {value:.1f}" for key, value in panel.items()
+                )
+                lines.append(f"  panel {index}: {values}")
+        self._connection_widget.set_step_stats(
+            "\n".join(lines) or "No pads connected."
+        )
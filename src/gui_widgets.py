@@ -25,6 +25,7 @@ class DataReceiveSignaller(QtWidgets.QWidget):
     SENSOR_UPDATED = QtCore.Signal(bool)
     KEYS_UPDATED = QtCore.Signal()
     PROFILE_PUSHED = QtCore.Signal(bool)
+    STEP_STATS = QtCore.Signal(dict)
 
     def __init__(self):
         super(DataReceiveSignaller, self).__init__()
@@ -42,6 +43,10 @@ class Widgets:
         self.hooks = {
             self.connection_widget.CONNECT_CLICKED: WidgetMessage.CONNECT,
             self.connection_widget.REFRESH_CLICKED: WidgetMessage.REFRESH,
+            self.connection_widget.DUMP_STATS_PRESSED:
+                WidgetMessage.DUMP_STATS,
+            self.connection_widget.STEP_STATS_PRESSED:
+                WidgetMessage.STEP_STATS,
             self.pad_widget.FRAME_READY: WidgetMessage.FRAME_READY,
             self.pad_widget.NEW_SENS_VALUE: WidgetMessage.SENSOR_UPDATE,
             self.pad_widget.VIEW_UPDATED: WidgetMessage.VIEW_UPDATED,
@@ -72,6 +77,8 @@ class Widgets:
             WidgetMessage.VIEW_UPDATED: [],
             WidgetMessage.KEYS: [self.profile_widget.get_keys],
             WidgetMessage.PUSH_PROFILE: [],
+            WidgetMessage.DUMP_STATS: [],
+            WidgetMessage.STEP_STATS: [],
         }
 
         self.process_requests = {
@@ -86,6 +93,7 @@ class Widgets:
             DataProcessMessage.PROFILE_SAVED: self.signals.PROFILE_SAVED,
             DataProcessMessage.SENSOR_UPDATED: self.signals.SENSOR_UPDATED,
             DataProcessMessage.PROFILE_PUSHED: self.signals.PROFILE_PUSHED,
+            DataProcessMessage.STEP_STATS: self.signals.STEP_STATS,
         }
 
         self.signal_handlers = {
@@ -100,4 +108,5 @@ class Widgets:
             self.signals.PROFILE_SAVED: self.handlers.profile_saved,
             self.signals.SENSOR_UPDATED: self.handlers.sensor_updated,
             self.signals.PROFILE_PUSHED: self.handlers.profile_pushed,
+            self.signals.STEP_STATS: self.handlers.step_stats_received,
         }
@@ -0,0 +1,331 @@
+import abc
+import collections
+import dataclasses
+import os
+import struct
+import threading
+import time
+
+import keyboard
+
+from usb_stats import LatencyHistogram
+
+
+class KeyBackend(abc.ABC):
+    """Sends key presses and releases to the operating system."""
+
+    # Fast enough to send from the sensor loop, see KeyEmitter.
+    INLINE = False
+
+    @abc.abstractmethod
+    def press(self, key: str) -> None:
+        pass
+
+    @abc.abstractmethod
+    def release(self, key: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class KeyboardBackend(KeyBackend):
+    """Keys through the keyboard library, on every platform."""
+
+    INLINE = True
+
+    def press(self, key: str) -> None:
+        keyboard.press(key)
+
+    def release(self, key: str) -> None:
+        keyboard.release(key)
+
+
+class UinputBackend(KeyBackend):
+    """Keys from a virtual keyboard created directly through /dev/uinput.
+
+    Linux only, and the user needs write access to /dev/uinput.
+    """
+
+    INLINE = True
+    PATH = "/dev/uinput"
+    NAME = b"RE:Flex Dance Pad"
+    EV_SYN = 0x00
+    EV_KEY = 0x01
+    SYN_REPORT = 0
+    UI_DEV_CREATE = 0x5501
+    UI_DEV_DESTROY = 0x5502
+    UI_SET_EVBIT = 0x40045564
+    UI_SET_KEYBIT = 0x40045565
+    # Legacy uinput_user_dev: name, input_id, ff_effects_max, 4 x absinfo.
+    USER_DEV = struct.Struct("<80sHHHHI256i")
+    EVENT = struct.Struct("llHHi")
+    BUS_USB = 0x03
+
+    KEY_CODES = {
+        **{c: i + 2 for i, c in enumerate("1234567890")},
+        **{c: i + 16 for i, c in enumerate("qwertyuiop")},
+        **{c: i + 30 for i, c in enumerate("asdfghjkl")},
+        **{c: i + 44 for i, c in enumerate("zxcvbnm")},
+        **{f"f{i + 1}": i + 59 for i in range(10)},
+        "f11": 87, "f12": 88, "esc": 1, "-": 12, "=": 13,
+        "backspace": 14, "tab": 15, "[": 26, "]": 27, "enter": 28,
+        ";": 39, "'": 40, "`": 41, "\\": 43, ",": 51, ".": 52, "/": 53,
+        " ": 57, "space": 57, "up": 103, "left": 105, "right": 106,
+        "down": 108,
+    }
+
+    def __init__(self):
+        import fcntl
+        self._ioctl = fcntl.ioctl
+        self._fd = os.open(self.PATH, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            self._ioctl(self._fd, self.UI_SET_EVBIT, self.EV_KEY)
+            for code in set(self.KEY_CODES.values()):
+                self._ioctl(self._fd, self.UI_SET_KEYBIT, code)
+            os.write(self._fd, self.USER_DEV.pack(
+                self.NAME, self.BUS_USB, 0, 0, 1, 0, *[0] * 256
+            ))
+            self._ioctl(self._fd, self.UI_DEV_CREATE)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _emit(self, key: str, value: int) -> None:
+        code = self.KEY_CODES.get(key.lower())
+        if code is None:
+            raise ValueError(f"No uinput key code for {key!r}.")
+        os.write(
+            self._fd,
+            self.EVENT.pack(0, 0, self.EV_KEY, code, value)
+            + self.EVENT.pack(0, 0, self.EV_SYN, self.SYN_REPORT, 0)
+        )
+
+    def press(self, key: str) -> None:
+        self._emit(key, 1)
+
+    def release(self, key: str) -> None:
+        self._emit(key, 0)
+
+    def close(self) -> None:
+        self._ioctl(self._fd, self.UI_DEV_DESTROY)
+        os.close(self._fd)
+
+
+class NullBackend(KeyBackend):
+    """Discards every key."""
+
+    INLINE = True
+
+    def press(self, key: str) -> None:
+        pass
+
+    def release(self, key: str) -> None:
+        pass
+
+
+class RecordingBackend(NullBackend):
+    """Keeps (perf_counter time, key, pressed) of every key sent."""
+
+    def __init__(self):
+        self.events: list[tuple[float, str, bool]] = []
+
+    def press(self, key: str) -> None:
+        self.events.append((time.perf_counter(), key, True))
+
+    def release(self, key: str) -> None:
+        self.events.append((time.perf_counter(), key, False))
+
+
+@dataclasses.dataclass
+class KeyEvent:
+    key: str
+    pressed: bool
+    queued: float
+    stamp: float | None = None
+    latency: LatencyHistogram | None = None
+
+
+class KeyEmitter:
+    """Sends key edges inline or from a dedicated thread.
+
+    Edges for an INLINE backend are sent from push() itself. For any other
+    backend push() only appends to a deque, which is atomic without a
+    lock, and wakes the emitter thread, so a slow backend cannot stall the
+    sensor loop. That costs latency: the thread has to wait for the busy
+    sensor loop to give up the GIL, about 1 ms per edge against a few
+    microseconds inline. Each key is held while any panel mapped to it is
+    pressed, so overlapping presses of one key, from several pads or
+    panels, are coalesced into a single press and release. Backend errors
+    are counted, not raised, so one bad key cannot stop the sensor loop
+    or the thread.
+    """
+
+    KEYBOARD = "keyboard"
+    UINPUT = "uinput"
+    NULL = "null"
+    RECORDING = "recording"
+    BACKENDS = {
+        KEYBOARD: KeyboardBackend,
+        UINPUT: UinputBackend,
+        NULL: NullBackend,
+        RECORDING: RecordingBackend,
+    }
+    WAIT = 0.1
+
+    _shared = None
+
+    def __init__(
+        self, backend: KeyBackend | str = KEYBOARD,
+        threaded: bool | None = None
+    ):
+        """threaded forces the emitter thread on or off for any backend."""
+        self._backend = self.create_backend(backend)
+        self._threaded = threaded
+        self._events: collections.deque[KeyEvent] = collections.deque()
+        self._wake = threading.Event()
+        self._held = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self.reset_stats()
+
+    @classmethod
+    def create_backend(cls, backend: KeyBackend | str) -> KeyBackend:
+        if isinstance(backend, KeyBackend):
+            return backend
+        if backend not in cls.BACKENDS:
+            raise ValueError(f"Unknown key backend {backend}.")
+        return cls.BACKENDS[backend]()
+
+    @classmethod
+    def shared(cls, backend: KeyBackend | str | None = None) -> "KeyEmitter":
+        """The emitter every PadModel of this process uses by default.
+
+        Passing a backend switches the shared emitter over to it.
+        """
+        if cls._shared is None:
+            cls._shared = KeyEmitter(backend or cls.KEYBOARD)
+        elif backend is not None:
+            cls._shared.backend = backend
+        return cls._shared
+
+    def push(
+        self, key: str, pressed: bool, stamp: float | None = None,
+        latency: LatencyHistogram | None = None
+    ) -> None:
+        """Send or queue an edge, with the USB arrival time of its sample.
+
+        When given, latency records the time from stamp to emission.
+        """
+        event = KeyEvent(key, pressed, time.perf_counter(), stamp, latency)
+        if not self.threaded:
+            with self._lock:
+                self._emit(event)
+            return
+        if not self._running:
+            self.start()
+        self._events.append(event)
+        self._wake.set()
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the thread, release every held key and close the backend."""
+        if self._running:
+            self._running = False
+            self._wake.set()
+            self._thread.join()
+        with self._lock:
+            self._release_all()
+            self._backend.close()
+
+    def _run(self) -> None:
+        while self._running:
+            self._wake.wait(self.WAIT)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Emit every queued edge, called by the emitter thread."""
+        with self._lock:
+            while self._events:
+                self._emit(self._events.popleft())
+
+    def _emit(self, event: KeyEvent) -> None:
+        held = self._held[event.key]
+        if event.pressed:
+            self._held[event.key] += 1
+            if held:
+                self._coalesced += 1
+                return
+            self._send(self._backend.press, event.key)
+        else:
+            if held > 1:
+                self._held[event.key] -= 1
+                self._coalesced += 1
+                return
+            del self._held[event.key]
+            if not held:
+                self._coalesced += 1
+                return
+            self._send(self._backend.release, event.key)
+        now = time.perf_counter()
+        self._latency.record(now - event.queued)
+        if event.latency is not None and event.stamp is not None:
+            event.latency.record(now - event.stamp)
+
+    def _release_all(self) -> None:
+        for key in self._held:
+            self._send(self._backend.release, key)
+        self._held.clear()
+
+    def _send(self, function: ..., key: str) -> None:
+        try:
+            function(key)
+        except Exception:
+            self._errors += 1
+        else:
+            self._emitted += 1
+
+    @property
+    def backend(self) -> KeyBackend:
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: KeyBackend | str) -> None:
+        """Switch backends, keys held on the old one are released."""
+        backend = self.create_backend(backend)
+        with self._lock:
+            self._release_all()
+            self._backend.close()
+            self._backend = backend
+
+    @property
+    def threaded(self) -> bool:
+        if self._threaded is None:
+            return not self._backend.INLINE
+        return self._threaded
+
+    def reset_stats(self) -> None:
+        self._emitted = 0
+        self._coalesced = 0
+        self._errors = 0
+        self._latency = LatencyHistogram()
+
+    @property
+    def latency(self) -> LatencyHistogram:
+        """Seconds from push() until the backend has sent the key."""
+        return self._latency
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "emitted": float(self._emitted),
+            "coalesced": float(self._coalesced),
+            "errors": float(self._errors),
+            "queued": float(len(self._events)),
+        }
@@ -1,6 +1,9 @@
 import time
 
-from pad_model import PadModel, Coord, Colour
+import numpy as np
+
+from frame_cache import FrameCache
+from pad_model import PadModel, Coord, Colour, LEDEntry
 
 
 class LEDDataGenerator:
@@ -50,32 +53,110 @@ class LEDDataGenerator:
         return panel_bases
 
     PANEL_BASES = panel_bases()
+    EFFECT = "rainbow"
+    # Steps for the hue to turn once, after which the animation repeats.
+    HUE_PERIOD = 100
+    # Steps per second, the LED frame rate the animation was tuned at.
+    STEP_RATE = 60.0
+    # Sector i of hsv_to_rgb takes (r, g, b) from these of (v, t, p, q).
+    SECTORS = np.array([
+        [0, 1, 2], [3, 0, 2], [2, 0, 1], [2, 3, 0], [1, 2, 0], [0, 2, 3]
+    ])
 
     def __init__(
-        self, model: PadModel
+        self, model: PadModel, cache: FrameCache | None = None
     ):
         self._t = 0
+        self._start = time.perf_counter()
+        self._period = self.HUE_PERIOD
+        self._phase_step = 1 / self._period
+        self.cache = cache if cache is not None else FrameCache()
         self._model = model
         self._att = 0.01
         self._dec = 0.16
         self._tim = {}
-
-    def update_led_frame(self) -> None:
-        self._t += 1
-        self._current_data = self._model.get_model_data()
-        for panel_coord, panel in self._current_data.panels.items():
-            current_active = True
-            active_leds = self.PANEL_BASES[panel_coord]
-            panel_value = self.get_panel_value(panel_coord, current_active)
-            for led_coord, led in panel.leds.items():
-                if led_coord in active_leds:
-                    led.colour = self.get_led_colour(
-                        panel_coord, led_coord, panel_value
-                    )
+        self._phase_x, self._phase_y, self._mask = self.phase_maps()
+
+    @classmethod
+    def phase_maps(cls) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(panel, led) hue phases along x and y, and the lit arrow mask.
+
+        Arrays are in PadModel PANELS and LEDS order, so they line up
+        with the model's LED framebuffer.
+        """
+        shape = (len(PadModel.PANELS.coords), len(PadModel.LEDS.coords))
+        phase_x = np.zeros(shape)
+        phase_y = np.zeros(shape)
+        mask = np.zeros(shape, bool)
+        for index in np.ndindex(shape):
+            panel = PadModel.PANELS.coords[index[0]]
+            led = PadModel.LEDS.coords[index[1]]
+            phase_x[index], phase_y[index] = cls.led_phase(panel, led)
+            mask[index] = led in cls.PANEL_BASES[panel]
+        return phase_x, phase_y, mask
+
+    @property
+    def hue_period(self) -> int:
+        return self._period
+
+    @hue_period.setter
+    def hue_period(self, period: int):
+        self._period = period
+        self._phase_step = 1 / period
+        self._t %= period
+        self.cache.invalidate(self.EFFECT)
+
+    def update_led_frame(self, now: float | None = None) -> None:
+        """Draw the step due at perf_counter() time now.
+
+        The step follows the time since the generator was created at
+        STEP_RATE, so the animation runs at the same speed however often
+        frames are drawn.
+        """
+        if now is None:
+            now = time.perf_counter()
+        self._t = int((now - self._start) * self.STEP_RATE) % self._period
+        values = [
+            self.get_panel_value(panel_coord, True)
+            for panel_coord in PadModel.PANELS.coords
+        ]
+        self.draw_frame(self._model.get_led_frame(), values)
+
+    def draw_frame(self, frame: np.ndarray, values: list[float]) -> None:
+        """Draw the current step into a (panel, led, rgb) framebuffer.
+
+        Matches get_led_colour for every lit LED, given each panel's value,
+        computed for the whole pad at once. Unlit LEDs are left as they are.
+        The frame depends only on the step and the panels' brightness, so
+        once the hue has turned at a steady brightness every frame comes
+        from the cache.
+        """
+        val = (255 * np.asarray(values, np.float64)).astype(np.int64)
+        key = (self.EFFECT, self._period, tuple(val.tolist()), self._t)
+        if (rgb := self.cache.get(key)) is None:
+            rgb = self.render(val)
+            self.cache.put(key, rgb)
+        np.copyto(frame, rgb, where=self._mask[..., np.newaxis])
+
+    def render(self, val: np.ndarray) -> np.ndarray:
+        """(panel, led, rgb) colours of every LED at the current step."""
+        phase_offset = self._t * self._phase_step
+        hue = (phase_offset + self._phase_x + self._phase_y) * 255
+        hue = hue.astype(np.int64) % 255
+        rgb = self.hsv_to_rgb_array(hue, 255, val[:, np.newaxis])
+        return np.clip(rgb, 0, LEDEntry.B8_MAX).astype(np.uint8)
 
     def get_led_colour(self, panel: Coord, led: Coord, value: float) -> Colour:
-        phase_multiplier = 0.01
-        phase_offset = self._t * phase_multiplier
+        phase_offset = self._t * self._phase_step
+        dir_phase_x, dir_phase_y = self.led_phase(panel, led)
+        hue = int((phase_offset + dir_phase_x + dir_phase_y) * 255) % 255
+        sat = 255
+        val = int(255 * value)
+        r, g, b = self.hsv_to_rgb(hue, sat, val)
+        return (r, g, b)
+
+    @staticmethod
+    def led_phase(panel: Coord, led: Coord) -> tuple[float, float]:
         dir_phase_x = 0
         dir_phase_y = 0
         x = led[0]
@@ -92,11 +173,7 @@ class LEDDataGenerator:
         else:
             dir_phase_x = (11 - x) * 0.1
             dir_phase_y = (11 - y) * 0.02
-        hue = int((phase_offset + dir_phase_x + dir_phase_y) * 255) % 255
-        sat = 255
-        val = int(255 * value)
-        r, g, b = self.hsv_to_rgb(hue, sat, val)
-        return (r, g, b)
+        return dir_phase_x, dir_phase_y
 
     def get_panel_value(self, panel: Coord, active: int) -> float:
         current_time = time.time()
@@ -147,3 +224,23 @@ class LEDDataGenerator:
         else:
             r, g, b = v, p, q
         return int(r * 255), int(g * 255), int(b * 255)
+
+    @classmethod
+    def hsv_to_rgb_array(
+        cls, hi: np.ndarray, si: ..., vi: np.ndarray
+    ) -> np.ndarray:
+        """hsv_to_rgb over broadcast arrays, returns (..., rgb) ints."""
+        h = hi * 360.0 / 255.0
+        s = si / 255.0
+        v = vi / 255.0
+
+        i = (h / 60.0).astype(np.int64) % 6
+        f = (h / 60.0) - i
+        p = v * (1.0 - s)
+        q = v * (1.0 - s * f)
+        t = v * (1.0 - s * (1.0 - f))
+
+        # With s == 0, p, q and t all equal v, as in hsv_to_rgb.
+        vtpq = np.stack(np.broadcast_arrays(v, t, p, q), axis=-1)
+        rgb = np.take_along_axis(vtpq, cls.SECTORS[i], axis=-1)
+        return (rgb * 255).astype(np.int64)
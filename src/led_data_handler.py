@@ -1,8 +1,13 @@
-from multiprocessing.sharedctypes import SynchronizedArray
-from multiprocessing.synchronize import Event
+import time
+
+import numpy as np
 
 from led_data_generator import LEDDataGenerator
-from pad_model import PadModel
+from packet_codec import PacketCodec
+from packet_recorder import PacketRecorder
+from pad_model import Coord, PadModel
+from session_exporter import SessionExporter
+from write_scheduler import WriteScheduler
 
 
 class LEDDataHandler:
@@ -12,6 +17,7 @@ class LEDDataHandler:
     NUM_PANELS = 4
     NUM_FRAMES = 16
     NUM_LEDS = 21
+    PACKETS_PER_FRAME = NUM_PANELS * NUM_SEGMENTS
 
     GAMMA = [
         0,   0,   0,   0,   0,   0,   0,   0,   0,   0,   0,   0,   0,   0,
@@ -34,6 +40,7 @@ class LEDDataHandler:
         210, 213, 215, 218, 220, 223, 225, 228, 231, 233, 236, 239, 241, 244,
         247, 249, 252, 255
     ]
+    GAMMA_LUT = np.array(GAMMA, np.uint8)
     POSITIONS = [
         [
             (5, 0), (5, 1), (4, 1), (5, 2), (4, 2), (3, 2), (5, 3),
@@ -56,54 +63,179 @@ class LEDDataHandler:
             (1, 7),  (5, 6),  (4, 6),  (3, 6), (2, 6), (1, 6), (0, 6)
         ]
     ]
+    # RGB channel of each byte of an LED, which the pad takes as GRB.
+    CHANNELS = (1, 0, 2)
+
+    @staticmethod
+    def packet_index(
+        positions: list[list[Coord]], channels: tuple[int, ...]
+    ) -> np.ndarray:
+        """Flat PadModel framebuffer offset of each LED packet data byte.
+
+        Indexed by (panel, segment, byte), so the data of one packet is a
+        single np.take of the (panel, led, rgb) framebuffer.
+        """
+        leds = {coord: led for led, coord in enumerate(PadModel.LEDS.coords)}
+        num_leds = len(leds)
+        return np.array([
+            [
+                [
+                    (panel * num_leds + leds[coord]) * 3 + channel
+                    for coord in segment for channel in channels
+                ]
+                for segment in positions
+            ]
+            for panel in range(len(PadModel.PANELS.coords))
+        ], np.intp)
+
+    INDEX = packet_index(POSITIONS, CHANNELS)
+    # Packets of a frame are sent panel by panel, segment by segment.
+    FRAME_INDEX = INDEX.reshape(PACKETS_PER_FRAME, -1)
 
-    def __init__(self, data: SynchronizedArray, event: Event, model: PadModel):
-        self._data = data
-        self._generator = LEDDataGenerator(model)
-        self._event = event
+    @staticmethod
+    def frame_headers(
+        num_frames: int, num_panels: int, num_segments: int
+    ) -> np.ndarray:
+        """Header byte of each (frame, packet) in sending order."""
+        return np.array([
+            [
+                PacketCodec.led_header(panel, segment, frame)
+                for panel in range(num_panels)
+                for segment in range(num_segments)
+            ]
+            for frame in range(num_frames)
+        ], np.uint8)
+
+    HEADERS = frame_headers(NUM_FRAMES, NUM_PANELS, NUM_SEGMENTS)
+
+    # Frames start at most this often; packets of unchanged segments are
+    # skipped, so frames of a mostly static pad go out faster than the
+    # packet rate alone would allow.
+    MAX_FPS = 120.0
+    # Seconds after which an unchanged segment is sent again anyway.
+    KEEP_ALIVE = 0.25
+
+    def __init__(
+        self, scheduler: WriteScheduler, model: PadModel,
+        max_fps: float = MAX_FPS, keep_alive: float = KEEP_ALIVE
+    ):
+        self._scheduler = scheduler
+        self.recorder: PacketRecorder | None = None
+        self.exporter: SessionExporter | None = None
+        # None leaves the model's LED frame to be drawn elsewhere.
+        self.generator: LEDDataGenerator | None = LEDDataGenerator(model)
         self._model = model
-        self._segment = -1
-        self._panel = -1
-        self._frame = -1
-        self._led_data = {}
-        self._frame_change = False
-
-    def setup_frame_data(self) -> int:
-        self._segment = (self._segment + 1) % self.NUM_SEGMENTS
-        if self._segment == 0:
-            self._panel = (self._panel + 1) % self.NUM_PANELS
-            if self._panel == 0:
-                self._frame_change = True
-                self._frame = (self._frame + 1) % self.NUM_FRAMES
-                self._led_data = self._model.get_led_data()
-
-        return (self._panel << 6) | (self._segment << 4) | (self._frame)
-
-    def get_data_byte(self, byte_index: int) -> int:
-        panel_coord = PadModel.PANELS.coords[self._panel]
-        if (panel_data := self._led_data.get(panel_coord, None)) is None:
-            return 0
-        led_index = (byte_index // 3)
-        led_coord = self.POSITIONS[self._segment][led_index]
-        led = panel_data[led_coord]
-        if byte_index % 3 == 0:
-            col = led.green
-        elif byte_index % 3 == 1:
-            col = led.red
-        else:
-            col = led.blue
-        return self.GAMMA[col]
+        self._banks = np.zeros(
+            (2, self.PACKETS_PER_FRAME, 1 + self.NUM_LEDS * 3), np.uint8
+        )
+        self._front = 0
+        self._back_ready = False
+        self._frame = 0
+        self._frame_period = 1 / max_fps
+        self._keep_alive = keep_alive
+        self._next_frame = 0.0
+        # Data last queued for each packet, and when.
+        self._sent = np.zeros(
+            (self.PACKETS_PER_FRAME, self.NUM_LEDS * 3), np.uint8
+        )
+        self._sent_at = np.full(self.PACKETS_PER_FRAME, -np.inf)
+        self._due = np.zeros(0, np.intp)
+        self._position = 0
+        self._start = time.perf_counter()
+        self._frames = 0
+        self._packets = 0
+        self._skipped = 0
+        self._panel_updates = np.zeros(self.NUM_PANELS, np.int64)
+
+    def encode_frame(self, bank: np.ndarray, frame: int) -> np.ndarray:
+        """Encode every packet of the model's LED frame into a bank.
+
+        bank is a (packets, bytes) array, filled in sending order.
+        """
+        bank[:, 0] = self.HEADERS[frame]
+        data = bank[:, 1:]
+        np.take(self._model.get_led_frame(), self.FRAME_INDEX, out=data)
+        np.take(self.GAMMA_LUT, data, out=data)
+        return bank
+
+    def invalidate(self) -> None:
+        """Send every segment of the next frame, changed or not."""
+        self._sent_at[:] = -np.inf
+
+    def _fill_back(self) -> None:
+        self.encode_frame(self._banks[1 - self._front], self._frame)
+        self._frame = (self._frame + 1) % self.NUM_FRAMES
+        self._back_ready = True
+
+    def _swap_banks(self, now: float) -> None:
+        if not self._back_ready:
+            self._fill_back()
+        self._front = 1 - self._front
+        self._back_ready = False
+        data = self._banks[self._front, :, 1:]
+        changed = (data != self._sent).any(axis=1)
+        due = changed | (now - self._sent_at >= self._keep_alive)
+        self._due = np.flatnonzero(due)
+        self._position = 0
+        self._sent[due] = data[due]
+        self._sent_at[due] = now
+        self._frames += 1
+        self._skipped += self.PACKETS_PER_FRAME - len(self._due)
+        self._panel_updates += changed.reshape(self.NUM_PANELS, -1).any(1)
+        if self.exporter is not None:
+            self.exporter.append(
+                "leds", stamp=now, colours=self._model.get_led_frame()
+            )
 
     def give_sample(self) -> None:
-        if not self._event.is_set():
+        """Send the next changed or stale packet of the front bank.
+
+        The back bank is encoded in one pass once the generator has drawn
+        the next frame, and the banks swap at the frame boundary, so every
+        frame sent is a consistent snapshot of the model. Only segments
+        that differ from what the pad was last sent, or that have not been
+        sent for keep_alive seconds, are queued, so the packet slots of a
+        static segment go to the frames of changing ones.
+        """
+        if not self._scheduler.ready:
             return
-        frame_byte = self.setup_frame_data()
-        led_data = [self.get_data_byte(i) for i in range(63)]
-        frame_data = [frame_byte, *led_data]
-        with self._data.get_lock():
-            for index in range(64):
-                self._data[index] = frame_data[index]
-        if self._frame_change:
-            self._generator.update_led_frame()
-            self._frame_change = False
-        self._event.clear()
+        if self._position == len(self._due):
+            now = time.perf_counter()
+            if now < self._next_frame:
+                return
+            self._next_frame = now + self._frame_period
+            self._swap_banks(now)
+            if self.generator is not None:
+                self.generator.update_led_frame(now)
+            self._fill_back()
+            if not len(self._due):
+                return
+        packet = self._banks[self._front, self._due[self._position]]
+        self._position += 1
+        self._scheduler.queue_led(packet)
+        self._packets += 1
+        if self.recorder is not None:
+            self.recorder.record(PacketRecorder.OUT, packet)
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Packets sent and skipped, and each panel's update rate.
+
+        update_rate_N is the number of frames a second in which any
+        segment of panel N changed and was sent.
+        """
+        elapsed = time.perf_counter() - self._start
+        total = self._packets + self._skipped
+        stats = {
+            "frames_per_s": self._frames / elapsed,
+            "packets_sent": float(self._packets),
+            "packets_skipped": float(self._skipped),
+            "bandwidth_saved": self._skipped / total if total else 0.0,
+        }
+        for coord, updates in zip(
+            PadModel.PANELS.coords, self._panel_updates
+        ):
+            stats[f"update_rate_{coord[0]}{coord[1]}"] = float(
+                updates / elapsed
+            )
+        return stats
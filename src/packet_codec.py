@@ -0,0 +1,159 @@
+import struct
+
+import numpy as np
+
+from pad_model import PadModel, ProfilePadData
+
+
+class PacketCodec:
+    """Encodes and decodes every RE:Flex v2 packet type, see INTERFACE.md.
+
+    Single packets go through precompiled structs or NumPy views; the
+    batch methods take and return (n, 64) uint8 arrays, one row per
+    packet, so many pads or many recorded packets are converted in one
+    NumPy operation.
+    """
+
+    PACKET_BYTES = 64
+    NUM_PANELS = 4
+    NUM_SENSORS = 4
+    NUM_LEDS = 21
+
+    ENTER_CONFIG = bytes.fromhex(
+        "b6da3dc8904aae1587f7ee9913c8bc5f4e616d7b7505c4b36220c9a7841866d1"
+        "872782b87caae1bf41c001c457d4e1e3d54b5db6a6c16768a615735f43c95ab3"
+    )
+    EXIT_CONFIG = bytes.fromhex(
+        "7f5455b20d201105e64b9852cf4911475cefae3d39bde6baa12d69b14df3c61d"
+        "71ffbc33091fd41034e545b0fae189dafc3a32dfe97a8dd6b7238b33bdd65ea6"
+    )
+    PROFILE_PUSH = 0xF0
+    PROFILE_READ = 0xF1
+    READ_REQUEST = bytes([PROFILE_READ]).ljust(PACKET_BYTES, b'\x00')
+
+    DEFAULT_SENSOR = (30, 5)
+    DEFAULT_KEY = ' '
+
+    # Header, 16 x (threshold, hysteresis), 4 keys, 27 unused bytes.
+    PROFILE = struct.Struct('<37B27x')
+    PROFILE_FIELDS = slice(1, 37)
+    # 16 little-endian readings, panel by panel, 32 unused bytes.
+    SENSOR_DTYPE = np.dtype('<u2')
+    SENSOR_COUNT = NUM_PANELS * NUM_SENSORS
+    SENSOR_BYTES = 32
+
+    @classmethod
+    def _profile_fields(cls, profile: ProfilePadData) -> list[int]:
+        """The 36 profile fields following the header, in packet order.
+
+        Fields are not masked to bytes, see encode_profile.
+        """
+        fields = []
+        keys = []
+        default = ({}, cls.DEFAULT_KEY)
+        for panel in PadModel.PANELS.coords:
+            sensor_data, key = profile.get(panel, default)
+            for sensor in PadModel.SENSORS.coords:
+                fields += sensor_data.get(sensor, cls.DEFAULT_SENSOR)
+            keys.append(ord(key[0]) if key else 0)
+        return fields + keys
+
+    @staticmethod
+    def _profile_from_fields(fields: ..., pos: int = 0) -> ProfilePadData:
+        """Profile from the 36 fields starting at fields[pos]."""
+        keys = pos + 32
+        profile = {}
+        for p, panel in enumerate(PadModel.PANELS.coords):
+            sensor_data = {}
+            for sensor in PadModel.SENSORS.coords:
+                sensor_data[sensor] = (fields[pos], fields[pos + 1])
+                pos += 2
+            profile[panel] = (sensor_data, chr(fields[keys + p]))
+        return profile
+
+    @classmethod
+    def encode_profile(
+        cls, profile: ProfilePadData, header: int = PROFILE_PUSH
+    ) -> bytes:
+        fields = cls._profile_fields(profile)
+        try:
+            return cls.PROFILE.pack(header, *fields)
+        except struct.error:
+            # Out of range values are sent as their low byte.
+            return cls.PROFILE.pack(header, *[f & 0xFF for f in fields])
+
+    @classmethod
+    def decode_profile(cls, packet: ...) -> ProfilePadData:
+        return cls._profile_from_fields(cls.PROFILE.unpack_from(packet), 1)
+
+    @classmethod
+    def encode_profiles(
+        cls, profiles: list[ProfilePadData], header: int = PROFILE_PUSH
+    ) -> np.ndarray:
+        packets = np.zeros((len(profiles), cls.PACKET_BYTES), np.uint8)
+        packets[:, 0] = header
+        if profiles:
+            packets[:, cls.PROFILE_FIELDS] = np.bitwise_and([
+                cls._profile_fields(profile) for profile in profiles
+            ], 0xFF)
+        return packets
+
+    @classmethod
+    def decode_profiles(cls, packets: np.ndarray) -> list[ProfilePadData]:
+        rows = packets[:, cls.PROFILE_FIELDS].tolist()
+        return [cls._profile_from_fields(row) for row in rows]
+
+    @classmethod
+    def encode_sensor(cls, values: ...) -> bytes:
+        data = np.asarray(values, cls.SENSOR_DTYPE).tobytes()
+        return data.ljust(cls.PACKET_BYTES, b'\x00')
+
+    @classmethod
+    def decode_sensor(cls, packet: ...) -> np.ndarray:
+        """(panels, sensors) read-only view of a packet's readings.
+
+        Reading index i is at flat index i, see PadModel.SENSOR_COORDS.
+        """
+        values = np.frombuffer(packet, cls.SENSOR_DTYPE, cls.SENSOR_COUNT)
+        return values.reshape(cls.NUM_PANELS, cls.NUM_SENSORS)
+
+    @classmethod
+    def encode_sensors(cls, values: np.ndarray) -> np.ndarray:
+        packets = np.zeros((len(values), cls.PACKET_BYTES), np.uint8)
+        values = np.asarray(values, cls.SENSOR_DTYPE)
+        packets[:, :cls.SENSOR_BYTES] = (
+            values.reshape(len(values), -1).view(np.uint8)
+        )
+        return packets
+
+    @classmethod
+    def decode_sensors(cls, packets: np.ndarray) -> np.ndarray:
+        """(n, panels, sensors) readings of (n, 64) packets."""
+        data = np.ascontiguousarray(packets[:, :cls.SENSOR_BYTES])
+        return data.view(cls.SENSOR_DTYPE).reshape(
+            len(packets), cls.NUM_PANELS, cls.NUM_SENSORS
+        )
+
+    @staticmethod
+    def led_header(panel: int, segment: int, frame: int) -> int:
+        return (panel << 6) | (segment << 4) | frame
+
+    @staticmethod
+    def split_led_header(header: int) -> tuple[int, int, int]:
+        return header >> 6, (header >> 4) & 0x03, header & 0x0F
+
+    @classmethod
+    def encode_leds(cls, headers: ..., grb: np.ndarray) -> np.ndarray:
+        """(n, 64) packets from n headers and (n, 21, 3) gamma'd colours."""
+        packets = np.empty((len(headers), cls.PACKET_BYTES), np.uint8)
+        packets[:, 0] = headers
+        packets[:, 1:] = np.asarray(grb, np.uint8).reshape(len(headers), -1)
+        return packets
+
+    @classmethod
+    def decode_leds(
+        cls, packets: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Headers and (n, 21, 3) colours of (n, 64) LED packets."""
+        grb = packets[:, 1:].reshape(len(packets), cls.NUM_LEDS, 3)
+        return packets[:, 0].copy(), grb.copy()
@@ -0,0 +1,219 @@
+import array
+import pathlib
+import time
+
+import numpy as np
+
+from write_scheduler import WriteScheduler
+
+
+class PacketRecorder:
+    """Appends timestamped raw packets to a preallocated memory-mapped file.
+
+    The file is a 16 byte header, a magic string and the record count,
+    followed by fixed 80 byte records. Appending is a slice assignment
+    into the map plus an update of the count, so a recording cut short
+    by a crash is still readable. The file grows by another capacity
+    records whenever it fills, and is truncated to its records on close.
+    """
+
+    MAGIC = b"RFXPKT01"
+    HEADER_BYTES = 16
+    PACKET_BYTES = 64
+    IN = 0
+    OUT = 1
+    # IN packets that answered a config command rather than sensor data.
+    REPLY = 2
+    RECORD = np.dtype([
+        ("stamp", "<f8"),
+        ("direction", "u1"),
+        ("length", "u1"),
+        ("packet", "u1", PACKET_BYTES),
+    ], align=True)
+    CAPACITY = 1 << 20
+
+    def __init__(self, path: str | pathlib.Path, capacity: int = CAPACITY):
+        self._path = pathlib.Path(path)
+        self._capacity = 0
+        self._count = 0
+        self._header: np.memmap | None = None
+        self._records: np.memmap | None = None
+        with open(self._path, 'wb') as f:
+            f.write(self.MAGIC.ljust(self.HEADER_BYTES, b'\x00'))
+        self._grow(capacity)
+
+    def _grow(self, extra: int) -> None:
+        # Windows cannot resize a file while a view of it is mapped.
+        self._unmap()
+        self._capacity += extra
+        size = self.HEADER_BYTES + self._capacity * self.RECORD.itemsize
+        with open(self._path, 'r+b') as f:
+            f.truncate(size)
+        self._header = np.memmap(self._path, np.uint64, 'r+', 8, (1,))
+        self._records = np.memmap(
+            self._path, self.RECORD, 'r+', self.HEADER_BYTES,
+            (self._capacity,)
+        )
+
+    def _unmap(self) -> None:
+        if self._records is not None:
+            self._records.flush()
+            self._header.flush()
+            self._records = self._header = None
+
+    def record(
+        self, direction: int, packet: ..., stamp: float | None = None
+    ) -> None:
+        data = np.frombuffer(packet, np.uint8)
+        if self._count == self._capacity:
+            self._grow(self._capacity)
+        record = self._records[self._count]
+        record["stamp"] = time.perf_counter() if stamp is None else stamp
+        record["direction"] = direction
+        record["length"] = len(data)
+        record["packet"][:len(data)] = data
+        self._count += 1
+        self._header[0] = self._count
+
+    def record_many(
+        self, direction: int | np.ndarray, stamps: np.ndarray,
+        packets: np.ndarray
+    ) -> None:
+        """Append (n,) stamps and (n, bytes) packets, oldest first.
+
+        direction is one for every packet, or an (n,) array of them.
+        """
+        count = len(packets)
+        while self._count + count > self._capacity:
+            self._grow(self._capacity)
+        records = self._records[self._count:self._count + count]
+        records["stamp"] = stamps
+        records["direction"] = direction
+        records["length"] = packets.shape[1]
+        records["packet"][:, :packets.shape[1]] = packets
+        self._count += count
+        self._header[0] = self._count
+
+    def close(self) -> None:
+        self._unmap()
+        size = self.HEADER_BYTES + self._count * self.RECORD.itemsize
+        with open(self._path, 'r+b') as f:
+            f.truncate(size)
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+
+class PacketRecording:
+    """Read-only, memory-mapped view of a PacketRecorder file."""
+
+    def __init__(self, path: str | pathlib.Path):
+        with open(path, 'rb') as f:
+            header = f.read(PacketRecorder.HEADER_BYTES)
+        if header[:8] != PacketRecorder.MAGIC:
+            raise ValueError(f"{path} is not a packet recording.")
+        count = int(np.frombuffer(header, np.uint64, 1, 8)[0])
+        self._records = np.memmap(
+            path, PacketRecorder.RECORD, 'r', PacketRecorder.HEADER_BYTES,
+            (count,)
+        ) if count else np.zeros(0, PacketRecorder.RECORD)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def records(self) -> np.ndarray:
+        return self._records
+
+    def direction(self, direction: int) -> tuple[np.ndarray, np.ndarray]:
+        """(n,) stamps and (n, 64) packets travelling one way."""
+        records = self._records[self._records["direction"] == direction]
+        return records["stamp"], records["packet"]
+
+
+class PacketReplay:
+    """Plays the IN packets of a recording back in place of a pad.
+
+    Config replies are recorded as REPLY, not IN, and are not replayed.
+
+    Duck-types the endpoint, ring and scheduler owner that a
+    ReflexPadInstance drives, so replayed packets go through
+    SensorDataHandler and the rest of Sequences.handle_pad_data. In real
+    time, packets are released at their recorded spacing; otherwise up to
+    BATCH packets are released on every drain. Either way they are
+    stamped with the time they are released. OUT packets queued by the
+    host are taken from the scheduler as a pad would, and discarded.
+    """
+
+    BATCH = 32
+    # 60 frames a second of 16 LED packets each.
+    LED_RATE = 960.0
+
+    def __init__(
+        self, path: str | pathlib.Path, realtime: bool = True,
+        loop: bool = False, packet_rate: float = LED_RATE
+    ):
+        stamps, packets = PacketRecording(path).direction(PacketRecorder.IN)
+        self._offsets = np.asarray(stamps - stamps[0] if len(stamps) else [])
+        self._packets = np.asarray(packets)
+        self._realtime = realtime
+        self._loop = loop
+        self._scheduler = WriteScheduler(
+            PacketRecorder.PACKET_BYTES, packet_rate
+        )
+        self._out = array.array('B', bytes(PacketRecorder.PACKET_BYTES))
+        self._position = 0
+        self._start = time.perf_counter()
+        self._timers = {}
+
+    def drain(
+        self, limit: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self._take_writes()
+        now = time.perf_counter()
+        if self._loop and self.finished:
+            self._position = 0
+            self._start = now
+        if self._realtime:
+            end = int(np.searchsorted(
+                self._offsets, now - self._start, side='right'
+            ))
+        else:
+            end = len(self._packets)
+        end = min(end, self._position + (limit or self.BATCH))
+        seq = np.arange(self._position, end, dtype=np.uint64)
+        packets = self._packets[self._position:end]
+        self._position = end
+        return seq, np.full(len(seq), now), packets
+
+    def _take_writes(self) -> None:
+        while (control := self._scheduler.poll_packet(self._out)) is not None:
+            self._scheduler.count_sent(control)
+
+    def terminate(self) -> None:
+        pass
+
+    @property
+    def finished(self) -> bool:
+        return self._position >= len(self._packets)
+
+    @property
+    def ring(self) -> "PacketReplay":
+        return self
+
+    @property
+    def scheduler(self) -> WriteScheduler:
+        return self._scheduler
+
+    @property
+    def timers(self) -> dict:
+        return self._timers
+
+    @property
+    def overruns(self) -> int:
+        return 0
@@ -0,0 +1,163 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class PacketRing:
+    """Single-producer/single-consumer ring of raw packets in shared memory.
+
+    Each slot holds a sequence number, a perf_counter timestamp and the
+    packet bytes. The producer only ever advances the head counter and the
+    consumer only the tail counter, so neither side takes a lock. When the
+    producer laps a slow consumer the oldest packets are overwritten and
+    counted as overruns on the next drain.
+    """
+
+    HEAD = 0
+    TAIL = 1
+    OVERRUNS = 2
+    CONTROL_WORDS = 4
+
+    def __init__(
+        self, capacity: int, packet_bytes: int, name: str | None = None
+    ):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("Ring capacity must be a power of two.")
+        self._capacity = capacity
+        self._mask = capacity - 1
+        self._packet_bytes = packet_bytes
+        size = self.CONTROL_WORDS * 8 + capacity * (16 + packet_bytes)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._map_arrays()
+        if self._owner:
+            self._control[:] = 0
+
+    def __reduce__(self):
+        return (
+            self.__class__,
+            (self._capacity, self._packet_bytes, self._shm.name)
+        )
+
+    def _map_arrays(self) -> None:
+        buf = self._shm.buf
+        offset = self.CONTROL_WORDS * 8
+        self._control = np.ndarray(
+            (self.CONTROL_WORDS,), np.uint64, buf, 0
+        )
+        self._seq = np.ndarray((self._capacity,), np.uint64, buf, offset)
+        offset += self._capacity * 8
+        self._stamps = np.ndarray((self._capacity,), np.float64, buf, offset)
+        offset += self._capacity * 8
+        self._packets = np.ndarray(
+            (self._capacity, self._packet_bytes), np.uint8, buf, offset
+        )
+
+    def push(self, packet: ..., timestamp: float | None = None) -> None:
+        """Producer side: append one packet, overwriting the oldest if full."""
+        head = int(self._control[self.HEAD])
+        slot = head & self._mask
+        self._stamps[slot] = (
+            time.perf_counter() if timestamp is None else timestamp
+        )
+        self._packets[slot, :len(packet)] = np.frombuffer(packet, np.uint8)
+        self._seq[slot] = head
+        self._control[self.HEAD] = head + 1
+
+    def drain(
+        self, limit: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Consumer side: copy out every pending packet in one go.
+
+        Returns (sequence numbers, timestamps, packets) with one row per
+        packet, oldest first.
+        """
+        head = int(self._control[self.HEAD])
+        tail = int(self._control[self.TAIL])
+        if head - tail > self._capacity:
+            self._count_overruns(head - tail - self._capacity)
+            tail = head - self._capacity
+        count = head - tail
+        if limit is not None:
+            count = min(count, limit)
+        slots = (tail + np.arange(count)) & self._mask
+        seq = self._seq[slots]
+        stamps = self._stamps[slots]
+        packets = self._packets[slots]
+        # Slots the producer reached while we copied may be torn.
+        lapped = int(self._control[self.HEAD]) + 1 - self._capacity - tail
+        if lapped > 0:
+            lapped = min(lapped, count)
+            self._count_overruns(lapped)
+            seq, stamps, packets = seq[lapped:], stamps[lapped:], packets[lapped:]
+        self._control[self.TAIL] = tail + count
+        return seq, stamps, packets
+
+    def _count_overruns(self, count: int) -> None:
+        self._control[self.OVERRUNS] += np.uint64(count)
+
+    def close(self) -> None:
+        del self._control, self._seq, self._stamps, self._packets
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def pending(self) -> int:
+        head = int(self._control[self.HEAD])
+        return min(head - int(self._control[self.TAIL]), self._capacity)
+
+    @property
+    def written(self) -> int:
+        return int(self._control[self.HEAD])
+
+    @property
+    def overruns(self) -> int:
+        return int(self._control[self.OVERRUNS])
+
+
+class PacketBuffer:
+    """A single packet in a byte-typed shared buffer.
+
+    Producers and consumers move whole packets through a memoryview with
+    one slice assignment under the buffer lock.
+    """
+
+    def __init__(self, packet_bytes: int):
+        self._data = multiprocessing.Array('B', packet_bytes)
+        self._map_view()
+
+    def __getstate__(self) -> dict:
+        return {'_data': self._data}
+
+    def __setstate__(self, state: dict) -> None:
+        self._data = state['_data']
+        self._map_view()
+
+    def _map_view(self) -> None:
+        self._view = memoryview(self._data.get_obj()).cast('B')
+
+    def write(self, packet: ...) -> None:
+        with self._data.get_lock():
+            self._view[:] = packet
+
+    def read_into(self, out: ...) -> None:
+        with self._data.get_lock():
+            memoryview(out)[:] = self._view
+
+    def get_lock(self) -> ...:
+        return self._data.get_lock()
+
+    @property
+    def view(self) -> memoryview:
+        return self._view
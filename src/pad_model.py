@@ -1,6 +1,12 @@
 import dataclasses
+import itertools
+import math
+import time
 
-import keyboard
+import numpy as np
+
+from key_output import KeyEmitter
+from usb_stats import LatencyHistogram
 
 Coord = tuple[int, int]
 Colour = tuple[int, int, int]
@@ -14,38 +20,227 @@ class Coords:
     coords: list[Coord]
 
 
-@dataclasses.dataclass
 class LEDEntry:
+    """One LED, a view of its pixel in the pad's RGB framebuffer."""
+
     B8_MAX = 255
 
-    red: int = 0
-    green: int = 0
-    blue: int = 0
+    def __init__(self, frame: np.ndarray, index: tuple[int, int]):
+        self._frame = frame
+        self._index = index
+
+    def __repr__(self) -> str:
+        return (
+            f"LEDEntry(red={self.red}, green={self.green}, blue={self.blue})"
+        )
+
+    @property
+    def red(self) -> int:
+        return int(self._frame[self._index][0])
+
+    @red.setter
+    def red(self, red: int):
+        self._frame[self._index][0] = red
+
+    @property
+    def green(self) -> int:
+        return int(self._frame[self._index][1])
+
+    @green.setter
+    def green(self, green: int):
+        self._frame[self._index][1] = green
+
+    @property
+    def blue(self) -> int:
+        return int(self._frame[self._index][2])
+
+    @blue.setter
+    def blue(self, blue: int):
+        self._frame[self._index][2] = blue
 
     @property
     def colour(self) -> Colour:
-        return (self.red, self.green, self.blue)
+        red, green, blue = self._frame[self._index].tolist()
+        return (red, green, blue)
 
     @colour.setter
     def colour(self, colour: Colour):
-        self.red = int(max(0, min(colour[0], self.B8_MAX)))
-        self.green = int(max(0, min(colour[1], self.B8_MAX)))
-        self.blue = int(max(0, min(colour[2], self.B8_MAX)))
+        self._frame[self._index] = (
+            int(max(0, min(colour[0], self.B8_MAX))),
+            int(max(0, min(colour[1], self.B8_MAX))),
+            int(max(0, min(colour[2], self.B8_MAX))),
+        )
 
 
-@dataclasses.dataclass
-class SensorEntry:
+class SensorStore:
+    """Structure-of-arrays state of every sensor on a pad.
+
+    Arrays are indexed by (panel, sensor) in PadModel.PANELS and
+    PadModel.SENSORS order. update() applies a whole sample: clamping,
+    hysteresis and panel press states are each one NumPy operation.
+    """
+
     MAX_ON = 100
-    MAX_OFF = MAX_ON - 1
     B12_MAX = 4095
     MAX_BASE = B12_MAX - MAX_ON
+    DEFAULT_THRESHOLD = 30
+    DEFAULT_HYSTERESIS = 5
+
+    def __init__(self, num_panels: int, num_sensors: int):
+        shape = (num_panels, num_sensors)
+        self.base = np.zeros(shape, np.int32)
+        self.current = np.zeros(shape, np.int32)
+        self.threshold = np.full(shape, self.DEFAULT_THRESHOLD, np.int32)
+        self.hysteresis = np.full(shape, self.DEFAULT_HYSTERESIS, np.int32)
+        self.active = np.zeros(shape, bool)
+        self.updated = np.ones(shape, bool)
+        self.pressed = np.zeros(num_panels, bool)
+
+    def set_baseline(self, values: np.ndarray) -> None:
+        np.clip(values, 0, self.B12_MAX, out=self.base, casting='unsafe')
+
+    def update(self, values: np.ndarray) -> list[tuple[int, bool]]:
+        """Apply one sample, return (panel index, pressed) press edges."""
+        np.clip(values, 0, self.MAX_BASE, out=self.current, casting='unsafe')
+        self.update_active()
+        pressed = self.active.any(axis=1)
+        edges = np.flatnonzero(pressed != self.pressed)
+        self.pressed[:] = pressed
+        return [(int(panel), bool(pressed[panel])) for panel in edges]
+
+    def update_active(self, index: ... = ...) -> None:
+        delta = self.current[index] - self.base[index]
+        pressed = delta >= self.threshold[index]
+        released = delta <= self.threshold[index] - self.hysteresis[index]
+        active = self.active[index]
+        self.active[index] = np.where(active, ~released, pressed)
+
+    def copy_panel(
+        self, panel: int, other: "SensorStore", other_panel: int
+    ) -> None:
+        for name in ("base", "current", "threshold", "hysteresis", "active"):
+            getattr(self, name)[panel] = getattr(other, name)[other_panel]
+
+
+@dataclasses.dataclass
+class BaselineSettings:
+    """Per-profile parameters of a pad's BaselineTracker."""
+
+    enabled: bool = True
+    # Seconds for the baseline to cover 63% of a step in the idle level.
+    time_constant: float = 30.0
+    # Fraction of (threshold - hysteresis) above the baseline past which
+    # a sensor is treated as touched and its baseline is frozen.
+    gate: float = 0.5
+
+
+class BaselineTracker:
+    """Gated exponential moving average of every sensor's idle level.
+
+    At most every INTERVAL seconds the float baseline moves towards the
+    current readings by 1 - exp(-dt / time_constant), so the decay follows
+    wall time however often samples arrive. Sensors on a pressed panel, or
+    reading above the gate, keep their baseline. The rounded result is
+    written to the store's base array, so thresholds follow slow drift.
+    """
+
+    INTERVAL = 0.01
+
+    def __init__(
+        self, store: SensorStore, settings: BaselineSettings | None = None
+    ):
+        self._store = store
+        self.settings = settings or BaselineSettings()
+        self._level = store.base.astype(np.float64)
+        self._step = np.empty_like(self._level)
+        self._gate = np.empty_like(self._level)
+        self._idle = np.empty(self._level.shape, bool)
+        self._last = None
+
+    def reset(self) -> None:
+        """Restart from the store's current base values."""
+        self._level[:] = self._store.base
+        self._last = None
+
+    def update(self, now: float | None = None) -> None:
+        if now is None:
+            now = time.perf_counter()
+        if self._last is not None and now - self._last < self.INTERVAL:
+            return
+        last, self._last = self._last, now
+        if last is None or not self.settings.enabled:
+            return
+        store, step, gate = self._store, self._step, self._gate
+        idle = self._idle
+        np.subtract(store.current, self._level, out=step)
+        np.subtract(store.threshold, store.hysteresis, out=gate)
+        gate *= self.settings.gate
+        np.less(step, gate, out=idle)
+        idle[store.pressed] = False
+        step *= -math.expm1((last - now) / self.settings.time_constant)
+        np.add(self._level, step, out=self._level, where=idle)
+        np.rint(self._level, out=step)
+        np.copyto(store.base, step, casting='unsafe', where=idle)
+
+
+class SensorEntry:
+    """View of one sensor in a SensorStore."""
+
+    MAX_ON = SensorStore.MAX_ON
+    MAX_OFF = MAX_ON - 1
+    B12_MAX = SensorStore.B12_MAX
+    MAX_BASE = SensorStore.MAX_BASE
+
+    def __init__(self, store: SensorStore, index: tuple[int, int]):
+        self._store = store
+        self._index = index
+
+    def __repr__(self) -> str:
+        return (
+            f"SensorEntry(base_value={self.base_value}, "
+            f"current_value={self.current_value}, "
+            f"threshold={self.threshold}, hysteresis={self.hysteresis})"
+        )
+
+    @property
+    def base_value(self) -> int:
+        return int(self._store.base[self._index])
+
+    @base_value.setter
+    def base_value(self, base_value: int):
+        self._store.base[self._index] = base_value
+
+    @property
+    def current_value(self) -> int:
+        return int(self._store.current[self._index])
+
+    @current_value.setter
+    def current_value(self, current_value: int):
+        self._store.current[self._index] = current_value
+
+    @property
+    def threshold(self) -> int:
+        return int(self._store.threshold[self._index])
 
-    base_value: int = 0
-    current_value: int = 0
-    threshold: int = 30
-    hysteresis: int = 5
-    updated: bool = True
-    _active: bool = False
+    @threshold.setter
+    def threshold(self, threshold: int):
+        self._store.threshold[self._index] = threshold
+
+    @property
+    def hysteresis(self) -> int:
+        return int(self._store.hysteresis[self._index])
+
+    @hysteresis.setter
+    def hysteresis(self, hysteresis: int):
+        self._store.hysteresis[self._index] = hysteresis
+
+    @property
+    def updated(self) -> bool:
+        return bool(self._store.updated[self._index])
+
+    @updated.setter
+    def updated(self, updated: bool):
+        self._store.updated[self._index] = updated
 
     def set_base_value(self, base_value: int):
         self.base_value = int(max(0, min(base_value, self.B12_MAX)))
@@ -61,17 +256,11 @@ class SensorEntry:
         self.hysteresis = int(max(1, min(hysteresis, self.threshold)))
 
     def set_active(self):
-        delta = self.current_value - self.base_value
-        pressed = delta >= self.threshold
-        released = delta <= self.threshold - self.hysteresis
-        if not self._active and pressed:
-            self._active = True
-        elif self._active and released:
-            self._active = False
+        self._store.update_active(self._index)
 
     @property
     def active(self) -> bool:
-        return self._active
+        return bool(self._store.active[self._index])
 
     @property
     def profile_data(self) -> tuple[int, int]:
@@ -88,19 +277,35 @@ class PanelEntry:
     sensors: dict[Coord, SensorEntry]
     leds: dict[Coord, LEDEntry]
     key_val: str
-    pressed: bool = False
 
-    def __init__(self, sensors: Coords, leds: Coords, key_val: str):
-        self.sensors = {coord: SensorEntry() for coord in sensors.coords}
-        self.leds = {coord: LEDEntry() for coord in leds.coords}
+    def __init__(
+        self, store: SensorStore, frame: np.ndarray, index: int,
+        sensors: Coords, leds: Coords, key_val: str
+    ):
+        self._store = store
+        self._frame = frame
+        self._index = index
+        self.sensors = {
+            coord: SensorEntry(store, (index, sensor))
+            for sensor, coord in enumerate(sensors.coords)
+        }
+        self.leds = {
+            coord: LEDEntry(frame, (index, led))
+            for led, coord in enumerate(leds.coords)
+        }
         self.key_val = key_val
 
     @property
     def active(self) -> bool:
-        for sensor in self.sensors.values():
-            if sensor.active:
-                return True
-        return False
+        return bool(self._store.active[self._index].any())
+
+    @property
+    def pressed(self) -> bool:
+        return bool(self._store.pressed[self._index])
+
+    @pressed.setter
+    def pressed(self, pressed: bool):
+        self._store.pressed[self._index] = pressed
 
     @property
     def profile_data(self) -> ProfilePanelData:
@@ -126,13 +331,10 @@ class PanelEntry:
         self.key_val = panel_data[1]
 
     def set_frame_data(self, panel_data: "PanelEntry") -> None:
-        for coord, sensor in self.sensors.items():
-            sensor.set_base_value(panel_data.sensors[coord].base_value)
-            sensor.set_current_value(panel_data.sensors[coord].current_value)
-            sensor.set_hysteresis(panel_data.sensors[coord].hysteresis)
-            sensor.set_threshold(panel_data.sensors[coord].threshold)
-        for coord, led in self.leds.items():
-            led.colour = panel_data.leds[coord].colour
+        self._store.copy_panel(
+            self._index, panel_data._store, panel_data._index
+        )
+        self._frame[self._index] = panel_data._frame[panel_data._index]
 
 
 SensorCoord = tuple[Coord, Coord]
@@ -148,9 +350,18 @@ class PadEntry:
             leds: Coords, keys: list[str]
     ):
         self.blanks = blanks.coords
+        self.sensor_store = SensorStore(
+            len(panels.coords), len(sensors.coords)
+        )
+        # (panel, led, rgb) colours in PANELS and LEDS order.
+        self.led_frame = np.zeros(
+            (len(panels.coords), len(leds.coords), 3), np.uint8
+        )
         self.panels = {
-            coord: PanelEntry(sensors, leds, key)
-            for coord, key in zip(panels.coords, keys)
+            coord: PanelEntry(
+                self.sensor_store, self.led_frame, index, sensors, leds, key
+            )
+            for index, (coord, key) in enumerate(zip(panels.coords, keys))
         }
         self.updated = False
 
@@ -206,8 +417,17 @@ class PadModel:
     SENSORS = Coords([(1, 1), (1, 0), (0, 1), (0, 0)])
     LEDS = Coords(led_coords())
     KEYS = ['A', 'B', 'C', 'D']
-
-    def __init__(self):
+    # Sensor reading index i is (panel, sensor) SENSOR_COORDS[i], and the
+    # flat index of a (panels, sensors) sensor array.
+    SENSOR_COORDS = list(itertools.product(PANELS.coords, SENSORS.coords))
+    SENSOR_INDEX = {
+        coords: index for index, coords in enumerate(SENSOR_COORDS)
+    }
+
+    def __init__(self, key_output: KeyEmitter | None = None):
+        self._keys = key_output or KeyEmitter.shared()
+        self._baseline: BaselineTracker | None = None
+        self.reset_latency()
         self.set_default()
 
     def get_model_data(self) -> PadEntry:
@@ -216,6 +436,10 @@ class PadModel:
     def get_led_data(self) -> dict[Coord, dict[Coord, LEDEntry]]:
         return {c: p.leds for c, p in self._model.panels.items()}
 
+    def get_led_frame(self) -> np.ndarray:
+        """The (panel, led, rgb) framebuffer behind every LEDEntry."""
+        return self._model.led_frame
+
     def set_sensor(self, data: tuple[int, int, SensorCoord]) -> bool:
         self._model.updated = True
         sensor = self._model.panels[data[2][0]].sensors[data[2][1]]
@@ -226,37 +450,55 @@ class PadModel:
             sensor.set_hysteresis(sensor.hysteresis - data[1])
         return True
 
-    def set_baseline(self, data: dict[tuple[Coord, Coord], int]) -> None:
-        for coords, value in data.items():
-            panel = coords[0]
-            sensor = coords[1]
-            self._model.panels[panel].sensors[sensor].set_base_value(value)
-
-    def set_sensor_data(self, data: dict[tuple[Coord, Coord], int]) -> None:
-        for coords, value in data.items():
-            panel = coords[0]
-            sensor = coords[1]
-            self._model.panels[panel].sensors[sensor].set_current_value(value)
-        for panel in self._model.panels.values():
-            if panel.active and not panel.pressed:
-                panel.pressed = True
-                keyboard.press(panel.key)
-            if not panel.active and panel.pressed:
-                panel.pressed = False
-                keyboard.release(panel.key)
+    def set_baseline(self, data: np.ndarray) -> None:
+        self._model.sensor_store.set_baseline(data)
+        self._baseline.reset()
+
+    def set_sensor_data(
+        self, data: np.ndarray, now: float | None = None,
+        stamp: float | None = None
+    ) -> list[tuple[int, bool]]:
+        """Apply a (panel, sensor) sample, return its press/release edges.
+
+        Edges are (panel index, pressed) pairs in PANELS order. The
+        baseline then tracks the sample, see BaselineTracker. Keys are
+        queued on key_output; given the perf_counter() time the sample
+        arrived over USB, the time from then until each key press is
+        sent is recorded in press_latency.
+        """
+        edges = self._model.sensor_store.update(data)
+        self._baseline.update(now)
+        for index, pressed in edges:
+            key = self._model.panels[self.PANELS.coords[index]].key
+            latency = self._press_latency[index] if pressed else None
+            self._keys.push(key, pressed, stamp, latency)
+        return edges
+
+    def release_keys(self) -> list[tuple[int, bool]]:
+        """Release the key of every pressed panel, return the edges."""
+        store = self._model.sensor_store
+        panels = np.flatnonzero(store.pressed)
+        edges = [(int(panel), False) for panel in panels]
+        for index, pressed in edges:
+            key = self._model.panels[self.PANELS.coords[index]].key
+            self._keys.push(key, pressed)
+        store.active[:] = False
+        store.pressed[:] = False
+        return edges
 
     def set_saved(self) -> None:
         self._model.updated = False
 
     def set_default(self) -> None:
+        """Reset the pad to the default profile, keeping baseline settings."""
+        settings = None if self._baseline is None else self._baseline.settings
         self._model = PadEntry(
             self.BLANKS, self.PANELS, self.SENSORS, self.LEDS, self.KEYS
         )
+        self._baseline = BaselineTracker(self._model.sensor_store, settings)
 
     def view_updated(self) -> None:
-        for panel in self._model.panels.values():
-            for sensor in panel.sensors.values():
-                sensor.updated = False
+        self._model.sensor_store.updated[:] = False
 
     def keys_updated(self, keys: list[str]) -> None:
         self._model.set_keys(keys)
@@ -270,3 +512,25 @@ class PadModel:
     def profile_data(self, profile_data: ProfilePadData) -> None:
         self.set_saved()
         self._model.profile_data = profile_data
+
+    @property
+    def key_output(self) -> KeyEmitter:
+        return self._keys
+
+    @property
+    def press_latency(self) -> list[LatencyHistogram]:
+        """Seconds from USB arrival to key press, per panel index."""
+        return self._press_latency
+
+    def reset_latency(self) -> None:
+        self._press_latency = [
+            LatencyHistogram() for _ in self.PANELS.coords
+        ]
+
+    @property
+    def baseline_settings(self) -> BaselineSettings:
+        return self._baseline.settings
+
+    @baseline_settings.setter
+    def baseline_settings(self, settings: BaselineSettings) -> None:
+        self._baseline.settings = dataclasses.replace(settings)
@@ -1,10 +1,11 @@
+import dataclasses
 import pathlib
 import pickle
 import uuid
 
 import appdirs
 
-from pad_model import PadModel
+from pad_model import BaselineSettings, PadModel
 
 
 class ProfileController:
@@ -46,7 +47,10 @@ class ProfileController:
             profile_path = self._profile_map[name]
         else:
             profile_path = self.profile_path / f"{str(uuid.uuid4())}.pkl"
-        data = (name, self._model.profile_data)
+        data = (
+            name, self._model.profile_data,
+            dataclasses.asdict(self._model.baseline_settings)
+        )
         with open(profile_path, 'wb') as f:
             pickle.dump(data, f)
         self._load_profile_map()
@@ -63,6 +67,9 @@ class ProfileController:
             data = pickle.load(f)
         self._saved_data = data[1]
         self._model.profile_data = self._saved_data
+        # Profiles saved before baseline tracking have no settings.
+        settings = data[2] if len(data) > 2 else {}
+        self._model.baseline_settings = BaselineSettings(**settings)
         return name
 
     def create_new_profile(self) -> str:
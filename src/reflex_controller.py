@@ -1,7 +1,24 @@
 # reflex_controller.py
+import pathlib
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+
+import appdirs
+import numpy as np
+
+from control_queue import ControlQueue
 from led_data_handler import LEDDataHandler
-from pad_model import Coord, PadModel
+from packet_codec import PacketCodec
+from packet_recorder import PacketRecorder, PacketReplay
+from pad_model import PadModel
+from profile_controller import ProfileController
 from sensor_data_handler import SensorDataHandler
+from sensor_filter import FilterSettings
+from sensor_history import SensorHistory
+from session_exporter import SessionExporter
+from step_stats import StepStats
+from usb_async import AsyncUSBEngine
 from usb_controller import USBDeviceList, HIDReadProcess, HIDWriteProcess
 from usb_info import ReflexV2Info
 
@@ -9,35 +26,224 @@ from usb_info import ReflexV2Info
 class ReflexPadInstance:
     """API to a connected RE:Flex v2 dance pad."""
 
-    def __init__(self, info: ReflexV2Info, serial: str, model: PadModel):
+    LED_FPS = 60.0
+    MAX_BATCH = 32
+    ENGINE_PROCESS = "process"
+    ENGINE_ASYNC = "async"
+
+    def __init__(
+        self, info: ReflexV2Info, serial: str, model: PadModel,
+        led_fps: float = LED_FPS, engine: str = ENGINE_PROCESS,
+        filters: FilterSettings | None = None,
+        replay: PacketReplay | None = None
+    ):
         self._serial = serial
-        self._read = HIDReadProcess(info, serial)
-        self._write = HIDWriteProcess(info, serial)
-        self._sensors = SensorDataHandler(
-            self._read.data, self._read.event
-        )
-        self._lights = LEDDataHandler(
-            self._write.data, self._write.event, model
-        )
+        self._model = model
+        self._config_mode = False
+        self._recorder = None
+        self._exporter = None
+        self._steps = StepStats(len(PadModel.PANELS.coords))
+        packet_rate = led_fps * LEDDataHandler.PACKETS_PER_FRAME
+        if replay is not None:
+            self._endpoints = [replay]
+            ring, self._scheduler = replay.ring, replay.scheduler
+        elif engine == self.ENGINE_ASYNC:
+            usb_engine = AsyncUSBEngine(info, serial, packet_rate)
+            self._endpoints = [usb_engine]
+            ring, self._scheduler = usb_engine.ring, usb_engine.scheduler
+        elif engine == self.ENGINE_PROCESS:
+            read = HIDReadProcess(info, serial)
+            write = HIDWriteProcess(info, serial, packet_rate)
+            self._endpoints = [read, write]
+            ring, self._scheduler = read.ring, write.scheduler
+        else:
+            raise ValueError(f"Unknown USB engine {engine}.")
+        self._sensors = SensorDataHandler(ring)
+        self._sensors.set_filter(filters)
+        self._lights = LEDDataHandler(self._scheduler, model)
+        self._commands = ControlQueue(self._scheduler)
+        self._config_times = []
+        self._config_failures = 0
 
     def disconnect(self) -> None:
-        self._read.terminate()
-        self._write.terminate()
+        try:
+            self.stop_recording()
+            self.stop_export()
+        finally:
+            self._commands.cancel()
+            for endpoint in self._endpoints:
+                endpoint.terminate()
+            self._model.release_keys()
+
+    def start_recording(
+        self, path: str | pathlib.Path,
+        capacity: int = PacketRecorder.CAPACITY
+    ) -> None:
+        """Record every raw sensor and LED packet to a file."""
+        self.stop_recording()
+        self._recorder = PacketRecorder(path, capacity)
+        self._sensors.recorder = self._recorder
+        self._lights.recorder = self._recorder
+
+    def stop_recording(self) -> int:
+        """Close the recording, return the number of packets in it."""
+        if (recorder := self._recorder) is None:
+            return 0
+        self._recorder = None
+        self._sensors.recorder = self._lights.recorder = None
+        recorder.close()
+        return recorder.count
+
+    def start_export(self, directory: str | pathlib.Path) -> None:
+        """Export sensor values, press states and LED frames as .npy."""
+        self.stop_export()
+        self._exporter = SessionExporter(directory)
+        self._sensors.exporter = self._exporter
+        self._lights.exporter = self._exporter
+
+    def stop_export(self) -> dict[str, int]:
+        """Finish the export, return the rows dropped from each table.
+
+        Raises the first error the exporter hit writing a chunk.
+        """
+        if (exporter := self._exporter) is None:
+            return {}
+        self._exporter = None
+        self._sensors.exporter = self._lights.exporter = None
+        exporter.close()
+        return exporter.dropped
+
+    def handle_sensor_data(self) -> bool:
+        return self._sensors.take_sample(self.MAX_BATCH)
+
+    def update_model(self) -> list[tuple[int, bool]]:
+        """Apply every sample of the last batch in order, return key edges.
 
-    def handle_sensor_data(self) -> None:
-        self._sensors.take_sample()
+        Each sample goes through the hysteresis and key logic, so a tap
+        that starts and ends within one batch still produces its key.
+        """
+        store = self._model.get_model_data().sensor_store
+        edges = []
+        for values, stamp in zip(
+            self._sensors.readings, self._sensors.stamps.tolist()
+        ):
+            sample_edges = self._model.set_sensor_data(values, stamp=stamp)
+            self._steps.update(
+                sample_edges, stamp, store.pressed, store.current - store.base
+            )
+            if self._exporter is not None:
+                self._exporter.append(
+                    "states", stamp=stamp, pressed=store.pressed,
+                    base=store.base
+                )
+            edges.extend(sample_edges)
+        return edges
 
     def handle_light_data(self) -> None:
+        if self._config_mode:
+            return
         self._lights.give_sample()
 
+    def handle_control_data(self) -> None:
+        while (reply := self._sensors.pop_reply()) is not None:
+            self._commands.handle_reply(*reply)
+        self._commands.service()
+
+    def write_packet(
+        self, packet: bytes, reply: int | None = None,
+        on_send: Callable[[], None] | None = None
+    ) -> Future:
+        """Queue a control packet behind those already queued.
+
+        The future resolves once the packet is written or, when a reply
+        header is given, to the matching reply packet.
+        """
+        return self._commands.submit(packet, reply, on_send=on_send)
+
+    def set_config_mode(self, active: bool) -> None:
+        # LED headers can collide with 0xF0/0xF1, so no LED packet may
+        # reach the device while it is in config mode.
+        self._config_mode = active
+        self._sensors.config_mode = active
+        if active:
+            self._scheduler.discard_led()
+            self._lights.invalidate()
+
+    def record_config_sequence(self, seconds: float, ok: bool) -> None:
+        self._config_times.append(seconds)
+        if not ok:
+            self._config_failures += 1
+
     @property
-    def pad_data(self) -> dict[tuple[Coord, Coord], int]:
+    def pad_data(self) -> np.ndarray:
         return self._sensors.pad_data
 
+    @property
+    def stamp(self) -> float:
+        return self._sensors.stamp
+
+    @property
+    def filter_delay(self) -> float:
+        return self._sensors.filter_delay
+
+    def set_filters(self, settings: FilterSettings | None) -> None:
+        self._sensors.set_filter(settings)
+
+    @property
+    def step_stats(self) -> StepStats:
+        return self._steps
+
+    @property
+    def history(self) -> SensorHistory:
+        """The last few seconds of timestamped sensor frames."""
+        return self._sensors.history
+
+    @property
+    def model(self) -> PadModel:
+        return self._model
+
     @property
     def serial(self) -> str:
         return self._serial
 
+    @property
+    def write_stats(self) -> dict[str, float]:
+        return self._scheduler.stats
+
+    @property
+    def led_stats(self) -> dict[str, float]:
+        return self._lights.stats
+
+    @property
+    def timing_stats(self) -> dict[str, dict[str, float]]:
+        """Latency histogram summaries, from USB transfer to key press."""
+        stats = {"consume_latency": self._sensors.latency.summary()}
+        for coord, latency in zip(
+            PadModel.PANELS.coords, self._model.press_latency
+        ):
+            stats[f"press_latency_{coord[0]}{coord[1]}"] = latency.summary()
+        stats["key_emit_latency"] = self._model.key_output.latency.summary()
+        stats["key_output"] = self._model.key_output.stats
+        stats["led_output"] = self._lights.stats
+        for endpoint in self._endpoints:
+            for name, timer in endpoint.timers.items():
+                stats[f"{name}_interval"] = timer.interval.summary()
+                stats[f"{name}_duration"] = timer.duration.summary()
+        return stats
+
+    @property
+    def config_stats(self) -> dict[str, float]:
+        """Round trips of config sequences, from enter to exit written."""
+        times = self._config_times
+        return {
+            "sequences": float(len(times)),
+            "failures": float(self._config_failures),
+            "last_ms": times[-1] * 1e3 if times else 0.0,
+            "mean_ms": sum(times) / len(times) * 1e3 if times else 0.0,
+            "max_ms": max(times, default=0.0) * 1e3,
+            **self._commands.stats,
+        }
+
 
 class ReflexController:
     """USB controller for RE:Flex v2 dance pads."""
@@ -45,9 +251,13 @@ class ReflexController:
     CONNECTED = True
     DISCONNECTED = False
 
-    def __init__(self, model: PadModel):
+    def __init__(
+        self, model: PadModel, engine: str = ReflexPadInstance.ENGINE_PROCESS
+    ):
         self._info = ReflexV2Info()
-        self._instance = None
+        self._engine = engine
+        self._instances: dict[str, ReflexPadInstance] = {}
+        self._service_start = 0
         self._serials = []
         self._model = model
         self.enumerate_pads()
@@ -56,8 +266,8 @@ class ReflexController:
         self._serials = USBDeviceList.connected_device_names(self._info)
 
     def toggle_pad_connection(self, serial: str) -> bool:
-        if self._instance:
-            return self.disconnect_pad()
+        if serial in self._instances:
+            return self.disconnect_pad(serial)
         else:
             return self.connect_pad(serial)
 
@@ -66,126 +276,185 @@ class ReflexController:
           1. After connecting, enter config mode
           2. Request the profile (read)
           3. Exit config mode upon receiving the profile reply.
+        The first pad connected drives the shared model shown by the GUI,
+        every further pad gets its own model seeded with the same profile.
         """
-        if pad := ReflexPadInstance(self._info, serial, self._model):
-            if self._instance is None and serial in self._serials:
-                self._instance = pad
-                # Begin config sequence on connection:
-                self.send_enter_config()
-                self.queue_read_profile()
-                # Exit config will be handled upon receipt of the profile reply.
-                return self.CONNECTED
-        return self.DISCONNECTED
+        if serial in self._instances or serial not in self._serials:
+            return self.DISCONNECTED
+        self._instances[serial] = ReflexPadInstance(
+            self._info, serial, self._next_model(), engine=self._engine
+        )
+        self._run_config_sequence(serial)
+        return self.CONNECTED
+
+    def connect_replay(
+        self, path: str | pathlib.Path, realtime: bool = True,
+        loop: bool = False, serial: str = "REPLAY"
+    ) -> bool:
+        """Connect a recorded pad, see PacketReplay.
 
-    def disconnect_pad(self) -> bool:
-        if self._instance is None:
+        The recording stands in for a pad, so no config sequence is run.
+        """
+        if serial in self._instances:
             return self.DISCONNECTED
-        self._instance.disconnect()
-        self._instance = None
+        self._instances[serial] = ReflexPadInstance(
+            self._info, serial, self._next_model(),
+            replay=PacketReplay(path, realtime, loop)
+        )
+        return self.CONNECTED
+
+    def _next_model(self) -> PadModel:
+        if self.pad is None:
+            return self._model
+        model = PadModel(self._model.key_output)
+        model.profile_data = self._model.profile_data
+        model.baseline_settings = self._model.baseline_settings
+        return model
+
+    def share_baseline_settings(self) -> None:
+        """Give every pad the baseline settings of the shared model."""
+        for pad in self._instances.values():
+            if pad.model is not self._model:
+                pad.model.baseline_settings = self._model.baseline_settings
+
+    def disconnect_pad(self, serial: str | None = None) -> bool:
+        """Disconnect one pad, or every pad when no serial is given."""
+        serials = list(self._instances) if serial is None else [serial]
+        for serial in serials:
+            if (pad := self._instances.pop(serial, None)) is not None:
+                pad.disconnect()
         return self.DISCONNECTED
 
+    def close_key_output(self) -> None:
+        """Release every held key and close the shared key emitter."""
+        self._model.key_output.close()
+
+    def service_order(self) -> list[ReflexPadInstance]:
+        """Connected pads, rotated by one on every call for fairness."""
+        pads = list(self._instances.values())
+        if not pads:
+            return pads
+        self._service_start = (self._service_start + 1) % len(pads)
+        return pads[self._service_start:] + pads[:self._service_start]
+
+    def _get_pad(self, serial: str | None = None) -> ReflexPadInstance | None:
+        if serial is None:
+            return self.pad
+        return self._instances.get(serial)
+
     def get_all_pads(self) -> list[str | None]:
         return self._serials
 
+    def timing_stats(self) -> dict[str, dict[str, dict[str, float]]]:
+        return {
+            serial: pad.timing_stats for serial, pad in self._instances.items()
+        }
+
+    def step_stats(self) -> dict[str, list[dict[str, float]]]:
+        """Step statistics of every panel of every connected pad."""
+        return {
+            serial: pad.step_stats.summary()
+            for serial, pad in self._instances.items()
+        }
+
+    def dump_timing(self, path: pathlib.Path | None = None) -> str:
+        """Write every pad's timing statistics to a text file, return it."""
+        if path is None:
+            log_dir = pathlib.Path(appdirs.user_log_dir(
+                ProfileController.APP_NAME, ProfileController.APP_AUTHOR
+            ))
+            log_dir.mkdir(parents=True, exist_ok=True)
+            path = log_dir / time.strftime("timing_%Y%m%d_%H%M%S.txt")
+        lines = []
+        for serial, stats in self.timing_stats().items():
+            lines.append(f"{serial}:")
+            for name, summary in stats.items():
+                values = "  ".join(
+                    f"{key} {value:10.3f}" for key, value in summary.items()
+                )
+                lines.append(f"  {name:<18}{values}")
+        path.write_text("\n".join(lines) + "\n")
+        return str(path)
+
+    @property
+    def engine(self) -> str:
+        return self._engine
+
+    @engine.setter
+    def engine(self, engine: str) -> None:
+        """USB engine for pads connected from now on."""
+        self._engine = engine
+
     @property
     def pad(self) -> ReflexPadInstance | None:
-        if self._instance:
-            return self._instance
+        """The pad driving the shared model, if it is connected."""
+        for pad in self._instances.values():
+            if pad.model is self._model:
+                return pad
         return None
 
-    def push_profile(self) -> bool:
-        """
-        Packages the current profile data into a 64-byte packet and sends it
-        to the device via the HID write process. The packet format is defined as:
-          - Byte 0: Command header (0xF0)
-          - Bytes 1-32: For each of 4 panels × 4 sensors: threshold (1 byte) and hysteresis (1 byte)
-          - Bytes 33-36: For each of 4 panels: assigned key (ASCII, 1 byte each)
-          - Bytes 37-63: Zero padding
-        After sending, it queues a read command (header 0xF1) to get the device's profile.
-        The reply (when received) will be processed to update the "RE:Flex Device" profile entry.
-        """
-        if self._instance is None:
-            return False
-
-        # Retrieve profile data from the pad model.
-        # Expected profile_data structure:
-        # { panel_coord: ( { sensor_coord: (threshold, hysteresis), ... }, key ), ... }
-        profile_data = self._model.profile_data
-
-        packet = bytearray(64)
-        packet[0] = 0xF0  # Profile push command header
-
-        pos = 1
-        # For each panel (using order from PadModel.PANELS.coords)
-        for panel in PadModel.PANELS.coords:
-            panel_profile = profile_data.get(panel, ({}, ' '))
-            sensor_data = panel_profile[0]  # { sensor_coord: (threshold, hysteresis) }
-            for sensor in PadModel.SENSORS.coords:
-                # Use defaults if not set.
-                threshold, hysteresis = sensor_data.get(sensor, (30, 5))
-                packet[pos] = threshold & 0xFF
-                packet[pos + 1] = hysteresis & 0xFF
-                pos += 2
-
-        # For each panel, store the assigned key (one ASCII byte each)
-        for panel in PadModel.PANELS.coords:
-            panel_profile = profile_data.get(panel, ({}, ' '))
-            key = panel_profile[1]
-            if key:
-                packet[pos] = ord(key[0])
-            else:
-                packet[pos] = 0
-            pos += 1
-
-        # Zero pad remaining bytes.
-        for i in range(pos, 64):
-            packet[i] = 0
-
-        # Send the profile push packet via the HID write process.
-        # The HID write process is stored in the _write member of the ReflexPadInstance.
-        with self._instance._write.data.get_lock():
-            for i in range(64):
-                self._instance._write.data[i] = packet[i]
-        self._instance._write.event.set()
-
-        # Queue a read profile command (see below).
-        self.queue_read_profile()
-        return True
+    @property
+    def pads(self) -> dict[str, ReflexPadInstance]:
+        return self._instances
 
-    def send_enter_config(self) -> None:
+    def send_enter_config(self, serial: str | None = None) -> Future | None:
         """Sends the 64-byte Enter Config Mode packet."""
-        if self._instance is None:
-            return
-        packet = bytearray.fromhex(
-            "b6da3dc8904aae1587f7ee9913c8bc5f4e616d7b7505c4b36220c9a7841866d1872782b87caae1bf41c001c457d4e1e3d54b5db6a6c16768a615735f43c95ab3"
+        if (pad := self._get_pad(serial)) is None:
+            return None
+        return pad.write_packet(
+            PacketCodec.ENTER_CONFIG,
+            on_send=lambda: pad.set_config_mode(True)
         )
-        with self._instance._write.data.get_lock():
-            for i in range(64):
-                self._instance._write.data[i] = packet[i]
-        self._instance._write.event.set()
 
-    def send_exit_config(self) -> None:
+    def send_exit_config(self, serial: str | None = None) -> Future | None:
         """Sends the 64-byte Exit Config Mode packet."""
-        if self._instance is None:
-            return
-        packet = bytearray.fromhex(
-            "7f5455b20d201105e64b9852cf4911475cefae3d39bde6baa12d69b14df3c61d71ffbc33091fd41034e545b0fae189dafc3a32dfe97a8dd6b7238b33bdd65ea6"
+        if (pad := self._get_pad(serial)) is None:
+            return None
+        return pad.write_packet(
+            PacketCodec.EXIT_CONFIG,
+            on_send=lambda: pad.set_config_mode(False)
         )
-        with self._instance._write.data.get_lock():
-            for i in range(64):
-                self._instance._write.data[i] = packet[i]
-        self._instance._write.event.set()
-
-    def queue_read_profile(self) -> None:
-        """Queues a Profile Read Request packet (0xF1)."""
-        if self._instance is None:
-            return
-        packet = bytearray(64)
-        packet[0] = 0xF1  # Read request header
-        with self._instance._write.data.get_lock():
-            for i in range(64):
-                self._instance._write.data[i] = packet[i]
-        self._instance._write.event.set()
+
+    def queue_read_profile(self, serial: str | None = None) -> Future | None:
+        """Queues a Profile Read Request packet (0xF1).
+
+        The future resolves to the device's Profile Read Reply.
+        """
+        if (pad := self._get_pad(serial)) is None:
+            return None
+        return pad.write_packet(
+            PacketCodec.READ_REQUEST, reply=PacketCodec.PROFILE_READ
+        )
+
+    def _run_config_sequence(
+        self, serial: str, push: bytes | None = None
+    ) -> None:
+        """
+        Enter config mode, optionally push a profile, read the profile back
+        and exit config mode once the reply arrives or the read times out.
+        The round trip is recorded on the pad when exit config is written.
+        """
+        pad = self._instances[serial]
+        start = time.perf_counter()
+        self.send_enter_config(serial)
+        if push is not None:
+            pad.write_packet(push)
+        read = self.queue_read_profile(serial)
+
+        def exited(future: Future) -> None:
+            if not future.cancelled():
+                ok = future.exception() is None and read.exception() is None
+                pad.record_config_sequence(time.perf_counter() - start, ok)
+
+        def replied(future: Future) -> None:
+            if future.cancelled():
+                return
+            if future.exception() is None:
+                self.process_read_profile_reply(future.result(), serial)
+            # Leave config mode even if the pad never answered.
+            self.send_exit_config(serial).add_done_callback(exited)
+
+        read.add_done_callback(replied)
 
     def push_profile(self) -> bool:
         """
@@ -194,75 +463,39 @@ class ReflexController:
           2. Send the Profile Push packet (header 0xF0)
           3. Queue a Profile Read Request (to receive updated profile)
           4. (Later, when the read reply is received, Exit Config Mode)
+        The GUI profile is pushed to every connected pad.
         """
-        if self._instance is None:
+        if not self._instances:
             return False
-
-        # 1. Enter Config Mode.
-        self.send_enter_config()
-
-        # 2. Prepare and send the Profile Push packet.
-        packet = bytearray(64)
-        packet[0] = 0xF0  # Profile Push command header
-        pos = 1
-        profile_data = self._model.profile_data  # Expected to be a dict mapping panel coords
-        for panel in PadModel.PANELS.coords:
-            panel_profile = profile_data.get(panel, ({}, ' '))
-            sensor_data = panel_profile[0]  # Dict of sensor data: {sensor_coord: (threshold, hysteresis)}
-            for sensor in PadModel.SENSORS.coords:
-                threshold, hysteresis = sensor_data.get(sensor, (30, 5))
-                packet[pos] = threshold & 0xFF
-                packet[pos + 1] = hysteresis & 0xFF
-                pos += 2
-        for panel in PadModel.PANELS.coords:
-            panel_profile = profile_data.get(panel, ({}, ' '))
-            key = panel_profile[1]
-            packet[pos] = ord(key[0]) if key else 0
-            pos += 1
-        for i in range(pos, 64):
-            packet[i] = 0  # Zero pad the remainder
-
-        with self._instance._write.data.get_lock():
-            for i in range(64):
-                self._instance._write.data[i] = packet[i]
-        self._instance._write.event.set()
-
-        # 3. Queue a Profile Read Request.
-        self.queue_read_profile()
-
-        # The Exit Config command will be sent after processing the profile reply.
+        for serial in self._instances:
+            self._push_profile_to(serial)
         return True
 
-    def process_read_profile_reply(self, data: bytearray) -> None:
+    def _push_profile_to(self, serial: str) -> None:
+        packet = PacketCodec.encode_profile(self._model.profile_data)
+        # Enter config, push, read back, exit config on the reply.
+        self._run_config_sequence(serial, packet)
+
+    def process_read_profile_reply(
+        self, data: bytearray, serial: str | None = None
+    ) -> None:
         """
         Called when the device sends a Profile Read Reply.
-        Parses the reply, updates the in-memory (device) profile,
-        and then exits configuration mode.
+        Parses the reply and updates the in-memory (device) profile.
         Expected packet format (64 bytes):
           - Byte 0: Header (0xF1)
           - Bytes 1-32: Sensor thresholds and hysteresis (16 sensors × 2 bytes)
           - Bytes 33-36: Assigned keys (1 byte per panel)
           - Bytes 37-63: Not used
         """
-        if not data or data[0] != 0xF1:
+        if not data or data[0] != PacketCodec.PROFILE_READ:
             return  # Ignore unexpected packets
-
-        new_profile = {}
-        pos = 1
-        for panel in PadModel.PANELS.coords:
-            sensor_data = {}
-            for sensor in PadModel.SENSORS.coords:
-                threshold = data[pos]
-                hysteresis = data[pos + 1]
-                sensor_data[sensor] = (threshold, hysteresis)
-                pos += 2
-            key_val = chr(data[pos])
-            pos += 1
-            new_profile[panel] = (sensor_data, key_val)
+        if (pad := self._get_pad(serial)) is None:
+            return
+        new_profile = PacketCodec.decode_profile(data)
 
         # Update the in-memory device profile.
-        from profile_controller import ProfileController
-        ProfileController(self._model).update_device_profile(new_profile)
-
-        # 4. Exit Config Mode.
-        self.send_exit_config()
\ No newline at end of file
+        if pad.model is self._model:
+            ProfileController(self._model).update_device_profile(new_profile)
+        else:
+            pad.model.profile_data = new_profile
\ No newline at end of file
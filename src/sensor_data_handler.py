@@ -1,39 +1,159 @@
-from multiprocessing.sharedctypes import SynchronizedArray
-from multiprocessing.synchronize import Event
+import time
 
+import numpy as np
+
+from packet_codec import PacketCodec
+from packet_recorder import PacketRecorder
+from packet_ring import PacketRing
 from pad_model import Coord, PadModel
+from sensor_filter import FilterSettings, SensorFilter
+from sensor_history import SensorHistory
+from session_exporter import SessionExporter
+from usb_stats import LatencyHistogram
 
 
 class SensorDataHandler:
     """Converts sensors data from RE:Flex Dance to PadModel format."""
 
-    def __init__(self, data: SynchronizedArray, event: Event):
-        self._data = data
-        self._event = event
+    PROFILE_REPLY = PacketCodec.PROFILE_READ
+
+    def __init__(
+        self, ring: PacketRing,
+        history_seconds: float = SensorHistory.SECONDS
+    ):
+        self._ring = ring
+        self.config_mode = False
+        self._replies = []
         self._refreshed = False
         self._initialised = False
-        self._pad_data = {}
+        self._values = np.zeros(
+            (PacketCodec.NUM_PANELS, PacketCodec.NUM_SENSORS), np.uint16
+        )
+        self._batch = self._values[np.newaxis]
+        self._readings = self._batch
+        self._stamps = np.zeros(1)
+        self._history = SensorHistory(history_seconds)
+        self._samples = 0
+        self._stamp = 0.0
+        self._latency = LatencyHistogram()
+        self._filter: SensorFilter | None = None
+        self.recorder: PacketRecorder | None = None
+        self.exporter: SessionExporter | None = None
 
-    def take_sample(self) -> None:
-        if not self._event.is_set():
-            return
-        with self._data.get_lock():
-            self.organise_sensor_data(self._data)
+    def take_sample(self, limit: int | None = None) -> bool:
+        """Drain up to limit packets, True if any sensor data arrived."""
+        _, stamps, packets = self._ring.drain(limit)
+        replies = None
+        if self.config_mode:
+            # Sensor reports are suspended in config mode, replies are not.
+            replies = packets[:, 0] == self.PROFILE_REPLY
+            self._replies.extend(
+                (p.tobytes(), float(stamp))
+                for p, stamp in zip(packets[replies], stamps[replies])
+            )
+        if self.recorder is not None and len(packets):
+            # Replies are kept out of replays, which would decode them.
+            direction = PacketRecorder.IN if replies is None else np.where(
+                replies, PacketRecorder.REPLY, PacketRecorder.IN
+            )
+            self.recorder.record_many(direction, stamps, packets)
+        if replies is not None:
+            packets, stamps = packets[~replies], stamps[~replies]
+        if not len(packets):
+            return False
+        self._samples += len(packets)
+        self._stamp = float(stamps[-1])
+        self._latency.record_many(time.perf_counter() - stamps)
+        self._stamps = stamps
+        self._batch = PacketCodec.decode_sensors(packets)
+        if self._filter is None:
+            self._readings = self._batch
+        else:
+            filtered = np.empty(self._batch.shape, np.float64)
+            self._filter.apply(self._batch, out=filtered)
+            np.rint(filtered, out=filtered)
+            self._readings = filtered.astype(np.uint16)
+        self._values[:] = self._readings[-1]
+        self._history.extend(stamps, self._batch)
+        if self.exporter is not None:
+            self.exporter.append(
+                "sensors", len(packets), stamp=stamps, values=self._batch
+            )
         if not self._initialised:
             self._initialised = True
             self._refreshed = True
-        self._event.clear()
+        return True
+
+    def set_filter(self, settings: FilterSettings | None) -> None:
+        """Filter readings before pad_data, None passes them through."""
+        sensor_filter = SensorFilter(settings) if settings else None
+        self._filter = sensor_filter if sensor_filter else None
+
+    @property
+    def filter_delay(self) -> float:
+        """Seconds of group delay added by the sensor filter."""
+        return self._filter.group_delay if self._filter else 0.0
+
+    def organise_sensor_data(self, sensor_data: bytes) -> None:
+        self._values[:] = PacketCodec.decode_sensor(sensor_data)
+
+    @staticmethod
+    def coords(index: int) -> tuple[Coord, Coord]:
+        """(panel, sensor) coords of a flat index into pad_data."""
+        return PadModel.SENSOR_COORDS[index]
+
+    @property
+    def pad_data(self) -> np.ndarray:
+        """Latest, filtered, readings by (panel, sensor), updated in place."""
+        return self._values
+
+    @property
+    def stamp(self) -> float:
+        """USB arrival time of the packet behind pad_data."""
+        return self._stamp
+
+    @property
+    def history(self) -> SensorHistory:
+        return self._history
+
+    @property
+    def batch(self) -> np.ndarray:
+        """Every raw reading of the last take_sample, oldest first."""
+        return self._batch
+
+    @property
+    def readings(self) -> np.ndarray:
+        """Every reading of the last take_sample as the model gets it.
+
+        Filtered when a filter is set, oldest first; pad_data is the last.
+        """
+        return self._readings
+
+    @property
+    def stamps(self) -> np.ndarray:
+        """USB arrival time of each of the readings."""
+        return self._stamps
+
+    def pop_reply(self) -> tuple[bytes, float] | None:
+        """The oldest profile reply and its USB arrival time."""
+        return self._replies.pop(0) if self._replies else None
+
+    @property
+    def samples(self) -> int:
+        return self._samples
 
-    def organise_sensor_data(self, sensor_data: SynchronizedArray) -> None:
-        for index in range(0, len(sensor_data) // 2, 2):
-            panel_coord = PadModel.PANELS.coords[(index // 2) // 4]
-            sensor_coord = PadModel.SENSORS.coords[(index // 2) % 4]
-            sensor_value = sensor_data[index] + (sensor_data[index + 1] << 8)
-            self._pad_data[(panel_coord, sensor_coord)] = sensor_value
+    @property
+    def mean_latency(self) -> float:
+        """Mean seconds from USB read to consumption over all samples."""
+        return self._latency.mean
+
+    @property
+    def latency(self) -> LatencyHistogram:
+        return self._latency
 
     @property
-    def pad_data(self) -> dict[tuple[Coord, Coord], int]:
-        return self._pad_data.copy()
+    def overruns(self) -> int:
+        return self._ring.overruns
 
     @property
     def refreshed(self) -> bool:
@@ -0,0 +1,202 @@
+import abc
+import dataclasses
+import math
+
+import numpy as np
+
+
+class FilterStage(abc.ABC):
+    """One filter applied to every sensor of a sample at once.
+
+    Stages keep preallocated per-sensor state and are seeded with the
+    first sample they see, so they do not ramp up from zero.
+    """
+
+    def __init__(self, shape: tuple[int, ...]):
+        self._shape = shape
+        self._seeded = False
+
+    def reset(self) -> None:
+        self._seeded = False
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """Filter one float sample in place and return it."""
+        if not self._seeded:
+            self._seeded = True
+            self._seed(values)
+        return self._apply(values)
+
+    def _seed(self, values: np.ndarray) -> None:
+        pass
+
+    @abc.abstractmethod
+    def _apply(self, values: np.ndarray) -> np.ndarray:
+        """Filter a sample in place once the stage is seeded."""
+
+    @property
+    @abc.abstractmethod
+    def group_delay(self) -> float:
+        """Samples by which the stage delays a slow change in input."""
+
+
+class LowPassStage(FilterStage):
+    """Single-pole IIR low-pass, y += a * (x - y)."""
+
+    def __init__(
+        self, shape: tuple[int, ...], cutoff_hz: float, rate_hz: float
+    ):
+        super(LowPassStage, self).__init__(shape)
+        self._alpha = -math.expm1(-2 * math.pi * cutoff_hz / rate_hz)
+        self._state = np.zeros(shape, np.float64)
+
+    def _seed(self, values: np.ndarray) -> None:
+        self._state[:] = values
+
+    def _apply(self, values: np.ndarray) -> np.ndarray:
+        values -= self._state
+        values *= self._alpha
+        self._state += values
+        values[:] = self._state
+        return values
+
+    @property
+    def group_delay(self) -> float:
+        return (1 - self._alpha) / self._alpha
+
+
+class MedianStage(FilterStage):
+    """Median of the last size samples of each sensor."""
+
+    def __init__(self, shape: tuple[int, ...], size: int):
+        super(MedianStage, self).__init__(shape)
+        self._window = np.zeros((size, *shape), np.float64)
+        self._index = 0
+
+    def _seed(self, values: np.ndarray) -> None:
+        self._window[:] = values
+
+    def _apply(self, values: np.ndarray) -> np.ndarray:
+        self._window[self._index] = values
+        self._index = (self._index + 1) % len(self._window)
+        return np.median(self._window, axis=0, out=values)
+
+    @property
+    def group_delay(self) -> float:
+        return (len(self._window) - 1) / 2
+
+
+class SpikeStage(FilterStage):
+    """Holds the last value through jumps larger than limit.
+
+    A jump that persists for more than hold samples is a real step and
+    is passed on, so genuine presses are delayed by hold samples.
+    """
+
+    def __init__(self, shape: tuple[int, ...], limit: float, hold: int):
+        super(SpikeStage, self).__init__(shape)
+        self._limit = limit
+        self._hold = hold
+        self._last = np.zeros(shape, np.float64)
+        self._count = np.zeros(shape, np.int32)
+        self._jump = np.zeros(shape, bool)
+
+    def _seed(self, values: np.ndarray) -> None:
+        self._last[:] = values
+
+    def _apply(self, values: np.ndarray) -> np.ndarray:
+        jump, count = self._jump, self._count
+        np.greater(np.abs(values - self._last), self._limit, out=jump)
+        count += jump
+        count[~jump] = 0
+        jump &= count <= self._hold
+        np.copyto(values, self._last, where=jump)
+        count[~jump] = 0
+        self._last[:] = values
+        return values
+
+    @property
+    def group_delay(self) -> float:
+        return float(self._hold)
+
+
+@dataclasses.dataclass
+class FilterSettings:
+    """Stages of a SensorFilter, each disabled by a zero value."""
+
+    spike_limit: float = 0.0
+    spike_hold: int = 2
+    median_size: int = 0
+    lowpass_hz: float = 0.0
+
+
+class SensorFilter:
+    """Optional chain of filters between sensor decode and the model.
+
+    Stages run in the order spike rejection, median, low-pass, one
+    sample at a time since the IIR is recursive, but each step is
+    vectorised over every sensor with preallocated state. The delay each
+    stage adds is reported so noise rejection can be weighed against
+    input latency.
+    """
+
+    RATE_HZ = 1000.0
+
+    def __init__(
+        self, settings: FilterSettings, shape: tuple[int, ...] = (4, 4),
+        rate_hz: float = RATE_HZ
+    ):
+        self._settings = settings
+        self._rate = rate_hz
+        self._stages: list[FilterStage] = []
+        if settings.spike_limit > 0:
+            self._stages.append(
+                SpikeStage(shape, settings.spike_limit, settings.spike_hold)
+            )
+        if settings.median_size > 1:
+            self._stages.append(MedianStage(shape, settings.median_size))
+        if settings.lowpass_hz > 0:
+            self._stages.append(
+                LowPassStage(shape, settings.lowpass_hz, rate_hz)
+            )
+        self._sample = np.zeros(shape, np.float64)
+
+    def __bool__(self) -> bool:
+        return bool(self._stages)
+
+    def reset(self) -> None:
+        for stage in self._stages:
+            stage.reset()
+
+    def apply(
+        self, batch: np.ndarray, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Filter (n, ...) samples in order, return the last output.
+
+        Every output is also written to out when given. The returned
+        array is reused by the next call.
+        """
+        sample = self._sample
+        for index, values in enumerate(batch):
+            sample[:] = values
+            for stage in self._stages:
+                sample = stage.apply(sample)
+            if out is not None:
+                out[index] = sample
+        return sample
+
+    @property
+    def settings(self) -> FilterSettings:
+        return self._settings
+
+    @property
+    def delays(self) -> dict[str, float]:
+        """Group delay of each stage, in seconds."""
+        return {
+            type(stage).__name__: stage.group_delay / self._rate
+            for stage in self._stages
+        }
+
+    @property
+    def group_delay(self) -> float:
+        """Total group delay of the chain, in seconds."""
+        return sum(self.delays.values())
@@ -0,0 +1,133 @@
+import numpy as np
+
+from pad_model import Coord, PadModel
+
+Window = tuple[np.ndarray, np.ndarray]
+
+
+class SensorHistory:
+    """Preallocated ring of the latest timestamped (panel, sensor) frames.
+
+    Frames are written in place at a wrapping index, so recording never
+    allocates. Time windows are measured back from the newest frame and
+    come either as zero-copy views, split where the ring wraps, or as
+    one contiguous copy. Statistics of an empty window are NaN.
+    """
+
+    SECONDS = 10.0
+    RATE_HZ = 1000.0
+
+    def __init__(
+        self, seconds: float = SECONDS, rate_hz: float = RATE_HZ,
+        shape: tuple[int, int] = (4, 4)
+    ):
+        self._capacity = int(seconds * rate_hz)
+        self._stamps = np.zeros(self._capacity, np.float64)
+        self._frames = np.zeros((self._capacity, *shape), np.uint16)
+        self._written = 0
+
+    def __len__(self) -> int:
+        return min(self._written, self._capacity)
+
+    def extend(self, stamps: np.ndarray, frames: np.ndarray) -> None:
+        """Append frames, oldest first, overwriting the oldest if full."""
+        count = len(frames)
+        if count > self._capacity:
+            self._written += count - self._capacity
+            stamps, frames = stamps[-self._capacity:], frames[-self._capacity:]
+            count = self._capacity
+        start = self._written % self._capacity
+        first = min(count, self._capacity - start)
+        self._stamps[start:start + first] = stamps[:first]
+        self._frames[start:start + first] = frames[:first]
+        if first < count:
+            self._stamps[:count - first] = stamps[first:]
+            self._frames[:count - first] = frames[first:]
+        self._written += count
+
+    def clear(self) -> None:
+        self._written = 0
+
+    @staticmethod
+    def _panel_index(panel: int | Coord) -> int:
+        if isinstance(panel, tuple):
+            return PadModel.PANELS.coords.index(panel)
+        return panel
+
+    def segments(
+        self, seconds: float | None = None, panel: int | Coord | None = None
+    ) -> list[Window]:
+        """Zero-copy (stamps, frames) views of a window, oldest first."""
+        end = self._written % self._capacity
+        if self._written <= self._capacity:
+            bounds = [(0, self._written)]
+        else:
+            bounds = [(end, self._capacity), (0, end)]
+        segments = []
+        since = None if seconds is None else self.latest - seconds
+        for start, stop in bounds:
+            stamps = self._stamps[start:stop]
+            if since is not None:
+                start += int(np.searchsorted(stamps, since))
+            if start < stop:
+                frames = self._frames[start:stop]
+                if panel is not None:
+                    frames = frames[:, self._panel_index(panel)]
+                segments.append((self._stamps[start:stop], frames))
+        return segments
+
+    def window(
+        self, seconds: float | None = None, panel: int | Coord | None = None
+    ) -> Window:
+        """Contiguous copy of a window: (n,) stamps and (n, ...) frames."""
+        segments = self.segments(seconds, panel)
+        if not segments:
+            shape = self._frames.shape[1:]
+            if panel is not None:
+                shape = shape[1:]
+            return np.empty(0), np.empty((0, *shape), np.uint16)
+        if len(segments) == 1:
+            stamps, frames = segments[0]
+            return stamps.copy(), frames.copy()
+        return (
+            np.concatenate([stamps for stamps, _ in segments]),
+            np.concatenate([frames for _, frames in segments])
+        )
+
+    def _empty(self, panel: int | Coord | None) -> np.ndarray:
+        shape = self._frames.shape[1:]
+        return np.full(shape if panel is None else shape[1:], np.nan)
+
+    def minimum(
+        self, seconds: float | None = None, panel: int | Coord | None = None
+    ) -> np.ndarray:
+        if not (segments := self.segments(seconds, panel)):
+            return self._empty(panel)
+        return np.min([frames.min(axis=0) for _, frames in segments], axis=0)
+
+    def maximum(
+        self, seconds: float | None = None, panel: int | Coord | None = None
+    ) -> np.ndarray:
+        if not (segments := self.segments(seconds, panel)):
+            return self._empty(panel)
+        return np.max([frames.max(axis=0) for _, frames in segments], axis=0)
+
+    def percentile(
+        self, q: float, seconds: float | None = None,
+        panel: int | Coord | None = None
+    ) -> np.ndarray:
+        frames = self.window(seconds, panel)[1]
+        if not len(frames):
+            return self._empty(panel)
+        return np.percentile(frames, q, axis=0)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def latest(self) -> float:
+        """Timestamp of the newest frame."""
+        if not self._written:
+            return float('-inf')
+        return float(self._stamps[(self._written - 1) % self._capacity])
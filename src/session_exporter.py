@@ -0,0 +1,171 @@
+import pathlib
+import queue
+import threading
+
+import numpy as np
+
+Columns = dict[str, tuple[tuple[int, ...], np.dtype]]
+
+
+class ColumnTable:
+    """Chunk buffers of one table of columns, written as .npy files.
+
+    Rows are copied into a preallocated chunk; a full chunk is handed to
+    the writer and the next one taken from a pool of at most BUFFERS, so
+    memory stays bounded however long a session runs. Rows arriving while
+    every buffer is waiting to be written are dropped and counted.
+    """
+
+    BUFFERS = 3
+
+    def __init__(self, name: str, columns: Columns, rows: int):
+        self.name = name
+        self._columns = columns
+        self._rows = rows
+        self._free = [self._allocate() for _ in range(self.BUFFERS)]
+        self._buffer = self._free.pop()
+        self._filled = 0
+        self._chunk = 0
+        self.dropped = 0
+
+    def _allocate(self) -> dict[str, np.ndarray]:
+        return {
+            name: np.empty((self._rows, *shape), dtype)
+            for name, (shape, dtype) in self._columns.items()
+        }
+
+    def append(self, rows: dict[str, ...], count: int) -> list[tuple]:
+        """Copy count rows in, return the chunks that filled up."""
+        full = []
+        start = 0
+        while start < count:
+            if self._buffer is None:
+                if not self._free:
+                    self.dropped += count - start
+                    break
+                self._buffer = self._free.pop()
+            take = min(count - start, self._rows - self._filled)
+            for name, column in self._buffer.items():
+                values = rows[name]
+                if np.ndim(values) > len(self._columns[name][0]):
+                    values = values[start:start + take]
+                column[self._filled:self._filled + take] = values
+            self._filled += take
+            start += take
+            if self._filled == self._rows:
+                full.append(self._take())
+        return full
+
+    def _take(self) -> tuple:
+        chunk = (self, self._chunk, self._buffer, self._filled)
+        self._chunk += 1
+        self._buffer = None
+        self._filled = 0
+        return chunk
+
+    def flush(self) -> list[tuple]:
+        if self._buffer is None or not self._filled:
+            return []
+        return [self._take()]
+
+    def release(self, buffer: dict[str, np.ndarray]) -> None:
+        self._free.append(buffer)
+
+
+class SessionExporter:
+    """Streams a session to columnar .npy chunks from a writer thread.
+
+    Tables, each a directory of <column>_<chunk>.npy files:
+      sensors: stamp, values    every raw (panel, sensor) reading
+      states:  stamp, pressed, base    the model after each update
+      leds:    stamp, colours    every LED frame, (panel, led, rgb)
+    Load them back, memory-mapped, with SessionExporter.load().
+    The first error writing a chunk is kept in error and raised by
+    close(); the writer carries on with the chunks after it.
+    """
+
+    SENSOR_ROWS = 1 << 16
+    STATE_ROWS = 1 << 16
+    LED_ROWS = 1 << 12
+
+    def __init__(
+        self, directory: str | pathlib.Path, num_panels: int = 4,
+        num_sensors: int = 4, num_leds: int = 84
+    ):
+        self._directory = pathlib.Path(directory)
+        sensors = (num_panels, num_sensors)
+        self._tables = {
+            "sensors": ColumnTable("sensors", {
+                "stamp": ((), np.float64),
+                "values": (sensors, np.uint16),
+            }, self.SENSOR_ROWS),
+            "states": ColumnTable("states", {
+                "stamp": ((), np.float64),
+                "pressed": ((num_panels,), bool),
+                "base": (sensors, np.int32),
+            }, self.STATE_ROWS),
+            "leds": ColumnTable("leds", {
+                "stamp": ((), np.float64),
+                "colours": ((num_panels, num_leds, 3), np.uint8),
+            }, self.LED_ROWS),
+        }
+        for name in self._tables:
+            (self._directory / name).mkdir(parents=True, exist_ok=True)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._error: Exception | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, table: str, count: int = 1, **rows: ...) -> None:
+        """Add count rows, one array per column, oldest first."""
+        with self._lock:
+            chunks = self._tables[table].append(rows, count)
+        for chunk in chunks:
+            self._queue.put(chunk)
+
+    def _run(self) -> None:
+        while (chunk := self._queue.get()) is not None:
+            table, index, buffer, rows = chunk
+            directory = self._directory / table.name
+            try:
+                for name, column in buffer.items():
+                    np.save(
+                        directory / f"{name}_{index:05d}.npy", column[:rows]
+                    )
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+            with self._lock:
+                table.release(buffer)
+
+    def close(self) -> None:
+        """Write the partial chunks and wait for the writer to finish."""
+        with self._lock:
+            chunks = [
+                chunk for table in self._tables.values()
+                for chunk in table.flush()
+            ]
+        for chunk in chunks:
+            self._queue.put(chunk)
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def error(self) -> Exception | None:
+        """The first error writing a chunk, if any."""
+        return self._error
+
+    @property
+    def dropped(self) -> dict[str, int]:
+        return {name: table.dropped for name, table in self._tables.items()}
+
+    @staticmethod
+    def load(
+        directory: str | pathlib.Path, table: str, column: str
+    ) -> list[np.ndarray]:
+        """Memory-mapped chunks of one column, in order."""
+        paths = (pathlib.Path(directory) / table).glob(f"{column}_*.npy")
+        return [np.load(path, mmap_mode='r') for path in sorted(paths)]
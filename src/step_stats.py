@@ -0,0 +1,103 @@
+import numpy as np
+
+from usb_stats import LatencyHistogram
+
+
+class StepStats:
+    """Running per-panel step statistics from press and release edges.
+
+    Counters and fixed-size histograms only, so every update is O(1) and
+    memory does not grow with session length. A re-press within
+    DOUBLE_TRIGGER seconds of the panel's last release counts as a double
+    trigger, the usual sign of a noisy sensor or a too-low hysteresis.
+    Peak pressure is the largest sensor reading above its baseline while
+    the panel was pressed.
+    """
+
+    DOUBLE_TRIGGER = 0.05
+    PEAK_BINS = 64
+    PEAK_MAX = 4096
+
+    def __init__(
+        self, num_panels: int = 4, double_trigger: float = DOUBLE_TRIGGER
+    ):
+        self._double_trigger = double_trigger
+        self._presses = np.zeros(num_panels, np.int64)
+        self._doubles = np.zeros(num_panels, np.int64)
+        self._pressed_at = np.full(num_panels, np.nan)
+        self._released_at = np.full(num_panels, np.nan)
+        self._peak = np.zeros(num_panels, np.int32)
+        self._peak_counts = np.zeros((num_panels, self.PEAK_BINS), np.int64)
+        self._durations = [LatencyHistogram() for _ in range(num_panels)]
+        self._intervals = [LatencyHistogram() for _ in range(num_panels)]
+
+    def reset(self) -> None:
+        for array in (self._presses, self._doubles, self._peak_counts):
+            array[:] = 0
+        self._pressed_at[:] = np.nan
+        self._released_at[:] = np.nan
+        self._peak[:] = 0
+        for histogram in self._durations + self._intervals:
+            histogram.reset()
+
+    def update(
+        self, edges: list[tuple[int, bool]], now: float,
+        pressed: np.ndarray, delta: np.ndarray
+    ) -> None:
+        """Apply one model update.
+
+        edges are the (panel, pressed) edges of the sample, pressed the
+        panel states after it and delta its (panel, sensor) readings above
+        baseline.
+        """
+        np.maximum(
+            self._peak, delta.max(axis=1), out=self._peak,
+            where=pressed, casting='unsafe'
+        )
+        for panel, down in edges:
+            if down:
+                self._press(panel, now)
+            else:
+                self._release(panel, now)
+
+    def _press(self, panel: int, now: float) -> None:
+        self._presses[panel] += 1
+        if not np.isnan(last := self._pressed_at[panel]):
+            self._intervals[panel].record(now - last)
+        if now - self._released_at[panel] < self._double_trigger:
+            self._doubles[panel] += 1
+        self._pressed_at[panel] = now
+
+    def _release(self, panel: int, now: float) -> None:
+        if not np.isnan(start := self._pressed_at[panel]):
+            self._durations[panel].record(now - start)
+        self._released_at[panel] = now
+        peak = min(max(int(self._peak[panel]), 0), self.PEAK_MAX - 1)
+        self._peak_counts[panel, peak * self.PEAK_BINS // self.PEAK_MAX] += 1
+        self._peak[panel] = 0
+
+    def _peak_percentile(self, panel: int, q: float) -> float:
+        """Upper edge of the peak bin holding the q-th percentile."""
+        cumulative = np.cumsum(self._peak_counts[panel])
+        if not cumulative[-1]:
+            return 0.0
+        index = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+        return float((index + 1) * self.PEAK_MAX / self.PEAK_BINS)
+
+    def summary(self) -> list[dict[str, float]]:
+        """Statistics of each panel, in panel index order."""
+        return [
+            {
+                "presses": float(self._presses[panel]),
+                "double_triggers": float(self._doubles[panel]),
+                "duration_p50_ms": duration.percentile(50) * 1e3,
+                "duration_p99_ms": duration.percentile(99) * 1e3,
+                "interval_p50_ms": interval.percentile(50) * 1e3,
+                "interval_p01_ms": interval.percentile(1) * 1e3,
+                "peak_p50": self._peak_percentile(panel, 50),
+                "peak_p01": self._peak_percentile(panel, 1),
+            }
+            for panel, (duration, interval) in enumerate(
+                zip(self._durations, self._intervals)
+            )
+        ]
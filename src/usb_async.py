@@ -0,0 +1,359 @@
+import array
+import ctypes
+import multiprocessing
+import queue
+import threading
+import time
+from collections.abc import Callable
+
+import usb.core
+import usb.util
+
+from packet_ring import PacketRing
+from usb_controller import (
+    HIDEndpointProcess, HIDReadProcess, HIDWriteProcess, USBDeviceList
+)
+from usb_info import HIDInfo
+from usb_libusb import (
+    Libusb, LibusbError, Timeval, Transfer, TransferCallback
+)
+from usb_stats import TransferTimer
+from write_scheduler import WriteScheduler
+
+ReadCallback = Callable[[memoryview, float, float], None]
+# control, start, end and whether the packet was written.
+WriteCallback = Callable[[bool, float, float, bool], None]
+
+
+class LibusbTransport:
+    """Queued asynchronous interrupt transfers on a private libusb context.
+
+    Every IN transfer is resubmitted as soon as it completes or times out,
+    so the endpoint always has in_transfers requests outstanding. Any
+    other IN status stops the transfer, and the error is raised from the
+    next handle_events. OUT transfers are taken from a free list and
+    returned to it on completion, failed or not. Callbacks get the submit
+    and completion times, so IN durations include the time a transfer
+    spent queued behind the others.
+    """
+
+    RESUBMIT = (Libusb.TRANSFER_COMPLETED, Libusb.TRANSFER_TIMED_OUT)
+
+    def __init__(
+        self, device: usb.core.Device, info: HIDInfo, in_transfers: int,
+        out_transfers: int, on_read: ReadCallback, on_write: WriteCallback
+    ):
+        self._lib = Libusb.load()
+        self._info = info
+        self._on_read = on_read
+        self._on_write = on_write
+        self._closing = False
+        self._error: Exception | None = None
+        self._ctx = ctypes.c_void_p()
+        Libusb.check("libusb_init", self._lib.libusb_init(self._ctx))
+        self._handle = self._open(device.bus, device.address)
+        self._lib.libusb_set_auto_detach_kernel_driver(self._handle, 1)
+        Libusb.check(
+            "libusb_claim_interface",
+            self._lib.libusb_claim_interface(self._handle, 0)
+        )
+        self._callback = TransferCallback(self._complete)
+        self._records = {}
+        self._free = []
+        self._in_flight = 0
+        for _ in range(in_transfers):
+            self._submit(self._allocate(info.READ_EP))
+        for _ in range(out_transfers):
+            self._free.append(self._allocate(info.WRITE_EP))
+
+    def _open(self, bus: int, address: int) -> ctypes.c_void_p:
+        devices = ctypes.POINTER(ctypes.c_void_p)()
+        count = Libusb.check(
+            "libusb_get_device_list",
+            self._lib.libusb_get_device_list(self._ctx, devices)
+        )
+        try:
+            for index in range(count):
+                dev = devices[index]
+                if (
+                    self._lib.libusb_get_bus_number(dev) == bus
+                    and self._lib.libusb_get_device_address(dev) == address
+                ):
+                    handle = ctypes.c_void_p()
+                    Libusb.check(
+                        "libusb_open", self._lib.libusb_open(dev, handle)
+                    )
+                    return handle
+        finally:
+            self._lib.libusb_free_device_list(devices, 1)
+        raise LibusbError("libusb_open", Libusb.ERROR_NOT_FOUND)
+
+    def _allocate(self, endpoint: int) -> ctypes.POINTER(Transfer):
+        transfer = self._lib.libusb_alloc_transfer(0)
+        buffer = (ctypes.c_ubyte * self._info.BYTES)()
+        t = transfer.contents
+        t.dev_handle = self._handle.value
+        t.endpoint = endpoint
+        t.type = Libusb.TRANSFER_TYPE_INTERRUPT
+        t.timeout = 0
+        t.length = self._info.BYTES
+        t.buffer = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ubyte))
+        t.callback = self._callback
+        self._records[ctypes.addressof(t)] = [
+            transfer, memoryview(buffer).cast('B'), False, 0.0
+        ]
+        return transfer
+
+    def _submit(self, transfer: ctypes.POINTER(Transfer)) -> None:
+        self._records[ctypes.addressof(transfer.contents)][3] = (
+            time.perf_counter()
+        )
+        Libusb.check(
+            "libusb_submit_transfer",
+            self._lib.libusb_submit_transfer(transfer)
+        )
+        self._in_flight += 1
+
+    def _complete(self, transfer: ctypes.POINTER(Transfer)) -> None:
+        t = transfer.contents
+        record = self._records[ctypes.addressof(t)]
+        self._in_flight -= 1
+        completed = t.status == Libusb.TRANSFER_COMPLETED
+        stamp = time.perf_counter()
+        if t.endpoint == self._info.READ_EP:
+            if completed:
+                self._on_read(record[1][:t.actual_length], record[3], stamp)
+            if self._closing or self._error is not None:
+                return
+            if t.status not in self.RESUBMIT:
+                self._error = LibusbError("IN transfer", t.status)
+                return
+            # An exception would be lost inside the ctypes callback.
+            try:
+                self._submit(record[0])
+            except LibusbError as error:
+                self._error = error
+        else:
+            self._free.append(record[0])
+            self._on_write(record[2], record[3], stamp, completed)
+
+    def submit_write(self, packet: array.array, control: bool) -> None:
+        transfer = self._free.pop()
+        record = self._records[ctypes.addressof(transfer.contents)]
+        record[1][:] = packet
+        record[2] = control
+        try:
+            self._submit(transfer)
+        except LibusbError:
+            self._free.append(transfer)
+            stamp = time.perf_counter()
+            self._on_write(control, stamp, stamp, False)
+
+    def handle_events(self, timeout: float) -> None:
+        """Run completions, raise the error that stopped the IN endpoint."""
+        tv = Timeval(0, int(timeout * 1e6))
+        self._lib.libusb_handle_events_timeout_completed(
+            self._ctx, tv, None
+        )
+        if self._error is not None and not self._closing:
+            raise self._error
+
+    def close(self) -> None:
+        self._closing = True
+        for transfer, *_ in self._records.values():
+            self._lib.libusb_cancel_transfer(transfer)
+        deadline = time.perf_counter() + 1.0
+        while self._in_flight and time.perf_counter() < deadline:
+            self.handle_events(0.01)
+        for transfer, *_ in self._records.values():
+            self._lib.libusb_free_transfer(transfer)
+        self._lib.libusb_release_interface(self._handle, 0)
+        self._lib.libusb_close(self._handle)
+        self._lib.libusb_exit(self._ctx)
+
+    @property
+    def free_writes(self) -> int:
+        return len(self._free)
+
+
+class ThreadedTransport:
+    """Stand-in for devices without libusb async support, e.g. loopbacks.
+
+    A blocking reader and writer thread replace the queued transfers, so
+    only one transfer per direction is ever outstanding. Completions are
+    still delivered on the engine thread from handle_events. A failed
+    write is reported as such and the writer carries on; a failed read
+    stops the reader, and handle_events raises its error.
+    """
+
+    def __init__(
+        self, device: ..., info: HIDInfo, on_read: ReadCallback,
+        on_write: WriteCallback
+    ):
+        self._device = device
+        self._info = info
+        self._on_read = on_read
+        self._on_write = on_write
+        self._completions = queue.SimpleQueue()
+        self._writes = queue.SimpleQueue()
+        self._free = 1
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def _read_loop(self) -> None:
+        buffer = array.array('B', bytes(self._info.BYTES))
+        while True:
+            start = time.perf_counter()
+            try:
+                count = self._device.read(self._info.READ_EP, buffer)
+            except usb.core.USBTimeoutError:
+                continue
+            except Exception as error:
+                self._completions.put((error,))
+                return
+            stamp = time.perf_counter()
+            self._completions.put((buffer[:count].tobytes(), start, stamp))
+
+    def _write_loop(self) -> None:
+        while True:
+            packet, control = self._writes.get()
+            start = time.perf_counter()
+            try:
+                self._device.write(self._info.WRITE_EP, packet)
+            except Exception:
+                written = False
+            else:
+                written = True
+            stamp = time.perf_counter()
+            self._completions.put((None, control, start, stamp, written))
+
+    def submit_write(self, packet: array.array, control: bool) -> None:
+        self._free -= 1
+        self._writes.put((packet.tobytes(), control))
+
+    def handle_events(self, timeout: float) -> None:
+        try:
+            completion = self._completions.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            if isinstance(completion[0], Exception):
+                raise completion[0]
+            if completion[0] is None:
+                self._free += 1
+                self._on_write(*completion[1:])
+            else:
+                self._on_read(memoryview(completion[0]), *completion[1:])
+            try:
+                completion = self._completions.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self) -> None:
+        pass
+
+    @property
+    def free_writes(self) -> int:
+        return self._free
+
+
+class AsyncUSBEngine(HIDEndpointProcess):
+    """Services both endpoints of a pad from a single process.
+
+    Exposes the same ring and scheduler as HIDReadProcess and
+    HIDWriteProcess, but keeps several transfers queued per direction
+    instead of one blocking transfer per process.
+    """
+
+    IN_TRANSFERS = 4
+    OUT_TRANSFERS = 2
+    EVENT_TIMEOUT = 0.001
+    STOP_TIMEOUT = 2.0
+
+    def __init__(
+        self, pad_info: HIDInfo, serial: str,
+        packet_rate: float = HIDWriteProcess.DEFAULT_PACKET_RATE,
+        in_transfers: int = IN_TRANSFERS, out_transfers: int = OUT_TRANSFERS
+    ):
+        self._packet_rate = packet_rate
+        self._in_transfers = in_transfers
+        self._out_transfers = out_transfers
+        super(AsyncUSBEngine, self).__init__(pad_info, serial)
+
+    def _create_buffers(self) -> None:
+        self._ring = PacketRing(HIDReadProcess.RING_CAPACITY, self._info.BYTES)
+        self._scheduler = WriteScheduler(self._info.BYTES, self._packet_rate)
+        self._buffer = array.array('B', bytes(self._info.BYTES))
+        self._timers["read"] = TransferTimer()
+        self._timers["write"] = TransferTimer()
+        self._stop = multiprocessing.Event()
+
+    def terminate(self) -> None:
+        """Stop the loop so the transport closes, kill it on a timeout."""
+        self._stop.set()
+        self.join(self.STOP_TIMEOUT)
+        if self.is_alive():
+            super().terminate()
+            self.join()
+        self._ring.close()
+
+    def run(self) -> None:
+        device = USBDeviceList.get_device_by_serial(
+            self._info.VID, self._info.PID, self._serial, self._finder,
+            self._location
+        )
+        if device is None:
+            return
+        if isinstance(device, usb.core.Device) and Libusb.available():
+            # Hand the device over to our own libusb context.
+            usb.util.dispose_resources(device)
+            transport = LibusbTransport(
+                device, self._info, self._in_transfers, self._out_transfers,
+                self._on_read, self._on_write
+            )
+        else:
+            transport = ThreadedTransport(
+                device, self._info, self._on_read, self._on_write
+            )
+        try:
+            while not self._stop.is_set():
+                self._process_transport(transport)
+        finally:
+            transport.close()
+
+    def _on_read(self, packet: memoryview, start: float, end: float) -> None:
+        self._timers["read"].record(start, end)
+        self._ring.push(packet, end)
+
+    def _on_write(
+        self, control: bool, start: float, end: float, written: bool
+    ) -> None:
+        if not written:
+            self._scheduler.count_failed(control)
+            return
+        self._timers["write"].record(start, end)
+        self._scheduler.count_sent(control)
+
+    def _process_transport(
+        self, transport: LibusbTransport | ThreadedTransport
+    ) -> None:
+        while transport.free_writes:
+            control = self._scheduler.poll_packet(self._buffer)
+            if control is None:
+                break
+            transport.submit_write(self._buffer, control)
+        timeout = self._scheduler.wait_timeout()
+        if timeout is None or timeout > self.EVENT_TIMEOUT:
+            timeout = self.EVENT_TIMEOUT
+        start = time.perf_counter()
+        transport.handle_events(timeout)
+        if transport.free_writes:
+            self._scheduler.count_idle(time.perf_counter() - start)
+
+    @property
+    def ring(self) -> PacketRing:
+        return self._ring
+
+    @property
+    def scheduler(self) -> WriteScheduler:
+        return self._scheduler
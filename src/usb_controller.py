@@ -1,38 +1,68 @@
+import array
 import multiprocessing
-from multiprocessing.sharedctypes import SynchronizedArray
-from multiprocessing.synchronize import Event
+import time
+from collections.abc import Callable
 
 import libusb_package
 import usb.core
 import usb.backend.libusb1
 
+from packet_ring import PacketRing
 from usb_info import HIDInfo
+from usb_registry import DeviceRegistry, Location
+from usb_stats import TransferTimer
+from write_scheduler import WriteScheduler
+
+
+DeviceFinder = Callable[..., ...]
 
 
 class USBDeviceList:
     """Device list class for a given dance pad specification."""
 
-    @staticmethod
-    def connected_device_names(info: HIDInfo) -> list[str | None]:
-        devs: list[usb.core.Device] = []
-        for dev in libusb_package.find(
-            find_all=True,  idVendor=info.VID, idProduct=info.PID
-        ):
-            devs.append(dev)
-        return [dev.serial_number for dev in devs]
-
-    @staticmethod
+    _finder: DeviceFinder = libusb_package.find
+    _registries: dict[tuple[int, int, DeviceFinder], DeviceRegistry] = {}
+
+    @classmethod
+    def set_finder(cls, finder: DeviceFinder | None = None) -> None:
+        """Replace libusb_package.find, e.g. with a LoopbackFinder."""
+        cls._finder = finder or libusb_package.find
+
+    @classmethod
+    def finder(cls) -> DeviceFinder:
+        return cls._finder
+
+    @classmethod
+    def registry(
+        cls, vid: int, pid: int, finder: DeviceFinder | None = None,
+        hotplug: bool = True
+    ) -> DeviceRegistry:
+        """The registry of this process, hotplug only starts a monitor."""
+        key = (vid, pid, finder or cls._finder)
+        registry = cls._registries.get(key)
+        if registry is None or registry.stale:
+            registry = DeviceRegistry(*key, hotplug=hotplug)
+            cls._registries[key] = registry
+        return registry
+
+    @classmethod
+    def connected_device_names(cls, info: HIDInfo) -> list[str | None]:
+        return cls.registry(info.VID, info.PID).serials()
+
+    @classmethod
     def get_device_by_serial(
-        vid: int, pid: int, serial: str
+        cls, vid: int, pid: int, serial: str,
+        finder: DeviceFinder | None = None, location: Location | None = None
     ) -> usb.core.Device | None:
-        devices: list[usb.core.Device] | None = libusb_package.find(
-            find_all=True, idVendor=vid, idProduct=pid
-        )
-        if devices is None:
-            return
-        for device in devices:
-            if device.serial_number == serial:
-                return device
+        """Look up a device from an endpoint process.
+
+        Only the parent process monitors hotplug events; an endpoint looks
+        up its one device, at the location the parent resolved, without.
+        """
+        registry = cls.registry(vid, pid, finder, hotplug=False)
+        if location is not None:
+            registry.seed(location, serial)
+        return registry.get(serial)
 
 
 class HIDEndpointProcess(multiprocessing.Process):
@@ -42,17 +72,25 @@ class HIDEndpointProcess(multiprocessing.Process):
         super(HIDEndpointProcess, self).__init__()
         self._info = pad_info
         self._serial = serial
-        self._data = multiprocessing.Array('i', self._info.BYTES)
-        self._event = multiprocessing.Event()
         self._device = None
+        self._finder = USBDeviceList.finder()
+        self._location = USBDeviceList.registry(
+            pad_info.VID, pad_info.PID
+        ).location(serial)
+        self._timers: dict[str, TransferTimer] = {}
+        self._create_buffers()
         self.start()
 
+    def _create_buffers(self) -> None:
+        pass
+
     def terminate(self) -> None:
         super().terminate()
 
     def run(self) -> None:
         self._device = USBDeviceList.get_device_by_serial(
-            self._info.VID, self._info.PID, self._serial
+            self._info.VID, self._info.PID, self._serial, self._finder,
+            self._location
         )
         if self._device is None:
             return
@@ -63,32 +101,71 @@ class HIDEndpointProcess(multiprocessing.Process):
         pass
 
     @property
-    def data(self) -> SynchronizedArray:
-        return self._data
-
-    @property
-    def event(self) -> Event:
-        return self._event
+    def timers(self) -> dict[str, TransferTimer]:
+        """Transfer timing histograms, shared with the child process."""
+        return self._timers
 
 
 class HIDReadProcess(HIDEndpointProcess):
     """Child class for reading data from an HID Endpoint."""
 
+    RING_CAPACITY = 256
+
+    def _create_buffers(self) -> None:
+        self._ring = PacketRing(self.RING_CAPACITY, self._info.BYTES)
+        self._buffer = array.array('B', bytes(self._info.BYTES))
+        self._timers["read"] = TransferTimer()
+
+    def terminate(self) -> None:
+        super().terminate()
+        self.join()
+        self._ring.close()
+
     def _process(self) -> None:
         self._device: usb.core.Device
-        sensor_data = self._device.read(self._info.READ_EP, self._info.BYTES)
-        with self._data.get_lock():
-            for i, v in enumerate(sensor_data):
-                self._data[i] = v
-        self._event.set()
+        start = time.perf_counter()
+        try:
+            count = self._device.read(self._info.READ_EP, self._buffer)
+        except usb.core.USBTimeoutError:
+            return
+        end = time.perf_counter()
+        self._timers["read"].record(start, end)
+        self._ring.push(memoryview(self._buffer)[:count], end)
+
+    @property
+    def ring(self) -> PacketRing:
+        return self._ring
 
 
 class HIDWriteProcess(HIDEndpointProcess):
     """Child class for writing data to an HID Endpoint."""
 
+    DEFAULT_PACKET_RATE = 960.0
+
+    def __init__(
+        self, pad_info: HIDInfo, serial: str,
+        packet_rate: float = DEFAULT_PACKET_RATE
+    ):
+        self._packet_rate = packet_rate
+        super(HIDWriteProcess, self).__init__(pad_info, serial)
+
+    def _create_buffers(self) -> None:
+        self._scheduler = WriteScheduler(self._info.BYTES, self._packet_rate)
+        self._buffer = array.array('B', bytes(self._info.BYTES))
+        self._timers["write"] = TransferTimer()
+
     def _process(self) -> None:
         self._device: usb.core.Device
-        with self._data.get_lock():
-            data = [d for d in self._data]
-        self._device.write(self._info.WRITE_EP, data)
-        self._event.set()
+        control = self._scheduler.next_packet(self._buffer)
+        start = time.perf_counter()
+        try:
+            self._device.write(self._info.WRITE_EP, self._buffer)
+        except usb.core.USBError:
+            self._scheduler.count_failed(control)
+            return
+        self._timers["write"].record(start, time.perf_counter())
+        self._scheduler.count_sent(control)
+
+    @property
+    def scheduler(self) -> WriteScheduler:
+        return self._scheduler
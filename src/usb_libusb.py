@@ -0,0 +1,141 @@
+import ctypes
+import ctypes.util
+
+import libusb_package
+
+
+class LibusbError(Exception):
+    """Raised when a libusb call returns an error code."""
+
+    def __init__(self, function: str, code: int):
+        super(LibusbError, self).__init__(f"{function} failed ({code})")
+        self.code = code
+
+
+class Timeval(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_usec", ctypes.c_long)]
+
+
+class DeviceDescriptor(ctypes.Structure):
+    _fields_ = [
+        ("bLength", ctypes.c_uint8),
+        ("bDescriptorType", ctypes.c_uint8),
+        ("bcdUSB", ctypes.c_uint16),
+        ("bDeviceClass", ctypes.c_uint8),
+        ("bDeviceSubClass", ctypes.c_uint8),
+        ("bDeviceProtocol", ctypes.c_uint8),
+        ("bMaxPacketSize0", ctypes.c_uint8),
+        ("idVendor", ctypes.c_uint16),
+        ("idProduct", ctypes.c_uint16),
+        ("bcdDevice", ctypes.c_uint16),
+        ("iManufacturer", ctypes.c_uint8),
+        ("iProduct", ctypes.c_uint8),
+        ("iSerialNumber", ctypes.c_uint8),
+        ("bNumConfigurations", ctypes.c_uint8),
+    ]
+
+
+class Transfer(ctypes.Structure):
+    pass
+
+
+TransferCallback = ctypes.CFUNCTYPE(None, ctypes.POINTER(Transfer))
+HotplugCallback = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int,
+    ctypes.c_void_p
+)
+
+Transfer._fields_ = [
+    ("dev_handle", ctypes.c_void_p),
+    ("flags", ctypes.c_uint8),
+    ("endpoint", ctypes.c_ubyte),
+    ("type", ctypes.c_ubyte),
+    ("timeout", ctypes.c_uint),
+    ("status", ctypes.c_int),
+    ("length", ctypes.c_int),
+    ("actual_length", ctypes.c_int),
+    ("callback", TransferCallback),
+    ("user_data", ctypes.c_void_p),
+    ("buffer", ctypes.POINTER(ctypes.c_ubyte)),
+    ("num_iso_packets", ctypes.c_int),
+]
+
+
+class Libusb:
+    """Minimal ctypes binding to the libusb-1.0 shipped by libusb_package.
+
+    Only the calls pyusb does not expose are bound: asynchronous
+    transfers, hotplug notifications and event handling on a private
+    context.
+    """
+
+    ERROR_NOT_FOUND = -5
+    CAP_HAS_HOTPLUG = 0x0001
+    HOTPLUG_ARRIVED = 0x01
+    HOTPLUG_LEFT = 0x02
+    TRANSFER_TYPE_INTERRUPT = 3
+    TRANSFER_COMPLETED = 0
+    TRANSFER_TIMED_OUT = 2
+    TRANSFER_CANCELLED = 3
+    TRANSFER_NO_DEVICE = 5
+
+    _lib = None
+
+    @classmethod
+    def load(cls) -> ctypes.CDLL:
+        if cls._lib is None:
+            path = libusb_package.get_library_path()
+            path = path or ctypes.util.find_library("usb-1.0")
+            if path is None:
+                raise OSError("libusb-1.0 library not found.")
+            cls._lib = cls._declare(ctypes.CDLL(str(path)))
+        return cls._lib
+
+    @staticmethod
+    def _declare(lib: ctypes.CDLL) -> ctypes.CDLL:
+        p, i, vp = ctypes.POINTER, ctypes.c_int, ctypes.c_void_p
+        signatures = {
+            "libusb_init": (i, [p(vp)]),
+            "libusb_exit": (None, [vp]),
+            "libusb_get_device_list": (ctypes.c_ssize_t, [vp, p(p(vp))]),
+            "libusb_free_device_list": (None, [p(vp), i]),
+            "libusb_get_device_descriptor": (i, [vp, p(DeviceDescriptor)]),
+            "libusb_get_bus_number": (ctypes.c_uint8, [vp]),
+            "libusb_get_device_address": (ctypes.c_uint8, [vp]),
+            "libusb_open": (i, [vp, p(vp)]),
+            "libusb_close": (None, [vp]),
+            "libusb_set_auto_detach_kernel_driver": (i, [vp, i]),
+            "libusb_claim_interface": (i, [vp, i]),
+            "libusb_release_interface": (i, [vp, i]),
+            "libusb_alloc_transfer": (p(Transfer), [i]),
+            "libusb_free_transfer": (None, [p(Transfer)]),
+            "libusb_submit_transfer": (i, [p(Transfer)]),
+            "libusb_cancel_transfer": (i, [p(Transfer)]),
+            "libusb_handle_events_timeout_completed": (
+                i, [vp, p(Timeval), p(i)]
+            ),
+            "libusb_has_capability": (i, [ctypes.c_uint32]),
+            "libusb_hotplug_register_callback": (
+                i, [vp, i, i, i, i, i, HotplugCallback, vp, p(i)]
+            ),
+            "libusb_hotplug_deregister_callback": (None, [vp, i]),
+        }
+        for name, (restype, argtypes) in signatures.items():
+            function = getattr(lib, name)
+            function.restype = restype
+            function.argtypes = argtypes
+        return lib
+
+    @staticmethod
+    def check(function: str, code: int) -> int:
+        if code < 0:
+            raise LibusbError(function, code)
+        return code
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            cls.load()
+        except (OSError, AttributeError):
+            return False
+        return True
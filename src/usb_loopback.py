@@ -0,0 +1,238 @@
+import array
+import dataclasses
+import hashlib
+import multiprocessing
+import queue
+import struct
+import time
+
+import usb.core
+
+from usb_info import HIDInfo, ReflexV2Info
+
+
+@dataclasses.dataclass
+class ReceivedPacket:
+    """Packet written to a loopback pad, stamped on arrival."""
+
+    timestamp: float
+    endpoint: int
+    data: bytes
+
+
+class PressureScript:
+    """Repeating sequence of 16 sensor values played back by a loopback pad.
+
+    Each step is a (duration in seconds, sensor values) pair; the script
+    loops once the last step has elapsed.
+    """
+
+    NUM_SENSORS = 16
+
+    def __init__(self, steps: list[tuple[float, list[int]]]):
+        if not steps:
+            raise ValueError("A pressure script needs at least one step.")
+        self._steps = [(float(d), list(v)) for d, v in steps]
+        self._period = sum(d for d, _ in self._steps)
+
+    @classmethod
+    def idle(cls, base: int = 200) -> "PressureScript":
+        return cls([(1.0, [base] * cls.NUM_SENSORS)])
+
+    @classmethod
+    def stepping(
+        cls, base: int = 200, pressure: int = 150, hold: float = 0.1,
+        gap: float = 0.15
+    ) -> "PressureScript":
+        """Press each panel in turn, all four sensors of a panel at once.
+
+        Every press follows a gap, so the first samples of the script, which
+        the baseline is taken from, are unpressed.
+        """
+        steps = []
+        for panel in range(cls.NUM_SENSORS // 4):
+            values = [base] * cls.NUM_SENSORS
+            values[panel * 4:panel * 4 + 4] = [base + pressure] * 4
+            steps.append((gap, [base] * cls.NUM_SENSORS))
+            steps.append((hold, values))
+        return cls(steps)
+
+    def values(self, elapsed: float) -> list[int]:
+        if self._period <= 0:
+            return self._steps[-1][1]
+        elapsed %= self._period
+        for duration, values in self._steps:
+            if elapsed < duration:
+                return values
+            elapsed -= duration
+        return self._steps[-1][1]
+
+
+class LoopbackPad:
+    """Simulated RE:Flex v2 pad shared by every process that opens it.
+
+    Config mode, the stored profile, pending profile replies and the record
+    of received packets live in multiprocessing primitives, so the read and
+    write endpoint processes see the same device.
+    """
+
+    ENTER_CONFIG = hashlib.sha512(b"REFLEXENTERCONFIG").digest()
+    EXIT_CONFIG = hashlib.sha512(b"REFLEXEXITCONFIG").digest()
+    PROFILE_PUSH = 0xF0
+    PROFILE_READ = 0xF1
+    PROFILE_BYTES = 36
+    DEFAULT_PROFILE = [30, 5] * 16 + [ord(k) for k in "ABCD"]
+
+    def __init__(
+        self, serial: str, rate_hz: float = 1000.0,
+        script: PressureScript | None = None, record: bool = True,
+        drop_replies: int = 0
+    ):
+        self.serial = serial
+        self.rate_hz = rate_hz
+        self.script = script or PressureScript.idle()
+        self.record = record
+        self._config = multiprocessing.Value('b', 0)
+        self._drop_replies = multiprocessing.Value('i', drop_replies)
+        self._profile = multiprocessing.Array('B', self.DEFAULT_PROFILE)
+        self._replies = multiprocessing.Queue()
+        self._received = multiprocessing.Queue()
+
+    @property
+    def config_mode(self) -> bool:
+        return bool(self._config.value)
+
+    @property
+    def profile(self) -> bytes:
+        with self._profile.get_lock():
+            return bytes(self._profile)
+
+    def received(self) -> list[ReceivedPacket]:
+        """Drain every packet recorded since the last call.
+
+        Call this regularly while the pad is in use: the record is a pipe,
+        and packets still buffered when a process is terminated are lost.
+        """
+        packets = []
+        while True:
+            try:
+                packets.append(ReceivedPacket(*self._received.get_nowait()))
+            except queue.Empty:
+                return packets
+
+    def handle_write(self, endpoint: int, packet: bytes) -> None:
+        if self.record:
+            # Endpoint processes are terminated, never joined, so an
+            # undrained record must not block their exit.
+            self._received.cancel_join_thread()
+            self._received.put((time.perf_counter(), endpoint, packet))
+        if packet == self.ENTER_CONFIG:
+            self._config.value = 1
+        elif packet == self.EXIT_CONFIG:
+            self._config.value = 0
+        elif not self._config.value:
+            return
+        elif packet[0] == self.PROFILE_PUSH:
+            with self._profile.get_lock():
+                self._profile[:] = packet[1:1 + self.PROFILE_BYTES]
+        elif packet[0] == self.PROFILE_READ:
+            with self._drop_replies.get_lock():
+                if self._drop_replies.value > 0:
+                    # Simulate a lost request for retry testing.
+                    self._drop_replies.value -= 1
+                    return
+            self._replies.put(bytes([self.PROFILE_READ]) + self.profile)
+
+    def next_reply(self, timeout: float | None) -> bytes | None:
+        try:
+            return self._replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LoopbackDevice:
+    """Per-process handle to a LoopbackPad, duck-typed as usb.core.Device."""
+
+    DEFAULT_TIMEOUT = 1000
+    CONFIG_POLL = 0.001
+
+    def __init__(self, pad: LoopbackPad, info: HIDInfo, address: int):
+        self.idVendor = info.VID
+        self.idProduct = info.PID
+        self.bus = 0
+        self.address = address
+        self.serial_number = pad.serial
+        self._pad = pad
+        self._info = info
+        self._start = time.perf_counter()
+        self._next_read = self._start
+        self._period = 1.0 / pad.rate_hz
+
+    def read(
+        self, endpoint: int, size_or_buffer: int | array.array,
+        timeout: int | None = None
+    ) -> array.array | int:
+        if endpoint != self._info.READ_EP:
+            raise usb.core.USBError(f"Invalid IN endpoint {endpoint:#04x}.")
+        timeout = self.DEFAULT_TIMEOUT if timeout is None else timeout
+        deadline = time.perf_counter() + timeout / 1000
+        packet = self._pad.next_reply(0)
+        while packet is None:
+            if not self._pad.config_mode:
+                packet = self._sensor_packet()
+            elif time.perf_counter() >= deadline:
+                raise usb.core.USBTimeoutError("Operation timed out")
+            else:
+                # Poll so sensor reports resume as soon as config mode exits.
+                packet = self._pad.next_reply(self.CONFIG_POLL)
+        packet = packet.ljust(self._info.BYTES, b'\x00')
+        if isinstance(size_or_buffer, array.array):
+            size = min(len(size_or_buffer), self._info.BYTES)
+            size_or_buffer[:size] = array.array('B', packet[:size])
+            return size
+        return array.array('B', packet[:size_or_buffer])
+
+    def write(
+        self, endpoint: int, data: ..., timeout: int | None = None
+    ) -> int:
+        if endpoint != self._info.WRITE_EP:
+            raise usb.core.USBError(f"Invalid OUT endpoint {endpoint:#04x}.")
+        packet = bytes(data)
+        self._pad.handle_write(endpoint, packet)
+        return len(packet)
+
+    def _sensor_packet(self) -> bytes:
+        now = time.perf_counter()
+        if now < self._next_read:
+            time.sleep(self._next_read - now)
+        elif now - self._next_read > self._period:
+            self._next_read = now
+        self._next_read += self._period
+        values = self._pad.script.values(time.perf_counter() - self._start)
+        return struct.pack('<16H', *values)
+
+
+class LoopbackFinder:
+    """Drop-in for libusb_package.find that only sees loopback pads."""
+
+    def __init__(self, pads: list[LoopbackPad], info: HIDInfo | None = None):
+        self._pads = pads
+        self._info = info or ReflexV2Info()
+
+    def __call__(
+        self, find_all: bool = False, idVendor: int | None = None,
+        idProduct: int | None = None, **kwargs
+    ) -> list[LoopbackDevice] | LoopbackDevice | None:
+        devices = [
+            LoopbackDevice(pad, self._info, address)
+            for address, pad in enumerate(self._pads, start=1)
+            if idVendor in (None, self._info.VID)
+            and idProduct in (None, self._info.PID)
+        ]
+        if find_all:
+            return devices
+        return devices[0] if devices else None
+
+    @property
+    def pads(self) -> list[LoopbackPad]:
+        return self._pads
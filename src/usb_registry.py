@@ -0,0 +1,177 @@
+import collections
+import ctypes
+import os
+import threading
+import time
+
+import libusb_package
+import usb.core
+
+from usb_libusb import Libusb, LibusbError, Timeval, HotplugCallback
+
+Location = tuple[int, int]
+
+
+class HotplugMonitor:
+    """Reports libusb arrival/departure events for one VID/PID pair.
+
+    Events are queued by a daemon thread pumping a private libusb context
+    and collected with pop_events() by the registry that owns the monitor.
+    """
+
+    EVENT_TIMEOUT = 0.1
+
+    def __init__(self, vid: int, pid: int):
+        self._lib = Libusb.load()
+        self._events = collections.deque()
+        self._ctx = ctypes.c_void_p()
+        Libusb.check("libusb_init", self._lib.libusb_init(self._ctx))
+        self._callback = HotplugCallback(self._hotplug)
+        handle = ctypes.c_int()
+        Libusb.check(
+            "libusb_hotplug_register_callback",
+            self._lib.libusb_hotplug_register_callback(
+                self._ctx, Libusb.HOTPLUG_ARRIVED | Libusb.HOTPLUG_LEFT, 0,
+                vid, pid, -1, self._callback, None, handle
+            )
+        )
+        threading.Thread(target=self._pump_events, daemon=True).start()
+
+    @classmethod
+    def start(cls, vid: int, pid: int) -> "HotplugMonitor | None":
+        """A running monitor, or None where libusb has no hotplug support."""
+        if not Libusb.available():
+            return None
+        if not Libusb.load().libusb_has_capability(Libusb.CAP_HAS_HOTPLUG):
+            return None
+        try:
+            return cls(vid, pid)
+        except LibusbError:
+            return None
+
+    def _hotplug(
+        self, ctx: ctypes.c_void_p, device: ctypes.c_void_p, event: int,
+        user_data: ctypes.c_void_p
+    ) -> int:
+        location = (
+            self._lib.libusb_get_bus_number(device),
+            self._lib.libusb_get_device_address(device)
+        )
+        self._events.append((event == Libusb.HOTPLUG_ARRIVED, location))
+        return 0
+
+    def _pump_events(self) -> None:
+        tv = Timeval(0, int(self.EVENT_TIMEOUT * 1e6))
+        while True:
+            self._lib.libusb_handle_events_timeout_completed(
+                self._ctx, tv, None
+            )
+
+    def pop_events(self) -> list[tuple[bool, Location]]:
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+
+class DeviceRegistry:
+    """Connected devices of one VID/PID, looked up by serial number.
+
+    Reading a serial number costs a string descriptor control transfer,
+    so serials are cached per bus/address and only read for devices not
+    seen before. A read that fails, as it often does right after a cable
+    bump, is not cached and is tried again on a later rescan. With libusb
+    hotplug support the device list is only rescanned after an arrival
+    or to retry such a read; otherwise rescans are throttled to one
+    every RESCAN_INTERVAL seconds unless forced. A registry without
+    hotplug, as endpoint processes use to look up their one device,
+    always takes the throttled path.
+    """
+
+    RESCAN_INTERVAL = 1.0
+
+    def __init__(
+        self, vid: int, pid: int, finder: ..., hotplug: bool = True
+    ):
+        self._vid = vid
+        self._pid = pid
+        self._finder = finder
+        self._pid_owner = os.getpid()
+        self._serials: dict[Location, str] = {}
+        self._unread = False
+        self._devices: dict[str, usb.core.Device] = {}
+        self._locations: dict[str, Location] = {}
+        self._dirty = True
+        self._last_scan = float('-inf')
+        self._hotplug = None
+        if hotplug and finder is libusb_package.find:
+            self._hotplug = HotplugMonitor.start(vid, pid)
+
+    def seed(self, location: Location, serial: str) -> None:
+        """Trust a serial read elsewhere, e.g. by the parent process."""
+        self._serials[location] = serial
+
+    def refresh(self, force: bool = False) -> None:
+        if self._hotplug is not None:
+            for arrived, location in self._hotplug.pop_events():
+                if not arrived:
+                    self._serials.pop(location, None)
+                self._dirty = True
+        if self._hotplug is None or self._unread:
+            if time.perf_counter() - self._last_scan >= self.RESCAN_INTERVAL:
+                self._dirty = True
+        if self._dirty or force:
+            self._rescan()
+
+    def _rescan(self) -> None:
+        serials = {}
+        devices = {}
+        locations = {}
+        unread = False
+        found = self._finder(
+            find_all=True, idVendor=self._vid, idProduct=self._pid
+        )
+        for device in found or []:
+            location = (device.bus, device.address)
+            if location in self._serials:
+                serial = self._serials[location]
+            else:
+                serial = self._read_serial(device)
+            if serial is None:
+                unread = True
+                continue
+            serials[location] = serial
+            devices[serial] = device
+            locations[serial] = location
+        self._serials = serials
+        self._unread = unread
+        self._devices = devices
+        self._locations = locations
+        self._dirty = False
+        self._last_scan = time.perf_counter()
+
+    @staticmethod
+    def _read_serial(device: usb.core.Device) -> str | None:
+        try:
+            return device.serial_number
+        except (usb.core.USBError, ValueError):
+            return None
+
+    def serials(self, force: bool = False) -> list[str]:
+        self.refresh(force)
+        return list(self._devices)
+
+    def get(self, serial: str) -> usb.core.Device | None:
+        self.refresh()
+        if serial not in self._devices:
+            # The pad may have re-enumerated at a new address.
+            self.refresh(force=True)
+        return self._devices.get(serial)
+
+    def location(self, serial: str) -> Location | None:
+        return self._locations.get(serial)
+
+    @property
+    def stale(self) -> bool:
+        """True in a forked child, where the hotplug thread did not survive."""
+        return self._pid_owner != os.getpid()
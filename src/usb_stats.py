@@ -0,0 +1,111 @@
+import math
+import multiprocessing
+
+import numpy as np
+
+
+class LatencyHistogram:
+    """Fixed-size log-scale histogram of durations in shared memory.
+
+    Bins are BINS_PER_OCTAVE to each doubling from MIN_SECONDS, so every
+    percentile is within about 4.5% of the true value. Recording takes no
+    lock and is meant for a single writer; other processes read copies.
+    """
+
+    MIN_SECONDS = 1e-6
+    OCTAVES = 24
+    BINS_PER_OCTAVE = 16
+    BINS = OCTAVES * BINS_PER_OCTAVE
+    SUM = 0
+    MAX = 1
+
+    _SCALE = BINS_PER_OCTAVE / math.log(2)
+
+    def __init__(self):
+        self._counts = multiprocessing.RawArray('Q', self.BINS)
+        self._totals = multiprocessing.RawArray('d', 2)
+
+    def _index(self, seconds: float) -> int:
+        if seconds <= self.MIN_SECONDS:
+            return 0
+        index = int(math.log(seconds / self.MIN_SECONDS) * self._SCALE)
+        return min(index, self.BINS - 1)
+
+    def record(self, seconds: float) -> None:
+        self._counts[self._index(seconds)] += 1
+        self._totals[self.SUM] += seconds
+        if seconds > self._totals[self.MAX]:
+            self._totals[self.MAX] = seconds
+
+    def record_many(self, seconds: np.ndarray) -> None:
+        if not len(seconds):
+            return
+        clipped = np.maximum(seconds, self.MIN_SECONDS)
+        scaled = np.log(clipped / self.MIN_SECONDS)
+        indices = np.minimum(
+            (scaled * self._SCALE).astype(np.intp), self.BINS - 1
+        )
+        counts = np.frombuffer(self._counts, np.uint64)
+        counts += np.bincount(indices, minlength=self.BINS).astype(np.uint64)
+        self._totals[self.SUM] += float(seconds.sum())
+        self._totals[self.MAX] = max(self._totals[self.MAX], seconds.max())
+
+    def reset(self) -> None:
+        np.frombuffer(self._counts, np.uint64)[:] = 0
+        self._totals[self.SUM] = self._totals[self.MAX] = 0.0
+
+    def percentile(self, q: float) -> float:
+        """Upper edge of the bin holding the q-th percentile, in seconds."""
+        cumulative = np.cumsum(np.frombuffer(self._counts, np.uint64))
+        if not (count := int(cumulative[-1])):
+            return 0.0
+        index = int(np.searchsorted(cumulative, math.ceil(q / 100 * count)))
+        edge = self.MIN_SECONDS * 2 ** ((index + 1) / self.BINS_PER_OCTAVE)
+        return min(edge, self._totals[self.MAX])
+
+    @property
+    def count(self) -> int:
+        return int(np.frombuffer(self._counts, np.uint64).sum())
+
+    @property
+    def mean(self) -> float:
+        count = self.count
+        return self._totals[self.SUM] / count if count else 0.0
+
+    @property
+    def maximum(self) -> float:
+        return self._totals[self.MAX]
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": float(self.count),
+            "mean_ms": self.mean * 1e3,
+            "p50_ms": self.percentile(50) * 1e3,
+            "p99_ms": self.percentile(99) * 1e3,
+            "max_ms": self.maximum * 1e3,
+        }
+
+
+class TransferTimer:
+    """Interval between, and duration of, the transfers on one endpoint."""
+
+    def __init__(self):
+        self.interval = LatencyHistogram()
+        self.duration = LatencyHistogram()
+        self._last = None
+
+    def record(self, start: float, end: float) -> None:
+        self.duration.record(end - start)
+        if self._last is not None:
+            self.interval.record(end - self._last)
+        self._last = end
+
+    def reset(self) -> None:
+        self.interval.reset()
+        self.duration.reset()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {
+            "interval": self.interval.summary(),
+            "duration": self.duration.summary(),
+        }
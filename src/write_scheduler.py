@@ -0,0 +1,127 @@
+import array
+import multiprocessing
+import time
+
+from packet_ring import PacketBuffer
+
+
+class WriteScheduler:
+    """Queues packets for an HID OUT endpoint and paces their transmission.
+
+    Producers in the data process queue LED packets, which are latest-wins
+    and paced to a packet rate, and control packets, which are sent in
+    order ahead of any LED packet. The write process blocks in next_packet
+    until there is something to send. A control packet that could not be
+    written still takes its place in the control_sent count, and its
+    number is reported through failed_controls, so tickets stay in step.
+    """
+
+    SENT = 0
+    CONTROL_SENT = 1
+    COALESCED = 2
+    IDLE = 3
+    FAILED = 4
+
+    def __init__(self, packet_bytes: int, packet_rate: float):
+        self._led = PacketBuffer(packet_bytes)
+        self._led_pending = multiprocessing.RawValue('b', 0)
+        self._control = multiprocessing.SimpleQueue()
+        self._failed = multiprocessing.SimpleQueue()
+        self._wake = multiprocessing.Event()
+        self._ready = multiprocessing.Event()
+        self._ready.set()
+        self._counters = multiprocessing.RawArray('d', 5)
+        self._period = 1.0 / packet_rate
+        self._next_led = 0.0
+
+    def queue_led(self, packet: ...) -> None:
+        with self._led.get_lock():
+            if self._led_pending.value:
+                self._counters[self.COALESCED] += 1
+            self._ready.clear()
+            self._led.view[:] = packet
+            self._led_pending.value = 1
+        self._wake.set()
+
+    def queue_control(self, packet: ...) -> None:
+        self._control.put(bytes(packet))
+        self._wake.set()
+
+    def discard_led(self) -> None:
+        with self._led.get_lock():
+            self._led_pending.value = 0
+            self._ready.set()
+
+    def next_packet(self, out: array.array) -> bool:
+        """Block until a packet is due, copy it to out, True if control."""
+        while True:
+            self._wake.clear()
+            if (control := self.poll_packet(out)) is not None:
+                return control
+            start = time.perf_counter()
+            self._wake.wait(self.wait_timeout())
+            self.count_idle(time.perf_counter() - start)
+
+    def poll_packet(self, out: array.array) -> bool | None:
+        """Copy the packet due now to out, True if control, None if idle."""
+        if not self._control.empty():
+            memoryview(out)[:] = self._control.get()
+            return True
+        if self._led_pending.value:
+            now = time.perf_counter()
+            if now >= self._next_led:
+                self._take_led(out)
+                self._next_led = max(self._next_led + self._period, now)
+                return False
+        return None
+
+    def wait_timeout(self) -> float | None:
+        """Seconds until the pending LED packet is due, None if none is."""
+        if not self._led_pending.value:
+            return None
+        return max(0.0, self._next_led - time.perf_counter())
+
+    def _take_led(self, out: array.array) -> None:
+        with self._led.get_lock():
+            memoryview(out)[:] = self._led.view
+            self._led_pending.value = 0
+            self._ready.set()
+
+    def count_sent(self, control: bool) -> None:
+        self._counters[self.CONTROL_SENT if control else self.SENT] += 1
+
+    def count_failed(self, control: bool) -> None:
+        """Count a packet the endpoint could not write."""
+        self._counters[self.FAILED] += 1
+        if control:
+            # Queued before it is counted, so it is seen with the count.
+            self._failed.put(self.control_sent + 1)
+            self._counters[self.CONTROL_SENT] += 1
+
+    def failed_controls(self) -> list[int]:
+        """Numbers, in control_sent order, of control writes that failed."""
+        failed = []
+        while not self._failed.empty():
+            failed.append(self._failed.get())
+        return failed
+
+    def count_idle(self, seconds: float) -> None:
+        self._counters[self.IDLE] += seconds
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def control_sent(self) -> int:
+        return int(self._counters[self.CONTROL_SENT])
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "sent": self._counters[self.SENT],
+            "control_sent": self._counters[self.CONTROL_SENT],
+            "coalesced": self._counters[self.COALESCED],
+            "idle_s": self._counters[self.IDLE],
+            "failed": self._counters[self.FAILED],
+        }
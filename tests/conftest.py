@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# The host modules are flat modules in src, imported by name.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,118 @@
+import time
+
+from control_queue import ControlQueue
+
+READ = b"\xf1"
+TIMEOUT = 0.02
+
+
+class Scheduler:
+    """Keeps control packets instead of writing them."""
+
+    def __init__(self):
+        self.control_sent = 0
+        self.packets = []
+        self.failed = []
+
+    def queue_control(self, packet: bytes) -> None:
+        self.packets.append(packet)
+
+    def write(self, ok: bool = True) -> None:
+        self.control_sent += 1
+        if not ok:
+            self.failed.append(self.control_sent)
+
+    def failed_controls(self) -> list[int]:
+        failed, self.failed = self.failed, []
+        return failed
+
+
+def send_read(queue: ControlQueue, retries: int = ControlQueue.RETRIES):
+    future = queue.submit(READ, READ[0], TIMEOUT, retries)
+    queue.service()
+    return future
+
+
+def test_reply_completes_read():
+    queue = ControlQueue(Scheduler())
+    future = send_read(queue)
+    assert queue.handle_reply(READ + b"a", time.perf_counter())
+    assert future.result(0) == READ + b"a"
+    assert queue.idle
+
+
+def test_reply_before_send_is_stale():
+    queue = ControlQueue(Scheduler())
+    early = time.perf_counter()
+    future = send_read(queue)
+    assert not queue.handle_reply(READ + b"old", early)
+    assert not future.done()
+    assert queue.stats["stale_replies"] == 1
+
+
+def test_late_reply_after_retry_skips_next_read():
+    scheduler = Scheduler()
+    queue = ControlQueue(scheduler)
+    first = send_read(queue)
+    time.sleep(TIMEOUT)
+    queue.service()
+    assert len(scheduler.packets) == 2
+    assert queue.handle_reply(READ + b"a", time.perf_counter())
+    assert first.result(0) == READ + b"a"
+    second = send_read(queue)
+    # The reply to the resend of the first read.
+    assert not queue.handle_reply(READ + b"a", time.perf_counter())
+    assert not second.done()
+    time.sleep(TIMEOUT)
+    assert queue.handle_reply(READ + b"b", time.perf_counter())
+    assert second.result(0) == READ + b"b"
+
+
+def test_read_timed_out_reply_is_stale():
+    queue = ControlQueue(Scheduler())
+    first = send_read(queue, retries=0)
+    time.sleep(TIMEOUT)
+    second = send_read(queue)
+    assert isinstance(first.exception(0), TimeoutError)
+    assert not queue.handle_reply(READ + b"a", time.perf_counter())
+    assert not second.done()
+
+
+def test_failed_write_fails_command():
+    scheduler = Scheduler()
+    queue = ControlQueue(scheduler)
+    ok = queue.submit(b"\x01")
+    lost = queue.submit(b"\x02")
+    queue.service()
+    scheduler.write()
+    scheduler.write(ok=False)
+    queue.service()
+    assert ok.result(0) is None
+    assert isinstance(lost.exception(0), OSError)
+    assert queue.stats["write_failures"] == 1
+
+
+def test_failed_write_of_read_is_resent():
+    scheduler = Scheduler()
+    queue = ControlQueue(scheduler)
+    future = send_read(queue, retries=1)
+    scheduler.write(ok=False)
+    queue.service()
+    assert len(scheduler.packets) == 2
+    scheduler.write()
+    assert queue.handle_reply(READ + b"a", time.perf_counter())
+    assert future.result(0) == READ + b"a"
+    # No reply is owed for the failed write, so none is held back.
+    second = send_read(queue)
+    assert queue.handle_reply(READ + b"b", time.perf_counter())
+    assert second.result(0) == READ + b"b"
+
+
+def test_read_fails_when_every_write_fails():
+    scheduler = Scheduler()
+    queue = ControlQueue(scheduler)
+    future = send_read(queue, retries=0)
+    scheduler.write(ok=False)
+    queue.service()
+    assert isinstance(future.exception(0), OSError)
+    assert queue.idle
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from key_output import KeyBackend, KeyEmitter, NullBackend, RecordingBackend
+from pad_model import PadModel, SensorStore
+
+BASE = 200
+
+
+class FailingBackend(NullBackend):
+    def press(self, key: str) -> None:
+        raise OSError("No such key")
+
+
+def sent(backend: RecordingBackend) -> list[tuple[str, bool]]:
+    return [(key, pressed) for _, key, pressed in backend.events]
+
+
+def test_backend_must_implement_press_and_release():
+    with pytest.raises(TypeError):
+        KeyBackend()
+
+
+def test_fast_backends_are_inline():
+    assert not KeyEmitter(KeyEmitter.NULL).threaded
+    assert KeyEmitter(KeyEmitter.NULL, threaded=True).threaded
+
+
+def test_overlapping_presses_are_coalesced():
+    emitter = KeyEmitter(KeyEmitter.RECORDING)
+    for pressed in (True, True, False, False):
+        emitter.push("a", pressed)
+    emitter.push("b", False)
+    assert sent(emitter.backend) == [("a", True), ("a", False)]
+    assert emitter.stats["emitted"] == 2
+    assert emitter.stats["coalesced"] == 3
+
+
+def test_pads_sharing_a_key_are_coalesced():
+    emitter = KeyEmitter(KeyEmitter.RECORDING)
+    pads = [PadModel(emitter), PadModel(emitter)]
+    idle = np.full((4, 4), BASE)
+    pressed = idle.copy()
+    pressed[0] += SensorStore.DEFAULT_THRESHOLD
+    for pad in pads:
+        pad.get_model_data().sensor_store.set_baseline(idle)
+    key = pads[0].get_model_data().panels[PadModel.PANELS.coords[0]].key
+    pads[0].set_sensor_data(pressed)
+    pads[1].set_sensor_data(pressed)
+    pads[0].set_sensor_data(idle)
+    assert sent(emitter.backend) == [(key, True)]
+    pads[1].set_sensor_data(idle)
+    assert sent(emitter.backend) == [(key, True), (key, False)]
+
+
+def test_threaded_emitter_releases_held_keys_on_close():
+    emitter = KeyEmitter(KeyEmitter.RECORDING, threaded=True)
+    emitter.push("a", True)
+    emitter.push("b", True)
+    emitter.push("b", False)
+    emitter.flush()
+    emitter.close()
+    assert sent(emitter.backend) == [
+        ("a", True), ("b", True), ("b", False), ("a", False)
+    ]
+    assert emitter.stats["queued"] == 0
+
+
+def test_latency_recorded_against_stamp():
+    emitter = KeyEmitter(KeyEmitter.NULL)
+    latency = PadModel(emitter).press_latency[0]
+    emitter.push("a", True, stamp=0.0, latency=latency)
+    assert latency.count == 1
+    assert emitter.latency.count == 1
+
+
+def test_backend_errors_are_counted():
+    emitter = KeyEmitter(FailingBackend())
+    emitter.push("a", True)
+    assert emitter.stats["errors"] == 1
+    assert emitter.stats["emitted"] == 0
+
+
+def test_switching_backend_releases_held_keys():
+    emitter = KeyEmitter(KeyEmitter.RECORDING)
+    old = emitter.backend
+    emitter.push("a", True)
+    emitter.backend = RecordingBackend()
+    assert sent(old) == [("a", True), ("a", False)]
+    emitter.push("a", False)
+    assert sent(emitter.backend) == []
@@ -0,0 +1,29 @@
+import random
+
+import numpy as np
+
+from led_data_generator import LEDDataGenerator
+
+TRIALS = 2000
+
+
+def test_hsv_to_rgb_array_matches_scalar():
+    rng = random.Random(0)
+    hsv = np.array([
+        [rng.randrange(256), rng.choice((0, 255, rng.randrange(256))),
+         rng.randrange(256)]
+        for _ in range(TRIALS)
+    ])
+    rgb = LEDDataGenerator.hsv_to_rgb_array(hsv[:, 0], hsv[:, 1], hsv[:, 2])
+    expected = [LEDDataGenerator.hsv_to_rgb(*c) for c in hsv.tolist()]
+    assert rgb.tolist() == [list(colour) for colour in expected]
+
+
+def test_hsv_to_rgb_array_broadcasts():
+    hue = np.arange(255)[:, np.newaxis]
+    val = np.array([0, 90, 255])
+    rgb = LEDDataGenerator.hsv_to_rgb_array(hue, 255, val)
+    assert rgb.shape == (255, 3, 3)
+    for h, v in ((0, 0), (42, 1), (170, 2), (254, 2)):
+        expected = LEDDataGenerator.hsv_to_rgb(h, 255, int(val[v]))
+        assert tuple(rgb[h, v]) == expected
@@ -0,0 +1,97 @@
+import numpy as np
+
+import led_data_handler
+from key_output import KeyEmitter
+from led_data_handler import LEDDataHandler
+from pad_model import PadModel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self) -> float:
+        return self.now
+
+
+class Scheduler:
+    ready = True
+
+    def __init__(self):
+        self.packets: list[bytes] = []
+
+    def queue_led(self, packet: np.ndarray) -> None:
+        self.packets.append(bytes(packet))
+
+
+def make_handler(monkeypatch, keep_alive: float = 10.0):
+    clock = Clock()
+    monkeypatch.setattr(led_data_handler, "time", clock)
+    scheduler = Scheduler()
+    model = PadModel(KeyEmitter(KeyEmitter.NULL))
+    # One frame a second, so a burst of calls sends a single frame.
+    handler = LEDDataHandler(scheduler, model, 1.0, keep_alive)
+    handler.generator = None
+    return handler, model, scheduler, clock
+
+
+def send_frame(handler, scheduler, clock) -> list[int]:
+    """Packet numbers (panel * segments + segment) of the next frame."""
+    clock.now += 1.0
+    scheduler.packets.clear()
+    for _ in range(LEDDataHandler.PACKETS_PER_FRAME + 1):
+        handler.give_sample()
+    headers = LEDDataHandler.HEADERS
+    return [
+        int(np.flatnonzero((headers == packet[0]).any(0))[0])
+        for packet in scheduler.packets
+    ]
+
+
+def test_static_frame_is_sent_once(monkeypatch):
+    handler, _, scheduler, clock = make_handler(monkeypatch)
+    every = list(range(LEDDataHandler.PACKETS_PER_FRAME))
+    assert send_frame(handler, scheduler, clock) == every
+    assert send_frame(handler, scheduler, clock) == []
+    assert send_frame(handler, scheduler, clock) == []
+    stats = handler.stats
+    assert stats["packets_sent"] == LEDDataHandler.PACKETS_PER_FRAME
+    assert stats["packets_skipped"] == 2 * LEDDataHandler.PACKETS_PER_FRAME
+
+
+def test_changed_panel_sends_only_its_segments(monkeypatch):
+    handler, model, scheduler, clock = make_handler(monkeypatch)
+    send_frame(handler, scheduler, clock)
+    model.get_led_frame()[2] = 255
+    # The back bank was encoded before the change, so it shows a frame
+    # later.
+    assert send_frame(handler, scheduler, clock) == []
+    segments = LEDDataHandler.NUM_SEGMENTS
+    assert send_frame(handler, scheduler, clock) == list(
+        range(2 * segments, 3 * segments)
+    )
+    assert send_frame(handler, scheduler, clock) == []
+
+
+def test_unchanged_segments_are_kept_alive(monkeypatch):
+    handler, _, scheduler, clock = make_handler(monkeypatch, 2.5)
+    every = list(range(LEDDataHandler.PACKETS_PER_FRAME))
+    assert send_frame(handler, scheduler, clock) == every
+    assert send_frame(handler, scheduler, clock) == []
+    assert send_frame(handler, scheduler, clock) == []
+    assert send_frame(handler, scheduler, clock) == every
+
+
+def test_invalidate_resends_everything(monkeypatch):
+    handler, _, scheduler, clock = make_handler(monkeypatch)
+    send_frame(handler, scheduler, clock)
+    handler.invalidate()
+    every = list(range(LEDDataHandler.PACKETS_PER_FRAME))
+    assert send_frame(handler, scheduler, clock) == every
+
+
+def test_busy_scheduler_is_not_fed(monkeypatch):
+    handler, _, scheduler, clock = make_handler(monkeypatch)
+    scheduler.ready = False
+    assert send_frame(handler, scheduler, clock) == []
+    assert handler.stats["packets_skipped"] == 0
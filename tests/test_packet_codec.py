@@ -0,0 +1,126 @@
+import hashlib
+import random
+
+import numpy as np
+import pytest
+
+from packet_codec import PacketCodec
+from pad_model import PadModel
+
+TRIALS = 500
+
+
+def random_profile(rng: random.Random) -> dict:
+    return {
+        panel: (
+            {
+                sensor: (rng.randrange(256), rng.randrange(256))
+                for sensor in PadModel.SENSORS.coords
+            },
+            chr(rng.randrange(1, 128))
+        )
+        for panel in PadModel.PANELS.coords
+    }
+
+
+def expected_profile_packet(profile: dict, header: int) -> bytes:
+    """The profile layout of INTERFACE.md, byte by byte."""
+    packet = bytearray(PacketCodec.PACKET_BYTES)
+    packet[0] = header
+    pos = 1
+    for panel in PadModel.PANELS.coords:
+        for sensor in PadModel.SENSORS.coords:
+            threshold, hysteresis = profile[panel][0][sensor]
+            packet[pos] = threshold & 0xFF
+            packet[pos + 1] = hysteresis & 0xFF
+            pos += 2
+    for panel in PadModel.PANELS.coords:
+        packet[pos] = ord(profile[panel][1])
+        pos += 1
+    return bytes(packet)
+
+
+@pytest.fixture
+def profiles() -> list[dict]:
+    rng = random.Random(0)
+    return [random_profile(rng) for _ in range(TRIALS)]
+
+
+def test_config_magic():
+    assert PacketCodec.ENTER_CONFIG == hashlib.sha512(
+        b"REFLEXENTERCONFIG"
+    ).digest()
+    assert PacketCodec.EXIT_CONFIG == hashlib.sha512(
+        b"REFLEXEXITCONFIG"
+    ).digest()
+
+
+def test_profile_round_trip(profiles):
+    for profile in profiles:
+        packet = PacketCodec.encode_profile(profile)
+        assert packet == expected_profile_packet(
+            profile, PacketCodec.PROFILE_PUSH
+        )
+        assert PacketCodec.decode_profile(packet) == profile
+
+
+def test_profile_batch_round_trip(profiles):
+    batch = PacketCodec.encode_profiles(profiles, PacketCodec.PROFILE_READ)
+    assert batch.shape == (len(profiles), PacketCodec.PACKET_BYTES)
+    for profile, packet in zip(profiles, batch):
+        assert packet.tobytes() == expected_profile_packet(
+            profile, PacketCodec.PROFILE_READ
+        )
+    assert PacketCodec.decode_profiles(batch) == profiles
+
+
+def test_profile_out_of_range_sends_low_byte(profiles):
+    profile = profiles[0]
+    panel = PadModel.PANELS.coords[0]
+    sensor = PadModel.SENSORS.coords[0]
+    profile[panel][0][sensor] = (0x1FF, -1)
+    packet = PacketCodec.encode_profile(profile)
+    assert packet[1:3] == bytes([0xFF, 0xFF])
+    batch = PacketCodec.encode_profiles([profile])
+    assert batch[0].tobytes() == packet
+
+
+def test_profile_defaults():
+    packet = PacketCodec.encode_profile({})
+    threshold, hysteresis = PacketCodec.DEFAULT_SENSOR
+    assert packet[1:33] == bytes([threshold, hysteresis] * 16)
+    assert packet[33:37] == PacketCodec.DEFAULT_KEY.encode() * 4
+
+
+def test_sensor_round_trip():
+    values = np.random.default_rng(0).integers(
+        0, 1 << 16, (TRIALS, 4, 4), np.uint16
+    )
+    packets = PacketCodec.encode_sensors(values)
+    assert (PacketCodec.decode_sensors(packets) == values).all()
+    for row, packet in zip(values, packets):
+        single = PacketCodec.encode_sensor(row.ravel().tolist())
+        assert single == packet.tobytes()
+        assert (PacketCodec.decode_sensor(single) == row).all()
+
+
+def test_sensor_layout():
+    values = np.arange(16, dtype=np.uint16).reshape(4, 4) * 257
+    packet = PacketCodec.encode_sensor(values.ravel().tolist())
+    for index, coords in enumerate(PadModel.SENSOR_COORDS):
+        value = packet[index * 2] + (packet[index * 2 + 1] << 8)
+        assert values.flat[PadModel.SENSOR_INDEX[coords]] == value
+
+
+def test_led_round_trip():
+    frames = [
+        (p, s, f) for p in range(4) for s in range(4) for f in range(16)
+    ]
+    headers = [PacketCodec.led_header(*frame) for frame in frames]
+    assert [PacketCodec.split_led_header(h) for h in headers] == frames
+    grb = np.random.default_rng(0).integers(
+        0, 256, (len(headers), 21, 3), np.uint8
+    )
+    decoded = PacketCodec.decode_leds(PacketCodec.encode_leds(headers, grb))
+    assert decoded[0].tolist() == headers
+    assert (decoded[1] == grb).all()
@@ -0,0 +1,75 @@
+import numpy as np
+
+from packet_recorder import PacketRecorder, PacketRecording, PacketReplay
+from sensor_data_handler import SensorDataHandler
+
+
+def test_record_grows_past_capacity(tmp_path):
+    path = tmp_path / "packets.rfx"
+    recorder = PacketRecorder(path, capacity=4)
+    rng = np.random.default_rng(0)
+    packets = rng.integers(0, 256, (23, 64), np.uint8)
+    for index, packet in enumerate(packets[:7]):
+        recorder.record(PacketRecorder.IN, packet.tobytes(), float(index))
+    recorder.record_many(
+        PacketRecorder.OUT, np.arange(7.0, 23.0), packets[7:]
+    )
+    assert recorder.count == len(packets)
+    recorder.close()
+    size = PacketRecorder.HEADER_BYTES
+    size += len(packets) * PacketRecorder.RECORD.itemsize
+    assert path.stat().st_size == size
+    recording = PacketRecording(path)
+    assert len(recording) == len(packets)
+    assert (recording.records["packet"] == packets).all()
+    assert (recording.records["stamp"] == np.arange(23.0)).all()
+    stamps, inbound = recording.direction(PacketRecorder.IN)
+    assert (inbound == packets[:7]).all()
+    assert (stamps == np.arange(7.0)).all()
+    del recording, stamps, inbound
+
+
+def test_short_packets_are_padded(tmp_path):
+    recorder = PacketRecorder(tmp_path / "short.rfx", capacity=1)
+    recorder.record(PacketRecorder.OUT, b"\x01\x02\x03", 1.0)
+    recorder.record(PacketRecorder.OUT, b"\x04", 2.0)
+    recorder.close()
+    records = PacketRecording(tmp_path / "short.rfx").records
+    assert records["length"].tolist() == [3, 1]
+    assert records["packet"][0, :4].tolist() == [1, 2, 3, 0]
+    assert records["packet"][1, :2].tolist() == [4, 0]
+
+
+class Ring:
+    """Hands out one batch of packets, as a PacketRing drain would."""
+
+    def __init__(self, stamps: np.ndarray, packets: np.ndarray):
+        self.batch = (np.arange(len(stamps)), stamps, packets)
+
+    def drain(self, limit=None):
+        batch = self.batch
+        self.batch = (np.zeros(0), np.zeros(0), np.zeros((0, 64), np.uint8))
+        return batch
+
+
+def test_config_replies_are_not_replayed(tmp_path):
+    path = tmp_path / "config.rfx"
+    packets = np.zeros((4, 64), np.uint8)
+    packets[1:3, 0] = SensorDataHandler.PROFILE_REPLY
+    packets[1:3, 1:] = 0xFF
+    sensors = SensorDataHandler(Ring(np.arange(4.0), packets))
+    sensors.config_mode = True
+    sensors.recorder = PacketRecorder(path, capacity=8)
+    assert sensors.take_sample()
+    assert sensors.pop_reply() == (packets[1].tobytes(), 1.0)
+    sensors.recorder.close()
+    directions = PacketRecording(path).records["direction"]
+    assert directions.tolist() == [
+        PacketRecorder.IN, PacketRecorder.REPLY,
+        PacketRecorder.REPLY, PacketRecorder.IN,
+    ]
+    replay = PacketReplay(path, realtime=False)
+    _, _, replayed = replay.drain()
+    assert (replayed == packets[[0, 3]]).all()
+    assert replay.finished
+    del directions, replay, replayed
@@ -0,0 +1,74 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from packet_ring import PacketRing
+
+
+@pytest.fixture
+def ring():
+    ring = PacketRing(8, 4)
+    yield ring
+    ring.close()
+
+
+def push(ring: PacketRing, values: range) -> None:
+    for value in values:
+        ring.push(bytes([value] * 4), float(value))
+
+
+def test_capacity_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        PacketRing(6, 4)
+
+
+def test_drain_in_order(ring):
+    push(ring, range(3))
+    assert ring.pending == 3
+    seq, stamps, packets = ring.drain()
+    assert seq.tolist() == [0, 1, 2]
+    assert stamps.tolist() == [0.0, 1.0, 2.0]
+    assert packets[:, 0].tolist() == [0, 1, 2]
+    assert ring.pending == 0
+    assert len(ring.drain()[0]) == 0
+
+
+def test_drain_limit(ring):
+    push(ring, range(5))
+    assert ring.drain(2)[0].tolist() == [0, 1]
+    assert ring.drain()[0].tolist() == [2, 3, 4]
+    assert ring.overruns == 0
+
+
+def test_overrun_skips_overwritten_packets(ring):
+    push(ring, range(12))
+    assert ring.pending == ring.capacity
+    seq, _, packets = ring.drain()
+    # Four packets were overwritten, and the oldest slot left is the one
+    # the producer writes next, so it may be torn and is dropped too.
+    assert seq.tolist() == list(range(5, 12))
+    assert packets[:, 0].tolist() == list(range(5, 12))
+    assert ring.overruns == 5
+    assert ring.written == 12
+
+
+def test_lap_counted_per_drain(ring):
+    push(ring, range(4))
+    ring.drain()
+    push(ring, range(4, 12))
+    seq, _, _ = ring.drain()
+    assert seq.tolist() == list(range(5, 12))
+    assert ring.overruns == 1
+
+
+def test_pickled_ring_shares_memory(ring):
+    consumer = pickle.loads(pickle.dumps(ring))
+    try:
+        push(ring, range(2))
+        seq, _, packets = consumer.drain()
+        assert seq.tolist() == [0, 1]
+        assert (packets == np.array([[0] * 4, [1] * 4])).all()
+        assert ring.pending == 0
+    finally:
+        consumer.close()
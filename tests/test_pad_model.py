@@ -0,0 +1,136 @@
+import math
+
+import numpy as np
+import pytest
+
+from key_output import KeyEmitter
+from pad_model import BaselineSettings, BaselineTracker, PadModel, SensorStore
+
+BASE = 200
+THRESHOLD = SensorStore.DEFAULT_THRESHOLD
+HYSTERESIS = SensorStore.DEFAULT_HYSTERESIS
+
+
+def make_model() -> PadModel:
+    return PadModel(KeyEmitter(KeyEmitter.NULL))
+
+
+def test_set_default_keeps_baseline_settings():
+    model = make_model()
+    settings = BaselineSettings(enabled=False, time_constant=5.0, gate=0.25)
+    model.baseline_settings = settings
+    model.set_default()
+    assert model.baseline_settings == settings
+    assert model.baseline_settings is not settings
+
+
+def make_store() -> SensorStore:
+    store = SensorStore(4, 4)
+    store.set_baseline(np.full((4, 4), BASE))
+    return store
+
+
+def sample(store: SensorStore, panel: int, delta: int) -> list:
+    values = np.full((4, 4), BASE)
+    values[panel, 0] += delta
+    return store.update(values)
+
+
+def test_store_press_and_release_with_hysteresis():
+    store = make_store()
+    assert sample(store, 1, THRESHOLD - 1) == []
+    assert sample(store, 1, THRESHOLD) == [(1, True)]
+    # Held until the reading falls past threshold - hysteresis.
+    assert sample(store, 1, THRESHOLD - HYSTERESIS + 1) == []
+    assert store.pressed.tolist() == [False, True, False, False]
+    assert sample(store, 1, THRESHOLD - HYSTERESIS) == [(1, False)]
+    assert not store.active.any()
+
+
+def test_store_reports_edges_of_several_panels():
+    store = make_store()
+    values = np.full((4, 4), BASE)
+    values[0, 2] += THRESHOLD
+    values[3, 1] += THRESHOLD
+    assert store.update(values) == [(0, True), (3, True)]
+    values[0, 2] = BASE
+    assert store.update(values) == [(0, False)]
+
+
+def test_store_clamps_readings():
+    store = make_store()
+    store.update(np.full((4, 4), 9000))
+    assert (store.current == SensorStore.MAX_BASE).all()
+    store.update(np.full((4, 4), -5))
+    assert (store.current == 0).all()
+
+
+def drift(store: SensorStore, delta: int) -> None:
+    store.current[:] = BASE + delta
+
+
+def test_baseline_follows_idle_drift():
+    store = make_store()
+    tracker = BaselineTracker(store, BaselineSettings(time_constant=1.0))
+    drift(store, 10)
+    tracker.update(0.0)
+    assert (store.base == BASE).all()
+    tracker.update(0.5)
+    expected = BASE - 10 * math.expm1(-0.5)
+    assert (store.base == round(expected)).all()
+
+
+def test_baseline_updates_are_throttled():
+    store = make_store()
+    tracker = BaselineTracker(store, BaselineSettings(time_constant=0.01))
+    drift(store, 10)
+    tracker.update(0.0)
+    tracker.update(BaselineTracker.INTERVAL / 2)
+    assert (store.base == BASE).all()
+    tracker.update(1.0)
+    assert (store.base == BASE + 10).all()
+
+
+def test_baseline_frozen_on_pressed_panel_and_above_gate():
+    store = make_store()
+    settings = BaselineSettings(time_constant=0.01, gate=0.5)
+    tracker = BaselineTracker(store, settings)
+    gate = (THRESHOLD - HYSTERESIS) * settings.gate
+    store.current[:] = BASE + 4
+    store.current[2, 0] = BASE + math.ceil(gate)
+    store.pressed[1] = True
+    tracker.update(0.0)
+    tracker.update(1.0)
+    assert (store.base[1] == BASE).all()
+    assert store.base[2, 0] == BASE
+    assert (store.base[[0, 3]] == BASE + 4).all()
+    assert (store.base[2, 1:] == BASE + 4).all()
+
+
+def test_disabled_baseline_stays_put():
+    store = make_store()
+    tracker = BaselineTracker(store, BaselineSettings(enabled=False))
+    drift(store, 10)
+    tracker.update(0.0)
+    tracker.update(100.0)
+    assert (store.base == BASE).all()
+
+
+@pytest.fixture
+def recording_model():
+    emitter = KeyEmitter(KeyEmitter.RECORDING)
+    model = PadModel(emitter)
+    model.get_model_data().sensor_store.set_baseline(np.full((4, 4), BASE))
+    return model, emitter.backend.events
+
+
+def test_model_releases_held_keys(recording_model):
+    model, events = recording_model
+    values = np.full((4, 4), BASE)
+    values[0] += THRESHOLD
+    values[2] += THRESHOLD
+    assert model.set_sensor_data(values) == [(0, True), (2, True)]
+    assert model.release_keys() == [(0, False), (2, False)]
+    assert [pressed for _, _, pressed in events] == [True] * 2 + [False] * 2
+    assert not model.get_model_data().sensor_store.pressed.any()
+    assert model.release_keys() == []
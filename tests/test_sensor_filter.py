@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pytest
+
+from sensor_filter import (
+    FilterSettings, FilterStage, LowPassStage, MedianStage, SensorFilter,
+    SpikeStage
+)
+
+SHAPE = (2,)
+
+
+def run(stage: FilterStage, samples: list[float]) -> list[float]:
+    return [
+        float(stage.apply(np.full(SHAPE, value, np.float64))[0])
+        for value in samples
+    ]
+
+
+def test_stage_must_implement_apply_and_delay():
+    class Incomplete(FilterStage):
+        def _apply(self, values):
+            return values
+
+    with pytest.raises(TypeError):
+        Incomplete(SHAPE)
+
+
+def test_lowpass_is_seeded_and_steps_by_alpha():
+    stage = LowPassStage(SHAPE, cutoff_hz=10.0, rate_hz=1000.0)
+    alpha = -math.expm1(-2 * math.pi * 10.0 / 1000.0)
+    out = run(stage, [100.0, 100.0, 200.0, 200.0])
+    assert out[:2] == [100.0, 100.0]
+    assert out[2] == pytest.approx(100.0 + 100.0 * alpha)
+    assert out[3] == pytest.approx(200.0 - 100.0 * (1 - alpha) ** 2)
+    assert stage.group_delay == pytest.approx((1 - alpha) / alpha)
+
+
+def test_median_rejects_single_outlier():
+    stage = MedianStage(SHAPE, 3)
+    assert run(stage, [10.0, 10.0, 900.0, 10.0, 20.0, 20.0]) == [
+        10.0, 10.0, 10.0, 10.0, 20.0, 20.0
+    ]
+    assert stage.group_delay == 1.0
+
+
+def test_spike_is_held_and_step_passes_after_hold():
+    stage = SpikeStage(SHAPE, limit=50.0, hold=2)
+    assert run(stage, [100.0, 400.0, 100.0]) == [100.0, 100.0, 100.0]
+    assert run(stage, [400.0, 400.0, 400.0, 400.0]) == [
+        100.0, 100.0, 400.0, 400.0
+    ]
+    assert stage.group_delay == 2.0
+
+
+def test_reset_reseeds_stage():
+    stage = LowPassStage(SHAPE, cutoff_hz=10.0, rate_hz=1000.0)
+    run(stage, [0.0, 0.0])
+    stage.reset()
+    assert run(stage, [500.0]) == [500.0]
+
+
+def test_disabled_filter_is_false():
+    assert not SensorFilter(FilterSettings())
+    assert SensorFilter(FilterSettings(lowpass_hz=50.0))
+
+
+def test_chain_writes_every_output():
+    settings = FilterSettings(spike_limit=50.0, spike_hold=1, median_size=3)
+    sensor_filter = SensorFilter(settings, SHAPE)
+    batch = np.array([[10, 10], [900, 10], [10, 10], [10, 10]], np.uint16)
+    out = np.zeros(batch.shape)
+    last = sensor_filter.apply(batch, out)
+    assert (out == 10).all()
+    assert (last == out[-1]).all()
+    assert list(sensor_filter.delays) == ["SpikeStage", "MedianStage"]
+    assert sensor_filter.group_delay == pytest.approx(2 / 1000.0)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from sensor_history import SensorHistory
+
+
+def frames_from(values: list[int]) -> np.ndarray:
+    return np.array(values, np.uint16)[:, np.newaxis, np.newaxis] * np.ones(
+        (1, 4, 4), np.uint16
+    )
+
+
+@pytest.mark.parametrize("panel", [None, 2, (1, 0)])
+def test_empty_history_statistics_are_nan(panel):
+    history = SensorHistory(0.01)
+    shape = (4, 4) if panel is None else (4,)
+    for result in (
+        history.minimum(2.0, panel),
+        history.maximum(2.0, panel),
+        history.percentile(50, 2.0, panel),
+        history.maximum(panel=panel),
+    ):
+        assert result.shape == shape
+        assert np.isnan(result).all()
+    stamps, frames = history.window(2.0, panel)
+    assert len(stamps) == 0 and frames.shape == (0, *shape)
+
+
+def test_short_window_uses_frames_it_has():
+    history = SensorHistory(0.01)
+    history.extend(np.array([1.0, 1.5, 2.0]), frames_from([10, 30, 20]))
+    assert (history.minimum(5.0) == 10).all()
+    assert (history.maximum(5.0) == 30).all()
+    assert (history.percentile(50, 5.0) == 20).all()
+    # Only the newest frame is inside a zero second window.
+    assert (history.maximum(0.0, 0) == 20).all()
+    assert (history.maximum(0.6) == 30).all()
+
+
+def test_window_across_wrap():
+    history = SensorHistory(0.004, rate_hz=1000.0)
+    history.extend(np.arange(6.0), frames_from(list(range(6))))
+    assert len(history) == history.capacity == 4
+    stamps, frames = history.window()
+    assert stamps.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert frames[:, 0, 0].tolist() == [2, 3, 4, 5]
+    assert len(history.segments()) == 2
+    assert (history.minimum(1.0) == 4).all()
+    history.clear()
+    assert np.isnan(history.minimum()).all()
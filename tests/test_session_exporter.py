@@ -0,0 +1,85 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from session_exporter import ColumnTable, SessionExporter
+
+COLUMNS = {"stamp": ((), np.float64), "values": ((2,), np.uint16)}
+
+
+def rows(start: int, count: int) -> dict[str, np.ndarray]:
+    stamps = np.arange(start, start + count, dtype=np.float64)
+    return {"stamp": stamps, "values": np.repeat(stamps[:, None], 2, 1)}
+
+
+def test_table_fills_chunks_in_order():
+    table = ColumnTable("t", COLUMNS, 4)
+    full = table.append(rows(0, 10), 10)
+    assert [(index, filled) for _, index, _, filled in full] == [
+        (0, 4), (1, 4)
+    ]
+    assert full[1][2]["stamp"].tolist() == [4.0, 5.0, 6.0, 7.0]
+    _, index, buffer, filled = table.flush()[0]
+    assert (index, filled) == (2, 2)
+    assert buffer["values"][:2].tolist() == [[8, 8], [9, 9]]
+    assert table.flush() == []
+
+
+def test_table_broadcasts_single_row_values():
+    table = ColumnTable("t", COLUMNS, 4)
+    table.append({"stamp": 1.5, "values": np.array([3, 4])}, 1)
+    _, _, buffer, filled = table.flush()[0]
+    assert filled == 1
+    assert buffer["stamp"][0] == 1.5
+    assert buffer["values"][0].tolist() == [3, 4]
+
+
+def test_table_drops_rows_while_every_buffer_waits():
+    table = ColumnTable("t", COLUMNS, 2)
+    full = table.append(rows(0, 9), 9)
+    assert len(full) == ColumnTable.BUFFERS
+    assert table.dropped == 3
+    table.release(full[0][2])
+    assert table.append(rows(9, 1), 1) == []
+    assert table.dropped == 3
+
+
+def test_export_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(SessionExporter, "SENSOR_ROWS", 8)
+    exporter = SessionExporter(tmp_path)
+    values = np.arange(20 * 16, dtype=np.uint16).reshape(20, 4, 4)
+    for start in range(0, 20, 5):
+        exporter.append(
+            "sensors", 5, stamp=np.arange(start, start + 5, dtype=float),
+            values=values[start:start + 5]
+        )
+    exporter.append(
+        "states", stamp=1.0, pressed=np.ones(4, bool),
+        base=np.zeros((4, 4), np.int32)
+    )
+    exporter.close()
+    assert exporter.dropped == {"sensors": 0, "states": 0, "leds": 0}
+    chunks = SessionExporter.load(tmp_path, "sensors", "values")
+    assert [len(chunk) for chunk in chunks] == [8, 8, 4]
+    assert (np.concatenate(chunks) == values).all()
+    stamps = np.concatenate(
+        SessionExporter.load(tmp_path, "sensors", "stamp")
+    )
+    assert stamps.tolist() == list(range(20))
+    pressed = SessionExporter.load(tmp_path, "states", "pressed")
+    assert [chunk.tolist() for chunk in pressed] == [[[True] * 4]]
+    assert SessionExporter.load(tmp_path, "leds", "colours") == []
+    del chunks, pressed
+
+
+def test_write_error_is_raised_on_close(tmp_path):
+    exporter = SessionExporter(tmp_path)
+    shutil.rmtree(tmp_path / "states")
+    exporter.append(
+        "states", stamp=1.0, pressed=np.zeros(4, bool),
+        base=np.zeros((4, 4), np.int32)
+    )
+    with pytest.raises(OSError):
+        exporter.close()
+    assert isinstance(exporter.error, OSError)
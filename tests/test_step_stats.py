@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from step_stats import StepStats
+
+# Percentiles come from log-scale histogram bins.
+TOLERANCE = 0.05
+
+
+class Script:
+    """Feeds StepStats press and release edges with chosen readings."""
+
+    def __init__(self, stats: StepStats, num_panels: int = 4):
+        self.stats = stats
+        self.pressed = np.zeros(num_panels, bool)
+        self.delta = np.zeros((num_panels, 4), np.int32)
+
+    def press(self, panel: int, now: float, peak: int = 0) -> None:
+        self.pressed[panel] = True
+        self.delta[panel] = peak
+        self.stats.update([(panel, True)], now, self.pressed, self.delta)
+
+    def release(self, panel: int, now: float) -> None:
+        self.pressed[panel] = False
+        self.stats.update([(panel, False)], now, self.pressed, self.delta)
+        self.delta[panel] = 0
+
+    def idle(self, now: float, delta: int) -> None:
+        self.delta[:] = delta
+        self.stats.update([], now, self.pressed, self.delta)
+        self.delta[:] = 0
+
+
+@pytest.fixture
+def script() -> Script:
+    script = Script(StepStats(double_trigger=0.05))
+    for start, end, peak in [
+        (0.0, 0.1, 1000), (0.5, 0.6, 1000), (1.0, 1.01, 1000),
+        # Re-pressed 20 ms after the last release: a double trigger.
+        (1.03, 1.13, 3000),
+    ]:
+        script.press(0, start, peak)
+        script.release(0, end)
+    return script
+
+
+def test_counts(script):
+    summary = script.stats.summary()
+    assert summary[0]["presses"] == 4
+    assert summary[0]["double_triggers"] == 1
+    assert all(panel["presses"] == 0 for panel in summary[1:])
+    assert all(panel["double_triggers"] == 0 for panel in summary[1:])
+
+
+def test_durations_and_intervals(script):
+    summary = script.stats.summary()[0]
+    assert summary["duration_p50_ms"] == pytest.approx(100, TOLERANCE)
+    assert summary["duration_p99_ms"] == pytest.approx(100, TOLERANCE)
+    assert summary["interval_p50_ms"] == pytest.approx(500, TOLERANCE)
+    assert summary["interval_p01_ms"] == pytest.approx(30, TOLERANCE)
+
+
+def test_peaks(script):
+    summary = script.stats.summary()[0]
+    width = StepStats.PEAK_MAX / StepStats.PEAK_BINS
+    # Upper edges of the bins holding 1000, in 3 of the 4 steps.
+    assert summary["peak_p50"] == (1000 // width + 1) * width
+    assert summary["peak_p01"] == (1000 // width + 1) * width
+
+
+def test_peak_ignores_released_panels(script):
+    script.idle(2.0, 4000)
+    script.press(1, 2.1, 100)
+    script.release(1, 2.2)
+    width = StepStats.PEAK_MAX / StepStats.PEAK_BINS
+    assert script.stats.summary()[1]["peak_p50"] == (100 // width + 1) * width
+
+
+def test_slow_repress_is_not_double(script):
+    script.press(0, 1.13 + 0.06)
+    assert script.stats.summary()[0]["double_triggers"] == 1
+
+
+def test_reset(script):
+    script.stats.reset()
+    for panel in script.stats.summary():
+        assert set(panel.values()) == {0.0}
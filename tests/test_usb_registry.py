@@ -0,0 +1,114 @@
+import libusb_package
+import pytest
+import usb.core
+
+import usb_registry
+from usb_controller import USBDeviceList
+from usb_registry import DeviceRegistry
+
+VID, PID = 0x0B05, 0x1AB0
+
+
+@pytest.fixture
+def monitors(monkeypatch):
+    started = []
+    monkeypatch.setattr(
+        usb_registry.HotplugMonitor, "start",
+        lambda vid, pid: started.append((vid, pid))
+    )
+    return started
+
+
+def test_hotplug_monitor_only_when_asked(monitors):
+    DeviceRegistry(VID, PID, libusb_package.find, hotplug=False)
+    assert monitors == []
+    DeviceRegistry(VID, PID, libusb_package.find)
+    assert monitors == [(VID, PID)]
+
+
+def test_endpoint_lookup_starts_no_monitor(monitors, monkeypatch):
+    monkeypatch.setattr(USBDeviceList, "_registries", {})
+    monkeypatch.setattr(DeviceRegistry, "get", lambda self, serial: None)
+    USBDeviceList.get_device_by_serial(
+        VID, PID, "PAD0", libusb_package.find, (1, 2)
+    )
+    assert monitors == []
+
+
+class Device:
+    """Counts serial number reads, which fail while failing is set."""
+
+    def __init__(self, bus: int, address: int, serial: str):
+        self.bus = bus
+        self.address = address
+        self.serial = serial
+        self.reads = 0
+        self.failing = False
+
+    @property
+    def serial_number(self) -> str:
+        self.reads += 1
+        if self.failing:
+            raise usb.core.USBError("Pipe error")
+        return self.serial
+
+
+class Finder:
+    def __init__(self, *devices: Device):
+        self.devices = list(devices)
+        self.scans = 0
+
+    def __call__(self, find_all: bool, idVendor: int, idProduct: int):
+        self.scans += 1
+        return list(self.devices)
+
+
+def test_serials_are_read_once_per_location():
+    pads = Device(1, 2, "PAD0"), Device(1, 3, "PAD1")
+    finder = Finder(*pads)
+    registry = DeviceRegistry(VID, PID, finder)
+    assert registry.serials() == ["PAD0", "PAD1"]
+    assert registry.serials(force=True) == ["PAD0", "PAD1"]
+    assert [pad.reads for pad in pads] == [1, 1]
+    assert registry.get("PAD1") is pads[1]
+    assert registry.location("PAD1") == (1, 3)
+
+
+def test_rescans_are_throttled():
+    finder = Finder(Device(1, 2, "PAD0"))
+    registry = DeviceRegistry(VID, PID, finder)
+    registry.serials()
+    registry.serials()
+    registry.get("PAD0")
+    assert finder.scans == 1
+
+
+def test_failed_serial_read_is_retried(monkeypatch):
+    pad = Device(1, 2, "PAD0")
+    pad.failing = True
+    registry = DeviceRegistry(VID, PID, Finder(pad))
+    assert registry.serials() == []
+    pad.failing = False
+    monkeypatch.setattr(DeviceRegistry, "RESCAN_INTERVAL", 0.0)
+    assert registry.serials() == ["PAD0"]
+    assert pad.reads == 2
+
+
+def test_unknown_serial_forces_rescan():
+    finder = Finder(Device(1, 2, "PAD0"))
+    registry = DeviceRegistry(VID, PID, finder)
+    registry.serials()
+    # The pad comes back at a new address after a cable bump.
+    moved = Device(1, 5, "PAD1")
+    finder.devices = [moved]
+    assert registry.get("PAD1") is moved
+    assert registry.location("PAD0") is None
+    assert registry.serials() == ["PAD1"]
+
+
+def test_seeded_serial_is_not_read():
+    pad = Device(1, 2, "PAD0")
+    registry = DeviceRegistry(VID, PID, Finder(pad), hotplug=False)
+    registry.seed((1, 2), "PAD0")
+    assert registry.get("PAD0") is pad
+    assert pad.reads == 0
@@ -0,0 +1,79 @@
+import array
+import time
+
+from write_scheduler import WriteScheduler
+
+RATE = 100.0
+
+
+def packet(value: int) -> bytes:
+    return bytes([value] * 4)
+
+
+def make_scheduler() -> tuple[WriteScheduler, array.array]:
+    return WriteScheduler(4, RATE), array.array('B', bytes(4))
+
+
+def test_idle_scheduler_has_nothing_due():
+    scheduler, out = make_scheduler()
+    assert scheduler.poll_packet(out) is None
+    assert scheduler.wait_timeout() is None
+    assert scheduler.ready
+
+
+def test_control_packets_go_first_in_order():
+    scheduler, out = make_scheduler()
+    scheduler.queue_led(packet(9))
+    scheduler.queue_control(packet(1))
+    scheduler.queue_control(packet(2))
+    assert scheduler.poll_packet(out) is True and out[0] == 1
+    assert scheduler.poll_packet(out) is True and out[0] == 2
+    assert scheduler.poll_packet(out) is False and out[0] == 9
+    assert scheduler.poll_packet(out) is None
+
+
+def test_led_packets_are_latest_wins():
+    scheduler, out = make_scheduler()
+    scheduler.queue_led(packet(1))
+    assert not scheduler.ready
+    scheduler.queue_led(packet(2))
+    assert scheduler.stats["coalesced"] == 1
+    assert scheduler.poll_packet(out) is False and out[0] == 2
+    assert scheduler.ready
+
+
+def test_led_packets_are_paced():
+    scheduler, out = make_scheduler()
+    # Behind schedule, as after idling, one packet may follow at once so
+    # send jitter does not lower the rate. The next is paced.
+    for value in (1, 2):
+        scheduler.queue_led(packet(value))
+        assert scheduler.poll_packet(out) is False
+    scheduler.queue_led(packet(3))
+    assert scheduler.poll_packet(out) is None
+    assert 0 < scheduler.wait_timeout() <= 1 / RATE
+    # Control packets are not held back by the LED pacing.
+    scheduler.queue_control(packet(4))
+    assert scheduler.poll_packet(out) is True and out[0] == 4
+    time.sleep(1 / RATE)
+    assert scheduler.poll_packet(out) is False and out[0] == 3
+
+
+def test_discarded_led_is_not_sent():
+    scheduler, out = make_scheduler()
+    scheduler.queue_led(packet(1))
+    scheduler.discard_led()
+    assert scheduler.ready
+    assert scheduler.poll_packet(out) is None
+
+
+def test_failed_control_writes_keep_tickets_in_step():
+    scheduler, _ = make_scheduler()
+    scheduler.count_sent(True)
+    scheduler.count_failed(True)
+    scheduler.count_failed(False)
+    scheduler.count_sent(True)
+    assert scheduler.control_sent == 3
+    assert scheduler.failed_controls() == [2]
+    assert scheduler.failed_controls() == []
+    assert scheduler.stats["failed"] == 2